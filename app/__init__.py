@@ -14,10 +14,8 @@ def create_app(config_name):
     # 配置日志
     dictConfig(logging_config.LOGGING_CONFIG)
 
-    # 初始化 Milvus 客户端
-    SERVER_HOST = os.getenv("MILVUS_HOST")
-    app.config['SERVER_HOST'] = SERVER_HOST
-    app.config['MILVUS_CLIENT'] = MilvusClientWrapper(uri=f"http://{SERVER_HOST}:19530", db_name=os.getenv("DB_NAME"))
+    # 初始化 Milvus 客户端(复用进程内共享的连接)
+    app.config['MILVUS_CLIENT'] = MilvusClientWrapper(uri=app.config['MILVUS_URI'], db_name=app.config['MILVUS_DB_NAME'])
 
     # 注册蓝图
     from .routes import main, video_api, video_proxy
@@ -25,4 +23,21 @@ def create_app(config_name):
     app.register_blueprint(video_api.bp, url_prefix='/vision-analyze/video')
     app.register_blueprint(video_proxy.bp, url_prefix='/vision-analyze/video')
 
+    # 预先加载向量集合,避免首个查询承担加载耗时
+    if app.config.get('MILVUS_PRELOAD_COLLECTIONS'):
+        from app.utils.milvus_operator import MilvusOperator
+        try:
+            MilvusOperator.load_all()
+        except Exception as e:
+            app.logger.warning(f"预加载向量集合失败,将在首次使用时加载: {str(e)}")
+
+    # 后台加载并预热向量化模型(帧向量与查询向量各自使用的模型),服务无需等待模型加载即可启动
+    if app.config.get('EMBEDDING_WARMUP'):
+        from app.utils.embedding_factory import EmbeddingFactory
+        from config import Config
+        EmbeddingFactory.warm_up(
+            [Config.get_frame_embedding_model_type()],
+            query_model_types=[Config.get_embedding_model_type()]
+        )
+
     return app
@@ -1,18 +1,60 @@
-from pymilvus import MilvusClient
 from ..models.video import Video
+from ..utils.cursor import decode_cursor, encode_cursor
 from ..utils.logger import logger
+from ..utils.milvus_connection import milvus_connections
+from ..utils.search_profiles import IndexSpec
+from ..utils.ttl_cache import TTLCache
+from config import Config
+from typing import Dict, Iterable, Iterator, List, Optional
+import json
+import struct
 import uuid
-from flask import current_app
-import os
+
+
+# 视频元数据字段(不含向量字段)
+VIDEO_METADATA_FIELDS = ['m_id', 'path', 'thumbnail_path', 'summary_txt', 'tags', 'title']
+
+# 按视频路径缓存的元数据,所有 VideoDAO 实例共享
+video_metadata_cache = TTLCache(maxsize=Config.VIDEO_METADATA_CACHE_SIZE, ttl=Config.VIDEO_METADATA_CACHE_TTL)
+
+
+def _path_filter(url: str) -> str:
+    # 字符串需要加引号并转义
+    return f"path == {json.dumps(url)}"
+
+# 游标分页的范围检索下界:IP 距离须大于该值,取 float32 最小值即不限制下界
+_RANGE_SEARCH_FLOOR = -3.4e38
+
+# 分页时多取的结果数,本地排序后同分记录的顺序与游标一致
+_CURSOR_TIE_SLACK = 16
+
+# 按主键取同分记录时单次检索的最大返回数(Milvus topk 上限)
+_TIE_SEARCH_LIMIT = 16384
+
+
+def _float32_below(value: float) -> float:
+    """小于 value 的最大 float32 值,用作不含 value 的范围检索边界(距离以 float32 计算)"""
+    value = struct.unpack('<f', struct.pack('<f', value))[0]
+    bits = struct.unpack('<I', struct.pack('<f', value))[0]
+    if value > 0:
+        bits -= 1
+    elif value < 0:
+        bits += 1
+    else:
+        # 0 的下一个值为最小的负次正规数
+        bits = 0x80000001
+    return struct.unpack('<f', struct.pack('<I', bits))[0]
 
 
 class VideoDAO:
     def __init__(self):
-        SERVER_HOST = current_app.config['SERVER_HOST']
-        self.milvus_client = MilvusClient(uri=f"http://{SERVER_HOST}:19530", db_name=os.getenv("DB_NAME"))
-        # self.milvus_client = current_app.config['MILVUS_CLIENT']
         self.collection_name = "video_collection"
 
+    @property
+    def milvus_client(self):
+        # 所有实例共享同一连接,重连后自动使用新的客户端
+        return milvus_connections.get_client()
+
     # def init_video(self):
     #     Video.create_database()
     #     schema = Video.create_schema()
@@ -23,16 +65,73 @@ class VideoDAO:
         logger.info(f"Querying all users from collection: {self.collection_name}")
         return self.milvus_client.query(self.collection_name, filter="", limit=6)
 
-    def search_all_videos(self, page=1, page_size=10):
-        offset = (page - 1) * page_size
-        limit = page_size
-        search_params = {
-            "metric_type": "IP",  # 指定相似度度量类型，IP表示内积（Inner Product）
-            "offset": offset,
-            "limit": limit
-        }
-        logger.info(f"Searching all videos from collection: {self.collection_name} with params: {search_params}")
-        return self.milvus_client.search(self.collection_name, filter="", **search_params)
+    def search_all_videos(self, page=1, page_size=10, cursor=None):
+        """
+        按主键顺序分页列出视频。
+
+        提供游标时按主键做键集分页(m_id > 上一页最后一个主键),任意页的代价与第一页相同;
+        未提供游标时按页码偏移,仅适合浅分页。
+
+        Args:
+            page: 页码,提供 cursor 时忽略
+            page_size: 每页数量
+            cursor: 上一页最后一条结果的 cursor
+
+        Returns:
+            List[Dict]: 视频列表,每条附带下一页使用的 cursor
+
+        Raises:
+            ValueError: 游标格式无效时
+        """
+        if cursor:
+            after_id = decode_cursor(cursor)[1]
+            result = self.milvus_client.query(
+                self.collection_name,
+                filter=f"m_id > {json.dumps(after_id)}",
+                limit=page_size,
+                output_fields=VIDEO_METADATA_FIELDS
+            )
+        else:
+            result = self.milvus_client.query(
+                self.collection_name,
+                filter="",
+                offset=(page - 1) * page_size,
+                limit=page_size,
+                output_fields=VIDEO_METADATA_FIELDS
+            )
+        result = sorted(result, key=lambda item: item['m_id'])
+        for item in result:
+            item['cursor'] = encode_cursor(None, item['m_id'])
+        return result
+
+    def iter_videos(self, batch_size=1000, output_fields=None, filter="") -> Iterator[List[Dict]]:
+        """
+        按批遍历集合中的视频,用于导出与全量处理。
+
+        基于 query_iterator,不受 offset + limit 上限约束,每批代价相同。
+
+        Args:
+            batch_size: 每批数量
+            output_fields: 返回字段,默认为不含向量字段的元数据字段
+            filter: 过滤表达式
+
+        Yields:
+            List[Dict]: 一批视频
+        """
+        iterator = self.milvus_client.query_iterator(
+            collection_name=self.collection_name,
+            batch_size=batch_size,
+            filter=filter,
+            output_fields=output_fields or VIDEO_METADATA_FIELDS
+        )
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                yield batch
+        finally:
+            iterator.close()
 
     def insert_video(self, user):
         user_data = {
@@ -48,17 +147,87 @@ class VideoDAO:
     def check_url_exists(self, url):
         # 检查URL是否存在
         # 返回True或False
-        query_result = self.milvus_client.query(self.collection_name, filter=f"path == '{url}'", limit=1)
+        query_result = self.milvus_client.query(
+            self.collection_name, filter=_path_filter(url), output_fields=['m_id'], limit=1
+        )
         return len(query_result) > 0
 
     def get_by_path(self, url):
-        query_result = self.milvus_client.query(self.collection_name, filter=f"path == '{url}'", limit=1)
+        query_result = self.milvus_client.query(self.collection_name, filter=_path_filter(url), limit=1)
         return query_result
 
-    def init_video(self, url, embedding, summary_embedding, thumbnail_oss_url, title):
-        # 插入URL到数据库
+    def get_by_paths(self, paths: Iterable[str], output_fields: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        批量按路径查询视频元数据,一次查询代替逐条查询。
+
+        默认字段的查询结果会缓存 VIDEO_METADATA_CACHE_TTL 秒。
+
+        Args:
+            paths: 视频路径列表(可重复)
+            output_fields: 返回字段,默认为不含向量字段的元数据字段
+
+        Returns:
+            Dict[str, Dict]: 路径到视频信息的映射,未找到的路径不在结果中
+        """
+        paths = list(dict.fromkeys(paths))
+        use_cache = output_fields is None
+        output_fields = output_fields or VIDEO_METADATA_FIELDS
+        if 'path' not in output_fields:
+            output_fields = output_fields + ['path']
+
+        videos = video_metadata_cache.get_many(paths) if use_cache else {}
+        missing = [path for path in paths if path not in videos]
+        if missing:
+            query_result = self.milvus_client.query(
+                self.collection_name,
+                filter=f"path in {json.dumps(missing)}",
+                output_fields=output_fields,
+                limit=len(missing)
+            )
+            found = {item['path']: item for item in query_result}
+            if use_cache:
+                video_metadata_cache.set_many(found)
+            videos.update(found)
+        # 返回副本,调用方修改结果不影响缓存
+        return {path: dict(video) for path, video in videos.items()}
+
+    def get_by_ids(self, m_ids: Iterable[str], output_fields: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        按主键批量获取视频元数据(主键查询,无需扫描 path 字段)。
+
+        默认字段的查询结果会缓存 VIDEO_METADATA_CACHE_TTL 秒。
+
+        Args:
+            m_ids: 视频主键列表(可重复)
+            output_fields: 返回字段,默认为不含向量字段的元数据字段
+
+        Returns:
+            Dict[str, Dict]: 主键到视频信息的映射,未找到的主键不在结果中
+        """
+        m_ids = list(dict.fromkeys(m_ids))
+        use_cache = output_fields is None
+        output_fields = output_fields or VIDEO_METADATA_FIELDS
+        if 'm_id' not in output_fields:
+            output_fields = output_fields + ['m_id']
+
+        videos = {}
+        if use_cache:
+            cached = video_metadata_cache.get_many(("m_id", m_id) for m_id in m_ids)
+            videos = {key[1]: video for key, video in cached.items()}
+        missing = [m_id for m_id in m_ids if m_id not in videos]
+        if missing:
+            found = {item['m_id']: item for item in self.milvus_client.get(
+                self.collection_name, ids=missing, output_fields=output_fields
+            )}
+            if use_cache:
+                video_metadata_cache.set_many({("m_id", m_id): video for m_id, video in found.items()})
+            videos.update(found)
+        return {m_id: dict(video) for m_id, video in videos.items()}
+
+    def init_video(self, url, embedding, summary_embedding, thumbnail_oss_url, title, m_id=None):
+        # 插入URL到数据库;m_id 可由调用方预先生成,以便帧记录引用视频主键
         video_data = {
-            "m_id": str(uuid.uuid4()),
+            "m_id": m_id or str(uuid.uuid4()),
             "embedding": embedding,
             "summary_embedding": summary_embedding,
             "path": url,
@@ -68,6 +237,8 @@ class VideoDAO:
             "tags": None
         }
         res = self.milvus_client.insert(self.collection_name, [video_data])
+        video_metadata_cache.invalidate(url)
+        video_metadata_cache.invalidate(("m_id", video_data["m_id"]))
         return res
 
     def upsert_video(self, video):
@@ -82,47 +253,136 @@ class VideoDAO:
             "tags": video['tags']
         }
         self.milvus_client.upsert(self.collection_name, [user_data])
+        video_metadata_cache.invalidate(video['path'])
+        video_metadata_cache.invalidate(("m_id", video['m_id']))
 
-    def search_video(self, summary_embedding=None, page=1, page_size=6):
-        offset = (page - 1) * page_size
-        limit = page_size
+    # 视频向量字段的索引配置,与建索引脚本一致
+    summary_index = IndexSpec(Config.VIDEO_INDEX_PROFILE, nlist=Config.VIDEO_INDEX_NLIST)
 
-        search_params = {
-            "metric_type": "IP",
-            "offset": offset,
-            "ignore_growing": False,
-            "params": {"nprobe": 16}
-        }
+    def search_video(self, summary_embedding=None, page=1, page_size=6, search_profile=None, cursor=None):
+        """
+        按摘要向量检索视频,未提供向量时按主键顺序列出视频。
 
-        if summary_embedding is not None:
-            result = self.milvus_client.search(
-                collection_name=self.collection_name,
-                anns_field="summary_embedding",
-                data=[summary_embedding],
-                limit=limit,
-                search_params=search_params,
-                output_fields=['m_id', 'path', 'thumbnail_path', 'summary_txt', 'tags', 'title'],
-                consistency_level="Strong"
-            )
+        结果按(得分降序, 主键)排序,每条附带 score 与 cursor。提供游标时先按主键顺序取与游标同分的
+        剩余记录,不足一页时再以游标得分为上界(不含)做范围检索(range_filter),任意页的代价与第一页相同;
+        未提供游标时按页码偏移。同分记录(如尚未生成摘要的视频共用同一个占位向量)可能远多于单次检索
+        返回的数量,页尾的同分记录按主键单独取回,保证分页不重不漏。
 
-            new_result_list = []
-            if result[0] is not None:
-                for idx in range(len(result[0])):
-                    hit = result[0][idx]
-                    entity = hit.get('entity')
-                    if entity:
-                        entity['timestamp'] = 0
-                    new_result_list.append(entity)
-            return new_result_list
+        Args:
+            summary_embedding: 查询向量
+            page: 页码,提供 cursor 时忽略
+            page_size: 每页数量
+            search_profile: 检索配置,默认使用 VIDEO_SEARCH_PROFILE
+            cursor: 上一页最后一条结果的 cursor
 
-        else:
-            result = self.milvus_client.query(
-                self.collection_name,
-                filter="",
-                offset=offset,
-                limit=limit,
-                output_fields=['m_id', 'path', 'thumbnail_path', 'summary_txt', 'tags', 'title']
-            )
+        Raises:
+            ValueError: 游标格式无效时
+        """
+        if summary_embedding is None:
+            result = self.search_all_videos(page, page_size, cursor)
             for item in result:
                 item['timestamp'] = 0
             return result
+
+        after = decode_cursor(cursor) if cursor else None
+        if after is not None and after[0] is None:
+            raise ValueError(f"无效的分页游标: {cursor}")
+
+        search_profile = search_profile or Config.VIDEO_SEARCH_PROFILE
+        if after is None:
+            hits = self._search_page(summary_embedding, search_profile, page_size, (page - 1) * page_size)
+        else:
+            score, last_m_id = after
+            tie_ids = self._ids_at_score(summary_embedding, search_profile, score, last_m_id)
+            hits = self._hits_for_ids(tie_ids[:page_size], score)
+            if len(hits) < page_size:
+                hits += self._search_page(
+                    summary_embedding, search_profile, page_size - len(hits), 0, _float32_below(score)
+                )
+
+        for item in hits:
+            item['cursor'] = encode_cursor(item['score'], item['m_id'])
+        return hits
+
+    def _search_page(self, summary_embedding, search_profile, page_size, offset, upper=None) -> List[Dict]:
+        """
+        检索一页结果,按(得分降序, 主键)排序。
+
+        Args:
+            upper: 得分上界(含),为None时不限制
+        """
+        # 多取若干条,本地按(得分, 主键)排序后截取,保证同分记录的顺序与游标一致
+        limit = page_size + _CURSOR_TIE_SLACK
+        search_params, consistency_level = self.summary_index.search_params(search_profile, "IP", limit, offset)
+        if upper is not None:
+            search_params["params"]["radius"] = _RANGE_SEARCH_FLOOR
+            search_params["params"]["range_filter"] = upper
+
+        result = self.milvus_client.search(
+            collection_name=self.collection_name,
+            anns_field="summary_embedding",
+            data=[summary_embedding],
+            limit=limit,
+            search_params=search_params,
+            output_fields=VIDEO_METADATA_FIELDS,
+            consistency_level=consistency_level
+        )
+
+        hits = []
+        if result[0] is not None:
+            for hit in result[0]:
+                entity = hit.get('entity')
+                if not entity:
+                    continue
+                entity['timestamp'] = 0
+                entity['score'] = float(hit['distance'])
+                hits.append(entity)
+        hits.sort(key=lambda item: (-item['score'], item['m_id']))
+        page_hits = hits[:page_size]
+
+        # 返回结果已截断且页尾得分等于最低得分时,该得分的同分记录可能未全部返回,
+        # 返回的只是其中任意一部分,改为按主键顺序取回
+        if offset == 0 and page_hits and len(hits) >= limit and page_hits[-1]['score'] == hits[-1]['score']:
+            tie_score = page_hits[-1]['score']
+            head = [item for item in page_hits if item['score'] > tie_score]
+            tie_ids = self._ids_at_score(summary_embedding, search_profile, tie_score)
+            page_hits = head + self._hits_for_ids(tie_ids[:page_size - len(head)], tie_score)
+        return page_hits
+
+    def _ids_at_score(self, summary_embedding, search_profile, score, after_m_id=None) -> List[str]:
+        """
+        取得分恰好等于 score 的全部记录主键(按主键升序),只返回主键大于 after_m_id 的记录。
+
+        范围检索把得分限定在 (score 的前一个 float32, score] 内,过滤条件在服务端排除已返回的主键。
+        """
+        search_params, consistency_level = self.summary_index.search_params(search_profile, "IP", _TIE_SEARCH_LIMIT)
+        search_params["params"]["radius"] = _float32_below(score)
+        search_params["params"]["range_filter"] = score
+
+        result = self.milvus_client.search(
+            collection_name=self.collection_name,
+            anns_field="summary_embedding",
+            data=[summary_embedding],
+            limit=_TIE_SEARCH_LIMIT,
+            filter=f"m_id > {json.dumps(after_m_id)}" if after_m_id else "",
+            search_params=search_params,
+            output_fields=['m_id'],
+            consistency_level=consistency_level
+        )
+        hits = result[0] or []
+        if len(hits) >= _TIE_SEARCH_LIMIT:
+            logger.warning(f"同分记录超过 {_TIE_SEARCH_LIMIT} 条,分页可能遗漏部分记录")
+        return sorted(hit['entity']['m_id'] for hit in hits if float(hit['distance']) == score)
+
+    def _hits_for_ids(self, m_ids: List[str], score: float) -> List[Dict]:
+        """按主键取视频元数据,组装为检索结果(保持主键顺序)"""
+        videos = self.get_by_ids(m_ids)
+        hits = []
+        for m_id in m_ids:
+            video = videos.get(m_id)
+            if video is None:
+                continue
+            video['timestamp'] = 0
+            video['score'] = score
+            hits.append(video)
+        return hits
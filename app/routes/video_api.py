@@ -1,10 +1,20 @@
+import os
 from flask import Blueprint, request
+from werkzeug.utils import secure_filename
 from ..services.video.upload import UploadVideoService
 from ..services.video.mining import MiningVideoService
 from ..services.video.summary import SummaryVideoService
 from ..services.video.add import AddVideoService
 from ..services.video.search import SearchVideoService
+from ..services.video.bulk_ingest import BulkIngestService, resolve_source
+from ..utils.cursor import decode_cursor
 from ..utils.response import api_handler, api_response, error_response
+from ..utils.job_queue import job_queue
+from ..utils.query_embedding_cache import query_embedding_cache
+from ..dao.video_dao import video_metadata_cache
+from ..utils.search_profiles import get_search_profile
+from ..utils.common import get_uuid
+from config import Config
 
 bp = Blueprint('video', __name__)
 
@@ -22,6 +32,10 @@ def upload_video():
     3. 提取视频帧
     4. 生成帧向量并存入Milvus
     5. 添加视频信息到数据库
+
+    参数：
+        video: 视频文件
+        async: 为 true 时仅保存文件并提交后台任务，立即返回任务ID（默认 false）
     """
     if 'video' not in request.files:
         raise ValueError("No video file provided")
@@ -32,11 +46,73 @@ def upload_video():
         raise ValueError("Invalid file type")
 
     video_service = UploadVideoService()
-    result = video_service.upload(video_file)
+    if request.form.get('async', default='false').lower() in ('1', 'true'):
+        result = video_service.upload_async(video_file)
+    else:
+        result = video_service.upload(video_file)
+
+    return api_response(result)
+
+
+@bp.route('upload_batch', methods=['POST'])
+@api_handler
+def upload_video_batch():
+    """
+    批量上传视频（后台任务）。
+
+    参数：
+        source: BULK_INGEST_ROOT 下的目录、清单文件或 zip 压缩包的相对路径（可选）
+        archive: 上传的 zip 压缩包（可选）
+
+    注意：
+        - source 与 archive 必须且只能提供其中之一
+        - source 不能超出 BULK_INGEST_ROOT，未配置时只能上传 archive
+        - 断点文件使用服务配置 BULK_CHECKPOINT_PATH
+        - 返回任务ID，进度通过 jobs 接口查询
+    """
+    source = request.form.get('source')
+    archive = request.files.get('archive')
+
+    if bool(source) == bool(archive):
+        raise ValueError("Must provide exactly one of: source, archive")
+
+    video_service = BulkIngestService()
+    if archive:
+        if not archive.filename.lower().endswith('.zip'):
+            raise ValueError("Invalid archive type")
+        staging_dir = os.path.join(Config.UPLOAD_STAGING_DIR, get_uuid())
+        os.makedirs(staging_dir, exist_ok=True)
+        source = os.path.join(staging_dir, secure_filename(archive.filename))
+        archive.save(source)
+        result = video_service.ingest_async(source, cleanup_dir=staging_dir)
+    else:
+        source = resolve_source(source, Config.BULK_INGEST_ROOT)
+        result = video_service.ingest_async(source, allowed_root=Config.BULK_INGEST_ROOT)
 
     return api_response(result)
 
 
+@bp.route('jobs/<job_id>', methods=['GET'])
+@api_handler
+def get_job(job_id):
+    """查询后台任务状态及各阶段进度"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise ValueError("Job not found")
+
+    return api_response(job.to_dict())
+
+
+@bp.route('metrics', methods=['GET'])
+@api_handler
+def get_metrics():
+    """查询向量缓存与视频元数据缓存的命中统计"""
+    return api_response({
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "video_metadata_cache": video_metadata_cache.stats()
+    })
+
+
 @bp.route('mining', methods=['POST'])
 @api_handler
 def mining_video():
@@ -101,6 +177,8 @@ def search_video():
         image_url: 图片URL（可选）
         page: 页码（默认1）
         page_size: 每页数量（默认6）
+        search_profile: 检索配置 fast/balanced/exact（可选，默认使用服务配置）
+        cursor: 分页游标，取上一页最后一条结果的 cursor（可选，提供时忽略 page）
         
     注意：
         - txt、image、image_url 三者必须提供其中之一
@@ -114,6 +192,15 @@ def search_video():
     if page_size < 1:
         raise ValueError("Page size must be greater than 0")
 
+    search_profile = request.form.get('search_profile') or None
+    if search_profile:
+        get_search_profile(search_profile)
+
+    cursor = request.form.get('cursor') or None
+    # 检索结果的游标带有得分,视频列表的游标(按主键分页)不能用于检索
+    if cursor and decode_cursor(cursor)[0] is None:
+        raise ValueError("Invalid cursor: not a search result cursor")
+
     video_service = SearchVideoService()
 
     # 获取搜索参数
@@ -130,13 +217,15 @@ def search_video():
 
     # 根据提供的参数类型执行相应的搜索
     if txt:
-        video_list = video_service.search_by_text(txt, page, page_size, "summary")
+        video_list = video_service.search_by_text(txt, page, page_size, "summary", search_profile, cursor)
     else:
         video_list = video_service.search_by_image(
             image_file=image_file,
             image_url=image_url,
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            search_profile=search_profile,
+            cursor=cursor
         )
 
     return api_response({
@@ -0,0 +1,39 @@
+"""
+批量视频入库脚本。
+
+用法:
+    python -m app.scripts.bulk_ingest --source /data/videos
+    python -m app.scripts.bulk_ingest --source videos.zip --checkpoint ingest.jsonl
+    python -m app.scripts.bulk_ingest --source manifest.txt --decode-workers 8 --ingest-workers 2
+
+source 可以是目录、清单文件(每行一个视频路径)或 zip 压缩包。
+中断后使用同一个断点文件重新执行,已完成的视频会按内容哈希跳过。
+"""
+
+import argparse
+import json
+
+from app import create_app
+from app.services.video.bulk_ingest import BulkIngestService
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="批量视频入库")
+    parser.add_argument("--source", required=True, help="目录、清单文件或 zip 压缩包路径")
+    parser.add_argument("--checkpoint", default=None, help="断点文件路径,默认使用 BULK_CHECKPOINT_PATH")
+    parser.add_argument("--decode-workers", type=int, default=None, help="解码进程数")
+    parser.add_argument("--ingest-workers", type=int, default=None, help="入库线程数")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = create_app('config.Config')
+    with app.app_context():
+        service = BulkIngestService(decode_workers=args.decode_workers, ingest_workers=args.ingest_workers)
+        stats = service.ingest(args.source, args.checkpoint)
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+将 CN-CLIP 的 .pt 权重转换为 .safetensors。
+
+.safetensors 只包含张量,加载时以 mmap 方式按需读入,不经过 pickle 反序列化;
+转换后将 CN_CLIP_MODEL_PATH 指向生成的文件即可。
+仅在 CPU 上推理时可加 --dtype float32,加载后无需再转换精度,参数直接引用映射的文件页。
+
+用法:
+    python -m app.scripts.convert_clip_checkpoint
+    python -m app.scripts.convert_clip_checkpoint --src models/embedding/cn-clip/clip_cn_vit-l-14-336.pt --dtype float32
+"""
+
+import argparse
+import os
+import time
+
+import torch
+from safetensors.torch import save_file
+
+from config import Config
+
+DTYPES = {"keep": None, "float16": torch.float16, "float32": torch.float32}
+
+
+def convert(src: str, dst: str, dtype: str = "keep") -> None:
+    """
+    转换权重文件。
+
+    Args:
+        src: .pt 权重文件
+        dst: 输出的 .safetensors 文件
+        dtype: 浮点参数的目标精度('keep' 保持原精度)
+    """
+    start_time = time.time()
+    checkpoint = torch.load(src, map_location="cpu", mmap=True)
+    state_dict = checkpoint.get("state_dict", checkpoint)
+    if next(iter(state_dict)).startswith("module"):
+        state_dict = {k[len("module."):]: v for k, v in state_dict.items() if "bert.pooler" not in k}
+
+    target = DTYPES[dtype]
+    tensors = {}
+    for name, tensor in state_dict.items():
+        if target is not None and tensor.is_floating_point():
+            tensor = tensor.to(target)
+        # safetensors 要求张量连续且不共享存储
+        tensors[name] = tensor.contiguous().clone()
+
+    save_file(tensors, dst, metadata={"source": os.path.basename(src)})
+    size_mb = os.path.getsize(dst) / 1024 / 1024
+    print(f"已转换 {len(tensors)} 个张量 -> {dst} ({size_mb:.0f}MB),耗时 {time.time() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将 CN-CLIP 的 .pt 权重转换为 .safetensors")
+    parser.add_argument("--src", default=Config.CN_CLIP_MODEL_PATH, help="源 .pt 文件")
+    parser.add_argument("--dst", help="输出文件,默认与源文件同名")
+    parser.add_argument("--dtype", choices=sorted(DTYPES), default="keep", help="浮点参数的目标精度")
+    args = parser.parse_args()
+
+    convert(args.src, args.dst or os.path.splitext(args.src)[0] + ".safetensors", args.dtype)
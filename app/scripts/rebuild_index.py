@@ -0,0 +1,81 @@
+"""
+按索引配置重建向量索引。
+
+修改 FRAME_INDEX_PROFILE / VIDEO_INDEX_PROFILE 后执行,使集合上的索引与查询端一致:
+释放集合、删除旧索引、按新配置建索引并重新加载。
+
+用法:
+    python -m app.scripts.rebuild_index --collection video_frame_vector
+    python -m app.scripts.rebuild_index --collection video_collection --profile hnsw
+"""
+
+import argparse
+import time
+
+from dotenv import load_dotenv
+from pymilvus import MilvusClient
+
+from app.utils.milvus_connection import milvus_connections
+from app.utils.search_profiles import INDEX_PROFILES, IndexSpec
+from config import Config
+
+load_dotenv()
+
+# 集合 -> [(向量字段, 索引名, 维度)], 以及对应的索引配置项前缀
+COLLECTIONS = {
+    "video_frame_vector": ("FRAME", [("embedding", "vector_index", 768)]),
+    "video_frame_vector_v2": ("FRAME", [("embedding", "vector_index", 1024)]),
+    "video_collection": ("VIDEO", [
+        ("embedding", "embedding_index", 512),
+        ("summary_embedding", "summary_embedding_index", 512),
+    ]),
+}
+
+
+def rebuild_index(collection_name: str, profile: str = None, nlist: int = None) -> None:
+    """
+    重建集合上的向量索引。
+
+    Args:
+        collection_name: 集合名称
+        profile: 索引配置名,默认使用配置文件中的值
+        nlist: IVF 类索引的聚类数,默认使用配置文件中的值
+    """
+    prefix, fields = COLLECTIONS[collection_name]
+    profile = profile or getattr(Config, f"{prefix}_INDEX_PROFILE")
+    nlist = nlist or getattr(Config, f"{prefix}_INDEX_NLIST")
+
+    milvus_client = milvus_connections.get_client()
+
+    print(f"释放集合 {collection_name}")
+    milvus_client.release_collection(collection_name)
+
+    index_params = MilvusClient.prepare_index_params()
+    for field_name, index_name, dim in fields:
+        index_spec = IndexSpec(profile, nlist=nlist, dim=dim)
+        if index_name in milvus_client.list_indexes(collection_name):
+            print(f"删除索引 {index_name}")
+            milvus_client.drop_index(collection_name, index_name)
+        index_params.add_index(
+            field_name=field_name,
+            metric_type="IP",
+            index_type=index_spec.index_type,
+            index_name=index_name,
+            params=index_spec.index_params()
+        )
+        print(f"创建索引 {index_name}: {index_spec.index_type} {index_spec.index_params()}")
+
+    start_time = time.time()
+    milvus_client.create_index(collection_name=collection_name, index_params=index_params)
+    milvus_client.load_collection(collection_name)
+    print(f"索引重建完成,耗时 {time.time() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按索引配置重建向量索引")
+    parser.add_argument("--collection", required=True, choices=sorted(COLLECTIONS), help="集合名称")
+    parser.add_argument("--profile", choices=sorted(INDEX_PROFILES), help="索引配置,默认使用配置文件中的值")
+    parser.add_argument("--nlist", type=int, help="IVF 类索引的聚类数")
+    args = parser.parse_args()
+
+    rebuild_index(args.collection, args.profile, args.nlist)
@@ -5,22 +5,18 @@
 包含视频ID、向量embedding、路径、缩略图、摘要和标签等信息。
 """
 
-import os
 from dotenv import load_dotenv
-from pymilvus import DataType, MilvusClient
+from pymilvus import DataType
+
+from app.utils.milvus_connection import milvus_connections
 
 # 加载环境变量
 load_dotenv()
 
-# 配置 Milvus 连接
-SERVER_HOST = os.getenv("SERVER_HOST")
-MILVUS_URI = f"http://{SERVER_HOST}:19530"
+# 配置 Milvus 连接(Config.MILVUS_URI / Config.MILVUS_DB_NAME)
 COLLECTION_NAME = "video_collection"
 
-milvus_client = MilvusClient(
-    uri=MILVUS_URI,
-    db_name=os.getenv("DB_NAME")
-)
+milvus_client = milvus_connections.get_client()
 
 
 def create_schema():
@@ -1,31 +1,41 @@
 from pymilvus import MilvusClient
-import os
 from dotenv import load_dotenv
 
+from app.utils.milvus_connection import milvus_connections
+from app.utils.search_profiles import IndexSpec
+from config import Config
+
 load_dotenv()
 
-SERVER_HOST = os.getenv("SERVER_HOST")
-uri = f"http://{SERVER_HOST}:19530"
-milvus_client = MilvusClient(uri=uri, db_name=os.getenv("DB_NAME"))
+milvus_client = milvus_connections.get_client()
 collection_name = "video_collection"
 
 
 def create_index():
+    # 索引类型由 VIDEO_INDEX_PROFILE 决定,与查询端的检索参数保持一致
+    index_spec = IndexSpec(Config.VIDEO_INDEX_PROFILE, nlist=Config.VIDEO_INDEX_NLIST, dim=512)
     index_params = MilvusClient.prepare_index_params()
     index_params.add_index(
         field_name="embedding",
         metric_type="IP",
-        index_type="IVF_FLAT",
+        index_type=index_spec.index_type,
         index_name="embedding_index",
-        params={"nlist": 512}
+        params=index_spec.index_params()
     )
 
     index_params.add_index(
         field_name="summary_embedding",
         metric_type="IP",
-        index_type="IVF_FLAT",
+        index_type=index_spec.index_type,
         index_name="summary_embedding_index",
-        params={"nlist": 512}
+        params=index_spec.index_params()
+    )
+
+    # 帧检索结果按路径回查视频时使用的标量索引
+    index_params.add_index(
+        field_name="path",
+        index_type="INVERTED",
+        index_name="path_index"
     )
 
     milvus_client.create_index(
@@ -1,12 +1,11 @@
-import os
-from pymilvus import DataType, MilvusClient
+from pymilvus import DataType
 from dotenv import load_dotenv
 
+from app.utils.milvus_connection import milvus_connections
+
 load_dotenv()
 
-SERVER_HOST = os.getenv("SERVER_HOST")
-uri = f"http://{SERVER_HOST}:19530"
-milvus_client = MilvusClient(uri=uri, db_name=os.getenv("DB_NAME"))
+milvus_client = milvus_connections.get_client()
 collection_name = "video_frame_vector"
 
 
@@ -40,6 +39,12 @@ def create_schema():
         datatype=DataType.INT32,
         description="视频时间点(秒)"
     )
+    collection_schema.add_field(
+        field_name="video_m_id",
+        datatype=DataType.VARCHAR,
+        max_length=256,
+        description="视频在 video_collection 中的主键"
+    )
 
     return collection_schema
 
@@ -0,0 +1,169 @@
+"""
+帧集合迁移:为帧记录补充视频主键 video_m_id。
+
+1. 为 video_collection.path 建立 INVERTED 标量索引;
+2. 按新结构(含 video_m_id 字段)创建临时集合,分批读取旧帧记录,
+   按路径批量查出视频主键后写入临时集合;
+3. 建索引并加载临时集合,核对行数后将旧集合重命名为备份,临时集合重命名为正式集合。
+
+帧数较多时可加 --bulk-import:数据写成 Parquet 文件后由 Milvus bulk_insert 导入,
+代替逐批 insert。
+
+迁移期间应暂停视频入库;迁移完成后重启服务以加载新的集合结构。
+找不到对应视频的帧 video_m_id 写入空字符串,检索时按路径回查。
+
+用法:
+    python -m app.scripts.video_frame_collection.migrate_video_m_id
+    python -m app.scripts.video_frame_collection.migrate_video_m_id --batch-size 2000 --drop-backup
+    python -m app.scripts.video_frame_collection.migrate_video_m_id --bulk-import
+"""
+
+import argparse
+import json
+import time
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from pymilvus import MilvusClient
+
+from app.scripts.video_frame_collection.create_collection import create_schema
+from app.utils.milvus_connection import milvus_connections
+from app.utils.search_profiles import IndexSpec
+from config import Config
+
+load_dotenv()
+
+# 地址与数据库取 Config.MILVUS_URI / Config.MILVUS_DB_NAME,与服务端共用同一连接
+milvus_client = milvus_connections.get_client()
+collection_name = "video_frame_vector"
+video_collection_name = "video_collection"
+
+
+def create_path_index() -> None:
+    """为 video_collection.path 建立标量索引"""
+    if "path_index" in milvus_client.list_indexes(video_collection_name):
+        print("path_index 已存在")
+        return
+    index_params = MilvusClient.prepare_index_params()
+    index_params.add_index(field_name="path", index_type="INVERTED", index_name="path_index")
+    milvus_client.release_collection(video_collection_name)
+    milvus_client.create_index(collection_name=video_collection_name, index_params=index_params)
+    milvus_client.load_collection(video_collection_name)
+    print("已创建 path_index")
+
+
+def lookup_video_ids(paths: List[str]) -> Dict[str, str]:
+    """按路径批量查询视频主键"""
+    if not paths:
+        return {}
+    result = milvus_client.query(
+        video_collection_name,
+        filter=f"path in {json.dumps(paths)}",
+        output_fields=["m_id", "path"],
+        limit=len(paths)
+    )
+    return {item["path"]: item["m_id"] for item in result}
+
+
+def count_rows(name: str) -> int:
+    result = milvus_client.query(name, filter="", output_fields=["count(*)"])
+    return result[0]["count(*)"]
+
+
+def migrate(batch_size: int, drop_backup: bool, bulk_import: bool = False) -> None:
+    source_fields = [field["name"] for field in milvus_client.describe_collection(collection_name)["fields"]]
+    if "video_m_id" in source_fields:
+        print(f"{collection_name} 已包含 video_m_id 字段,无需迁移")
+        return
+
+    target = f"{collection_name}_migrating"
+    if milvus_client.has_collection(target):
+        # 上次迁移未完成,重新开始
+        milvus_client.drop_collection(target)
+    schema = create_schema()
+    milvus_client.create_collection(collection_name=target, schema=schema, shards_num=2)
+
+    importer = None
+    if bulk_import:
+        from app.utils.milvus_writer import MilvusBulkImporter
+        importer = MilvusBulkImporter(target, schema, using=milvus_connections.get_alias())
+
+    milvus_client.load_collection(collection_name)
+    iterator = milvus_client.query_iterator(
+        collection_name=collection_name,
+        batch_size=batch_size,
+        filter="",
+        output_fields=["m_id", "embedding", "video_id", "at_seconds"]
+    )
+    copied = 0
+    orphans = 0
+    start_time = time.time()
+    try:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            video_ids = lookup_video_ids(list({row["video_id"] for row in batch}))
+            rows = []
+            for row in batch:
+                video_m_id = video_ids.get(row["video_id"], "")
+                orphans += not video_m_id
+                rows.append({
+                    "m_id": row["m_id"],
+                    "embedding": row["embedding"],
+                    "video_id": row["video_id"],
+                    "at_seconds": row["at_seconds"],
+                    "video_m_id": video_m_id
+                })
+            if importer is not None:
+                for row in rows:
+                    importer.append(row)
+            else:
+                milvus_client.insert(target, rows)
+            copied += len(rows)
+            print(f"已迁移 {copied} 帧 ({copied / (time.time() - start_time):.0f} 帧/秒)")
+    finally:
+        iterator.close()
+
+    if importer is not None:
+        task_ids = importer.commit()
+        imported = importer.wait(task_ids)
+        print(f"bulk_insert 导入 {imported} 帧,耗时 {time.time() - start_time:.1f}s")
+    milvus_client.flush(target)
+
+    index_spec = IndexSpec(Config.FRAME_INDEX_PROFILE, nlist=Config.FRAME_INDEX_NLIST, dim=768)
+    index_params = MilvusClient.prepare_index_params()
+    index_params.add_index(
+        field_name="embedding",
+        metric_type="IP",
+        index_type=index_spec.index_type,
+        index_name="vector_index",
+        params=index_spec.index_params()
+    )
+    milvus_client.create_index(collection_name=target, index_params=index_params)
+    milvus_client.load_collection(target)
+
+    source_count, target_count = count_rows(collection_name), count_rows(target)
+    if source_count != target_count:
+        raise RuntimeError(f"行数不一致: {collection_name}={source_count}, {target}={target_count},请暂停入库后重试")
+
+    backup = f"{collection_name}_backup_{int(time.time())}"
+    milvus_client.release_collection(collection_name)
+    milvus_client.rename_collection(collection_name, backup)
+    milvus_client.rename_collection(target, collection_name)
+    print(f"迁移完成: {copied} 帧,其中 {orphans} 帧未找到对应视频;旧集合已重命名为 {backup}")
+
+    if drop_backup:
+        milvus_client.drop_collection(backup)
+        print(f"已删除备份集合 {backup}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="为帧记录补充视频主键 video_m_id")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批迁移的帧数")
+    parser.add_argument("--drop-backup", action="store_true", help="迁移完成后删除旧集合")
+    parser.add_argument("--bulk-import", action="store_true", help="通过 bulk_insert 导入新集合(大批量回填)")
+    args = parser.parse_args()
+
+    create_path_index()
+    migrate(args.batch_size, args.drop_backup, args.bulk_import)
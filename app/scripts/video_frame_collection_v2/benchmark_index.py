@@ -0,0 +1,293 @@
+"""
+向量索引召回率/延迟基准测试。
+
+1. 从帧向量集合导出一批真实帧向量(或读取已导出的 .npy 文件),留出一部分作为查询;
+2. 用 numpy 暴力计算精确的内积 top-k 作为基准答案;
+3. 对每种索引配置建立临时集合,遍历 nprobe / ef 参数,测量 recall@k、
+   单线程延迟分位数(p50/p95/p99)、并发 QPS、建索引耗时与估算的索引内存;
+4. 输出 JSON 报告,便于比较不同索引配置。
+
+目标库可以是 Milvus 服务,也可以是本地 Milvus Lite 文件(如 --uri ./bench.db,
+Milvus Lite 不支持部分索引类型)。numpy 暴力检索作为进程内基线一并报告。
+
+用法:
+    python -m app.scripts.video_frame_collection_v2.benchmark_index --export embeddings.npy --sample 20000
+    python -m app.scripts.video_frame_collection_v2.benchmark_index --embeddings embeddings.npy \\
+        --index-profiles ivf_flat,ivf_sq8,hnsw --nprobe 5,16,64 --ef 64,128 --output report.json
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+from pymilvus import DataType, MilvusClient
+
+from app.utils.milvus_connection import milvus_connections
+from app.utils.search_profiles import IndexSpec
+from config import Config
+
+load_dotenv()
+
+source_collection_name = "video_frame_vector_v2"
+bench_collection_prefix = "bench_frame_"
+
+
+def export_embeddings(milvus_client: MilvusClient, collection_name: str, sample: int) -> np.ndarray:
+    """从集合中导出前 sample 条帧向量"""
+    iterator = milvus_client.query_iterator(
+        collection_name=collection_name,
+        batch_size=1000,
+        limit=sample,
+        filter="",
+        output_fields=["embedding"]
+    )
+    rows = []
+    try:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            rows.extend(item["embedding"] for item in batch)
+    finally:
+        iterator.close()
+    return np.asarray(rows, dtype=np.float32)
+
+
+def exact_top_k(base: np.ndarray, queries: np.ndarray, k: int, chunk_size: int = 256) -> np.ndarray:
+    """numpy 暴力计算内积 top-k,返回基准答案的行号 (n_queries, k)"""
+    result = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), chunk_size):
+        scores = queries[start:start + chunk_size] @ base.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        result[start:start + chunk_size] = np.take_along_axis(top, order, axis=1)
+    return result
+
+
+def recall_at_k(found: List[List[int]], truth: np.ndarray, k: int) -> float:
+    hits = [len(set(ids[:k]) & set(truth_row[:k].tolist())) for ids, truth_row in zip(found, truth)]
+    return float(np.mean(hits) / k)
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    ms = np.asarray(latencies) * 1000
+    return {
+        "mean": round(float(ms.mean()), 3),
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p95": round(float(np.percentile(ms, 95)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3)
+    }
+
+
+def estimate_index_memory_mb(index_spec: IndexSpec, n: int, dim: int) -> float:
+    """按索引结构估算向量索引内存(不含 Milvus 运行时开销)"""
+    params = index_spec.index_params()
+    if index_spec.index_type == "IVF_SQ8":
+        size = n * dim
+    elif index_spec.index_type == "IVF_PQ":
+        size = n * params["m"] * params["nbits"] / 8
+    elif index_spec.index_type == "HNSW":
+        size = n * dim * 4 + n * params["M"] * 2 * 8
+    else:
+        size = n * dim * 4
+    if index_spec.is_ivf:
+        size += index_spec.nlist * dim * 4
+    return round(size / 1024 / 1024, 2)
+
+
+def measure(search_fn, queries: np.ndarray, truth: np.ndarray, k: int, concurrency: int) -> Dict[str, Any]:
+    """测量单线程延迟与召回率,再以 concurrency 个线程测量吞吐"""
+    found = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        found.append(search_fn(query))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(search_fn, queries))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "recall_at_k": round(recall_at_k(found, truth, k), 4),
+        "latency_ms": latency_summary(latencies),
+        "qps": round(len(queries) / elapsed, 2),
+        "concurrency": concurrency
+    }
+
+
+def benchmark_numpy(base: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int, concurrency: int) -> Dict[str, Any]:
+    """进程内 numpy 暴力检索基线"""
+
+    def search(query):
+        scores = base @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])].tolist()
+
+    result = {"backend": "numpy", "index_type": "FLAT", "index_params": {}, "search_params": {},
+              "build_seconds": 0.0, "estimated_index_memory_mb": round(base.nbytes / 1024 / 1024, 2)}
+    result.update(measure(search, queries, truth, k, concurrency))
+    return result
+
+
+def build_collection(milvus_client: MilvusClient, name: str, base: np.ndarray, index_spec: IndexSpec) -> float:
+    """建立临时集合、写入向量并建索引,返回建索引与加载耗时(秒)"""
+    if milvus_client.has_collection(name):
+        milvus_client.drop_collection(name)
+
+    schema = milvus_client.create_schema(auto_id=False, enable_dynamic_fields=False)
+    schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True)
+    schema.add_field(field_name="embedding", datatype=DataType.FLOAT_VECTOR, dim=base.shape[1])
+    milvus_client.create_collection(collection_name=name, schema=schema)
+
+    for start in range(0, len(base), 5000):
+        chunk = base[start:start + 5000]
+        milvus_client.insert(name, [{"id": start + i, "embedding": row} for i, row in enumerate(chunk)])
+    milvus_client.flush(name)
+
+    index_params = MilvusClient.prepare_index_params()
+    index_params.add_index(
+        field_name="embedding",
+        metric_type="IP",
+        index_type=index_spec.index_type,
+        index_name="vector_index",
+        params=index_spec.index_params()
+    )
+    start = time.perf_counter()
+    milvus_client.create_index(collection_name=name, index_params=index_params)
+    milvus_client.load_collection(name)
+    return time.perf_counter() - start
+
+
+def benchmark_milvus(
+        milvus_client: MilvusClient,
+        base: np.ndarray,
+        queries: np.ndarray,
+        truth: np.ndarray,
+        args: argparse.Namespace
+) -> List[Dict[str, Any]]:
+    """遍历索引配置与检索参数"""
+    results = []
+    dim = base.shape[1]
+    for profile in args.index_profiles:
+        index_spec = IndexSpec(profile, nlist=args.nlist, dim=dim)
+        name = bench_collection_prefix + profile
+        print(f"建立索引 {profile}: {index_spec.index_type} {index_spec.index_params()}")
+        build_seconds = build_collection(milvus_client, name, base, index_spec)
+
+        sweep = [{"nprobe": nprobe} for nprobe in args.nprobe if nprobe <= args.nlist] if index_spec.is_ivf \
+            else [{"ef": max(ef, args.k)} for ef in args.ef]
+        try:
+            for params in sweep:
+                search_params = {"metric_type": "IP", "params": params}
+
+                def search(query, search_params=search_params):
+                    hits = milvus_client.search(
+                        collection_name=name,
+                        data=[query],
+                        anns_field="embedding",
+                        limit=args.k,
+                        search_params=search_params,
+                        consistency_level=args.consistency
+                    )
+                    return [hit["id"] for hit in hits[0]]
+
+                result = {
+                    "backend": "milvus",
+                    "index_profile": profile,
+                    "index_type": index_spec.index_type,
+                    "index_params": index_spec.index_params(),
+                    "search_params": params,
+                    "build_seconds": round(build_seconds, 2),
+                    "estimated_index_memory_mb": estimate_index_memory_mb(index_spec, len(base), dim)
+                }
+                result.update(measure(search, queries, truth, args.k, args.concurrency))
+                print(json.dumps(result, ensure_ascii=False))
+                results.append(result)
+        finally:
+            if not args.keep:
+                milvus_client.drop_collection(name)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="向量索引召回率/延迟基准测试")
+    parser.add_argument("--uri", default=Config.MILVUS_URI, help="Milvus 地址或 Milvus Lite 文件路径")
+    parser.add_argument("--db-name", default=Config.MILVUS_DB_NAME, help="数据库名称")
+    parser.add_argument("--collection", default=source_collection_name, help="导出帧向量的源集合")
+    parser.add_argument("--export", help="从源集合导出帧向量并保存到该 .npy 文件后退出")
+    parser.add_argument("--embeddings", help="已导出的帧向量 .npy 文件,未指定时直接从源集合导出")
+    parser.add_argument("--sample", type=int, default=20000, help="导出的帧向量数量")
+    parser.add_argument("--queries", type=int, default=500, help="留出作为查询的向量数量")
+    parser.add_argument("--k", type=int, default=10, help="recall@k 中的 k")
+    parser.add_argument("--index-profiles", default="ivf_flat,ivf_sq8,ivf_pq,hnsw", help="逗号分隔的索引配置")
+    parser.add_argument("--nlist", type=int, default=1536, help="IVF 类索引的聚类数")
+    parser.add_argument("--nprobe", default="5,16,64,256", help="逗号分隔的 nprobe 取值")
+    parser.add_argument("--ef", default="32,64,128,512", help="逗号分隔的 HNSW ef 取值")
+    parser.add_argument("--consistency", default="Bounded", help="检索一致性级别")
+    parser.add_argument("--concurrency", type=int, default=8, help="吞吐测试的并发线程数")
+    parser.add_argument("--keep", action="store_true", help="保留临时集合")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", default="index_benchmark_report.json", help="JSON 报告路径")
+    args = parser.parse_args()
+    args.index_profiles = [item for item in args.index_profiles.split(",") if item]
+    args.nprobe = [int(item) for item in args.nprobe.split(",") if item]
+    args.ef = [int(item) for item in args.ef.split(",") if item]
+    return args
+
+
+def main():
+    args = parse_args()
+    milvus_client = MilvusClient(uri=args.uri, db_name=args.db_name) if args.uri.startswith("http") \
+        else MilvusClient(uri=args.uri)
+
+    if args.embeddings:
+        embeddings = np.load(args.embeddings).astype(np.float32)
+    else:
+        source_client = milvus_connections.get_client()
+        embeddings = export_embeddings(source_client, args.collection, args.sample)
+        print(f"已导出 {len(embeddings)} 条帧向量")
+        if args.export:
+            np.save(args.export, embeddings)
+            print(f"已保存到 {args.export}")
+            return
+
+    # 打乱后留出查询向量,查询不在被检索的向量中
+    rng = np.random.default_rng(args.seed)
+    embeddings = embeddings[rng.permutation(len(embeddings))]
+    queries, base = embeddings[:args.queries], embeddings[args.queries:]
+    print(f"向量库 {len(base)} 条,查询 {len(queries)} 条,维度 {base.shape[1]}")
+
+    start = time.perf_counter()
+    truth = exact_top_k(base, queries, args.k)
+    print(f"基准答案计算完成,耗时 {time.perf_counter() - start:.2f}s")
+
+    results = [benchmark_numpy(base, queries, truth, args.k, args.concurrency)]
+    results.extend(benchmark_milvus(milvus_client, base, queries, truth, args))
+
+    report = {
+        "dataset": {
+            "source_collection": args.collection,
+            "base_size": int(len(base)),
+            "queries": int(len(queries)),
+            "dim": int(base.shape[1]),
+            "k": args.k,
+            "metric_type": "IP",
+            "consistency_level": args.consistency
+        },
+        "target": args.uri,
+        "created_at": time.time(),
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"报告已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,26 @@
-import os
 from pymilvus import MilvusClient
 from dotenv import load_dotenv
 
+from app.utils.milvus_connection import milvus_connections
+from app.utils.search_profiles import IndexSpec
+from config import Config
+
 load_dotenv()
 
-SERVER_HOST = os.getenv("SERVER_HOST")
-uri = f"http://{SERVER_HOST}:19530"
-milvus_client = MilvusClient(uri=uri, db_name=os.getenv("DB_NAME"))
+milvus_client = milvus_connections.get_client()
 collection_name = "video_frame_vector_v2"
 
 
 def create_index():
+    # 索引类型由 FRAME_INDEX_PROFILE 决定,与查询端的检索参数保持一致
+    index_spec = IndexSpec(Config.FRAME_INDEX_PROFILE, nlist=Config.FRAME_INDEX_NLIST, dim=1024)
     index_params = MilvusClient.prepare_index_params()
     index_params.add_index(
         field_name="embedding",
         metric_type="IP",
-        index_type="IVF_FLAT",
+        index_type=index_spec.index_type,
         index_name="vector_index",
-        params={"nlist": 1536}
+        params=index_spec.index_params()
     )
 
     milvus_client.create_index(
@@ -0,0 +1,298 @@
+"""
+批量视频入库。
+
+支持目录、清单文件(每行一个视频路径)或 zip 压缩包作为输入:
+1. 进程池并行计算内容哈希并抽帧解码,结果写入视频帧缓存;
+2. 按内容哈希跳过已入库(指纹索引或断点文件中已完成)或本批次中重复的视频,
+   已入库的视频不做解码;
+3. 线程池复用同一个向量化模型,按上传流程完成上传、向量化、标题生成与入库;
+4. 每个视频完成后追加写入断点文件,进程崩溃后重新执行即可从断点继续。
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from app.services.video.upload import UploadVideoService
+from app.utils.common import get_uuid
+from app.utils.fingerprint import warm_cache_unless_known
+from app.utils.job_queue import Job, job_queue
+from app.utils.logger import logger
+from config import Config
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
+
+
+def _is_under(path: str, root: str) -> bool:
+    return os.path.commonpath([path, root]) == root
+
+
+def _extract_videos(archive: zipfile.ZipFile, staging_dir: str) -> None:
+    """
+    只解压压缩包中的视频文件,解压前按条目数、解压后总大小与压缩比检查压缩包。
+
+    Raises:
+        ValueError: 当压缩包超出 BULK_ZIP_MAX_ENTRIES / BULK_ZIP_MAX_MB / BULK_ZIP_MAX_RATIO 限制时
+    """
+    infos = archive.infolist()
+    if len(infos) > Config.BULK_ZIP_MAX_ENTRIES:
+        raise ValueError(f"压缩包条目数 {len(infos)} 超过上限 {Config.BULK_ZIP_MAX_ENTRIES}")
+
+    members = [info for info in infos if not info.is_dir() and info.filename.lower().endswith(VIDEO_EXTENSIONS)]
+    total = sum(info.file_size for info in members)
+    if total > Config.BULK_ZIP_MAX_MB * 1024 * 1024:
+        raise ValueError(f"压缩包中视频解压后共 {total // (1024 * 1024)}MB,超过上限 {Config.BULK_ZIP_MAX_MB}MB")
+    for info in members:
+        if info.file_size > Config.BULK_ZIP_MAX_RATIO * max(info.compress_size, 1):
+            raise ValueError(f"压缩包条目 {info.filename} 压缩比异常,超过上限 {Config.BULK_ZIP_MAX_RATIO}")
+
+    # zipfile 按条目声明的大小解压(超出时校验失败),总量受上面的检查约束
+    for info in members:
+        archive.extract(info, staging_dir)
+
+
+def resolve_source(source: str, root: str) -> str:
+    """
+    将接口传入的批量入库路径解析到 BULK_INGEST_ROOT 之下。
+
+    Args:
+        source: 相对 root 的路径(也接受 root 之下的绝对路径)
+        root: 允许读取的根目录
+
+    Returns:
+        str: 解析符号链接后的绝对路径
+
+    Raises:
+        ValueError: 未配置根目录,或路径超出根目录
+    """
+    if not root:
+        raise ValueError("Server-side source is disabled, BULK_INGEST_ROOT is not configured")
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, source))
+    if not _is_under(path, root):
+        raise ValueError("source must be inside BULK_INGEST_ROOT")
+    return path
+
+
+class IngestCheckpoint:
+    """批量入库断点文件(JSON Lines),记录已完成视频的内容哈希"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._done = set()
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self._done.add(json.loads(line)["sha256"])
+                    except (ValueError, KeyError):
+                        # 崩溃时可能留下不完整的最后一行
+                        continue
+
+    def is_done(self, content_hash: str) -> bool:
+        with self._lock:
+            return content_hash in self._done
+
+    def mark_done(self, content_hash: str, path: str, video_url: str) -> None:
+        record = {
+            "sha256": content_hash,
+            "path": path,
+            "video_url": video_url,
+            "finished_at": time.time()
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._done.add(content_hash)
+
+
+class BulkIngestService:
+    def __init__(self, decode_workers: Optional[int] = None, ingest_workers: Optional[int] = None):
+        """
+        Args:
+            decode_workers: 解码进程数,默认使用 BULK_DECODE_WORKERS
+            ingest_workers: 入库线程数,默认使用 BULK_INGEST_WORKERS
+        """
+        self.upload_service = UploadVideoService()
+        self.decode_workers = decode_workers or Config.BULK_DECODE_WORKERS
+        self.ingest_workers = ingest_workers or Config.BULK_INGEST_WORKERS
+
+    @staticmethod
+    def collect_sources(source: str, allowed_root: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        """
+        收集待入库的视频文件。
+
+        Args:
+            source: 目录、清单文件或 zip 压缩包路径
+            allowed_root: 允许读取的根目录,清单中超出该目录的路径被忽略;为None时不限制
+
+        Returns:
+            Tuple[List[str], Optional[str]]: 视频文件列表,以及需要在结束后删除的解压目录
+
+        Raises:
+            ValueError: 当输入不存在或压缩包超出解压限制时
+        """
+        if not os.path.exists(source):
+            raise ValueError(f"批量入库输入不存在: {source}")
+
+        staging_dir = None
+        if os.path.isdir(source):
+            root = source
+        elif zipfile.is_zipfile(source):
+            staging_dir = os.path.join(Config.UPLOAD_STAGING_DIR, get_uuid())
+            try:
+                with zipfile.ZipFile(source) as archive:
+                    _extract_videos(archive, staging_dir)
+            except Exception:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                raise
+            root = staging_dir
+        else:
+            # 清单文件:每行一个视频路径,相对路径以清单所在目录为基准
+            base_dir = os.path.dirname(os.path.abspath(source))
+            with open(source, "r", encoding="utf-8") as f:
+                paths = [os.path.join(base_dir, line.strip()) for line in f
+                         if line.strip() and not line.startswith("#")]
+            paths = [path for path in paths if path.lower().endswith(VIDEO_EXTENSIONS)]
+            if allowed_root is not None:
+                root = os.path.realpath(allowed_root)
+                allowed = [path for path in paths if _is_under(os.path.realpath(path), root)]
+                if len(allowed) < len(paths):
+                    logger.warning(f"清单中 {len(paths) - len(allowed)} 个路径超出 {allowed_root},已忽略")
+                paths = allowed
+            return paths, None
+
+        paths = []
+        for dir_path, _, file_names in os.walk(root):
+            for file_name in sorted(file_names):
+                if file_name.lower().endswith(VIDEO_EXTENSIONS):
+                    paths.append(os.path.join(dir_path, file_name))
+        return sorted(paths), staging_dir
+
+    def ingest(
+            self,
+            source: str,
+            checkpoint_path: Optional[str] = None,
+            job: Optional[Job] = None,
+            allowed_root: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        批量入库。
+
+        Args:
+            source: 目录、清单文件或 zip 压缩包路径
+            checkpoint_path: 断点文件路径,默认使用 BULK_CHECKPOINT_PATH
+            job: 后台任务记录,用于上报进度
+            allowed_root: 允许读取的根目录(接口调用时为 BULK_INGEST_ROOT)
+
+        Returns:
+            Dict[str, Any]: 入库统计(数量与吞吐量)
+        """
+        paths, staging_dir = self.collect_sources(source, allowed_root)
+        checkpoint = IngestCheckpoint(checkpoint_path or Config.BULK_CHECKPOINT_PATH)
+        stats = {"total": len(paths), "ingested": 0, "skipped": 0, "failed": 0, "frames": 0}
+        start_time = time.time()
+        logger.info(f"开始批量入库: {source}, 共 {len(paths)} 个视频")
+
+        def report():
+            elapsed = max(time.time() - start_time, 1e-6)
+            stats["elapsed_seconds"] = round(elapsed, 2)
+            stats["videos_per_second"] = round(stats["ingested"] / elapsed, 4)
+            stats["frames_per_second"] = round(stats["frames"] / elapsed, 2)
+            if job is not None:
+                job.update_stage("ingest", **stats)
+
+        try:
+            # 解码在独立进程中进行;使用 spawn 避免在多线程进程中 fork
+            mp_context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=self.decode_workers, mp_context=mp_context) as decoders, \
+                    ThreadPoolExecutor(max_workers=self.ingest_workers, thread_name_prefix="ingest") as ingesters:
+                decode_futures = {decoders.submit(warm_cache_unless_known, path): path for path in paths}
+                ingest_futures = {}
+                seen = set()
+
+                for future in as_completed(decode_futures):
+                    try:
+                        path, content_hash, n_frames = future.result()
+                    except Exception as e:
+                        logger.error(f"视频解码失败 {decode_futures[future]}: {str(e)}")
+                        stats["failed"] += 1
+                        continue
+
+                    if n_frames is None or content_hash in seen or checkpoint.is_done(content_hash):
+                        stats["skipped"] += 1
+                        continue
+                    seen.add(content_hash)
+                    ingest_futures[ingesters.submit(self._ingest_one, path, content_hash, checkpoint)] = path
+
+                for future in as_completed(ingest_futures):
+                    try:
+                        result = future.result()
+                        stats["ingested"] += 1
+                        stats["frames"] += result["processed_frames"]
+                    except Exception as e:
+                        logger.error(f"视频入库失败 {ingest_futures[future]}: {str(e)}")
+                        stats["failed"] += 1
+                    report()
+                    logger.info(f"批量入库进度: {stats}")
+        finally:
+            if staging_dir:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+        report()
+        logger.info(f"批量入库完成: {stats}")
+        return stats
+
+    def ingest_async(
+            self,
+            source: str,
+            checkpoint_path: Optional[str] = None,
+            cleanup_dir: Optional[str] = None,
+            allowed_root: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        提交批量入库后台任务,立即返回任务ID。
+
+        Args:
+            source: 目录、清单文件或 zip 压缩包路径
+            checkpoint_path: 断点文件路径
+            cleanup_dir: 任务结束后需要删除的目录(如上传压缩包的暂存目录)
+            allowed_root: 允许读取的根目录
+        """
+        app = current_app._get_current_object()
+
+        def run(job: Job) -> Dict[str, Any]:
+            try:
+                with app.app_context():
+                    return self.ingest(source, checkpoint_path, job, allowed_root)
+            finally:
+                if cleanup_dir:
+                    shutil.rmtree(cleanup_dir, ignore_errors=True)
+
+        job = job_queue.submit("upload_batch", run)
+        return {
+            "job_id": job.job_id,
+            "status": job.status
+        }
+
+    def _ingest_one(self, path: str, content_hash: str, checkpoint: IngestCheckpoint) -> Dict[str, Any]:
+        # 不同子目录中可能有同名文件(如各摄像头的 0001.mp4),对象名使用内容哈希避免相互覆盖
+        object_name = content_hash + os.path.splitext(path)[1].lower()
+        result = self.upload_service.process(path, remove_source=False, object_name=object_name)
+        checkpoint.mark_done(content_hash, path, result["video_url"])
+        return result
@@ -1,5 +1,6 @@
 from app.dao.video_dao import VideoDAO
 from app.utils.common import *
+from app.utils.minio_uploader import MinioFileUploader
 import os
 import json
 from openai import OpenAI
@@ -45,6 +46,7 @@ def time_to_standard_format(time_range_str):
 
 def format_mining_result(mining_result, video_url):
     mining_result_new = []
+    thumbnails = []
     for item in mining_result:
         if item['behaviour']['behaviourId'] is None or item['behaviour']['behaviourName'] is None or \
                 item['behaviour']['timeRange'] is None:
@@ -59,10 +61,19 @@ def format_mining_result(mining_result, video_url):
         start_time = time_to_seconds(start_time_formatted)
         thumbnail_file_name = os.path.basename(video_url) + "_t_" + str(start_time) + ".jpg"
         thumbnail_local_path = os.path.join('/tmp', thumbnail_file_name)
-        generate_thumbnail_from_video(video_url, thumbnail_local_path, start_time)
-        item['thumbnail_url'] = upload_thumbnail_to_oss(thumbnail_file_name, thumbnail_local_path)
+        generate_thumbnail(video_url, thumbnail_local_path, start_time)
+        thumbnails.append((thumbnail_file_name, thumbnail_local_path))
         mining_result_new.append(item)
-        os.remove(thumbnail_local_path)
+
+    # 缩略图并行上传,共享同一个连接池
+    try:
+        thumbnail_urls = MinioFileUploader.get_instance().upload_many(thumbnails)
+    finally:
+        for _, thumbnail_local_path in thumbnails:
+            if os.path.exists(thumbnail_local_path):
+                os.remove(thumbnail_local_path)
+    for item, thumbnail_url in zip(mining_result_new, thumbnail_urls):
+        item['thumbnail_url'] = thumbnail_url
     return mining_result_new
 
 
@@ -5,16 +5,25 @@ import requests
 from io import BytesIO
 
 from app.dao.video_dao import VideoDAO
-from app.services.video.video_frame_search import image_to_frame, text_to_frame
-from app.utils.text_embedding import embed_fn
+from app.services.video.video_frame_search import image_to_frame, text_to_frame, video_frame_search_grouped
+from app.utils.text_embedding import embed_query
 from app.utils.logger import logger
+from config import Config
 
 
 class SearchVideoService:
     def __init__(self):
         self.video_dao = VideoDAO()
 
-    def search_by_text(self, txt: str, page: int = 1, page_size: int = 6, search_mode: str = "frame") -> List[Dict[str, Any]]:
+    def search_by_text(
+            self,
+            txt: str,
+            page: int = 1,
+            page_size: int = 6,
+            search_mode: str = "frame",
+            search_profile: Optional[str] = None,
+            cursor: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         通过文本搜索视频。
 
@@ -25,21 +34,27 @@ class SearchVideoService:
             search_mode: 搜索模式
                 - "frame": 先搜索视频帧,再获取视频信息(默认)
                 - "summary": 直接搜索视频摘要
+            search_profile: 检索配置('fast'|'balanced'|'exact'),默认按搜索模式使用配置文件中的值
+            cursor: 上一页最后一条结果的游标(帧级分组检索与摘要检索),提供时忽略 page
         Returns:
             List[Dict[str, Any]]: 视频列表
         """
         try:
             if search_mode == "frame":
-                # 现有的帧级搜索逻辑
-                video_paths, timestamps = text_to_frame(txt)
-                return self._get_video_details(video_paths, timestamps, page, page_size)
+                if Config.FRAME_SEARCH_GROUPED:
+                    return self._search_frames_grouped(txt, page, page_size, search_profile, cursor)
+                # 按帧分页的搜索逻辑
+                video_paths, timestamps, video_m_ids = text_to_frame(txt, search_profile)
+                return self._get_video_details(video_paths, timestamps, page, page_size, video_m_ids)
             else:
                 # 直接搜索视频摘要
-                summary_embedding = embed_fn(txt)  # 使用文本embedding函数
+                summary_embedding = embed_query(txt)  # 重复的查询文本命中缓存,不再调用远程接口
                 return self.video_dao.search_video(
                     summary_embedding=summary_embedding,
                     page=page,
-                    page_size=page_size
+                    page_size=page_size,
+                    search_profile=search_profile,
+                    cursor=cursor
                 )
             
         except Exception as e:
@@ -51,16 +66,22 @@ class SearchVideoService:
             image_file: Optional[Union[FileStorage, Image.Image]] = None,
             image_url: Optional[str] = None,
             page: int = 1,
-            page_size: int = 6
+            page_size: int = 6,
+            search_profile: Optional[str] = None,
+            cursor: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         通过图片搜索视频。
 
+        FRAME_SEARCH_GROUPED 开启时帧命中结果按视频聚合后分页,每个视频只出现一次。
+
         Args:
             image_file: 上传的图片文件或PIL Image对象
             image_url: 图片URL
             page: 页码
             page_size: 每页数量
+            search_profile: 检索配置('fast'|'balanced'|'exact'),默认使用 FRAME_SEARCH_PROFILE
+            cursor: 上一页最后一个视频的游标,提供时忽略 page
 
         Returns:
             List[Dict[str, Any]]: 视频列表
@@ -79,22 +100,55 @@ class SearchVideoService:
             else:
                 raise ValueError("No image provided")
 
+            if Config.FRAME_SEARCH_GROUPED:
+                return self._search_frames_grouped(image, page, page_size, search_profile, cursor)
+
             # 使用图片搜索视频帧
-            video_paths, timestamps = image_to_frame(image)
+            video_paths, timestamps, video_m_ids = image_to_frame(image, search_profile)
             
             # 获取视频详细信息
-            return self._get_video_details(video_paths, timestamps, page, page_size)
+            return self._get_video_details(video_paths, timestamps, page, page_size, video_m_ids)
             
         except Exception as e:
             logger.error(f"图片搜索失败: {str(e)}")
             return []
 
+    def _search_frames_grouped(
+            self,
+            query: Union[str, Image.Image],
+            page: int,
+            page_size: int,
+            search_profile: Optional[str],
+            cursor: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """按视频分组检索帧并补充视频详情,结果附带得分、命中帧数与分页游标"""
+        groups = video_frame_search_grouped(
+            query,
+            limit=page_size,
+            offset=(page - 1) * page_size,
+            cursor=cursor,
+            search_profile=search_profile
+        )
+        videos = self._hydrate([group["video_id"] for group in groups], [group["video_m_id"] for group in groups])
+
+        video_list = []
+        for group, video_data in zip(groups, videos):
+            if video_data is None:
+                continue
+            video_data['timestamp'] = group['timestamp']
+            video_data['score'] = group['score']
+            video_data['hit_count'] = group['hit_count']
+            video_data['cursor'] = group['cursor']
+            video_list.append(video_data)
+        return video_list
+
     def _get_video_details(
             self,
             video_paths: List[str],
             timestamps: List[int],
             page: int,
-            page_size: int
+            page_size: int,
+            video_m_ids: Optional[List[Optional[str]]] = None
     ) -> List[Dict[str, Any]]:
         """获取视频详细信息"""
         try:
@@ -105,31 +159,13 @@ class SearchVideoService:
             # 获取当前页的视频路径和时间戳
             page_paths = video_paths[start_idx:end_idx]
             page_timestamps = timestamps[start_idx:end_idx]
-            
-            # 获取视频详细信息
+            page_m_ids = (video_m_ids or [])[start_idx:end_idx]
+
             video_list = []
-            for video_path, timestamp in zip(page_paths, page_timestamps):
-                video_info = self.video_dao.get_by_path(video_path)
-                if video_info:
-                    video_data = video_info[0].copy()  # 创建副本避免修改原始数据
+            for video_data, timestamp in zip(self._hydrate(page_paths, page_m_ids), page_timestamps):
+                if video_data:
                     # 确保所有数值类型都是 Python 原生类型
                     video_data['timestamp'] = int(timestamp)  # 转换时间戳为整数
-
-                    # # 处理可能的 numpy 类型
-                    # if 'embedding' in video_data:
-                    #     if hasattr(video_data['embedding'], 'tolist'):
-                    #         video_data['embedding'] = video_data['embedding'].tolist()
-
-                    # 移除 embedding 字段
-                    video_data.pop('embedding', None)
-                    
-                    # 处理其他可能的特殊类型字段
-                    for key, value in video_data.items():
-                        if hasattr(value, 'item'):  # 处理 numpy 标量类型
-                            video_data[key] = value.item()
-                        elif hasattr(value, 'tolist'):  # 处理 numpy 数组类型
-                            video_data[key] = value.tolist()
-                    
                     video_list.append(video_data)
                     
             return video_list
@@ -138,3 +174,32 @@ class SearchVideoService:
             logger.error(f"获取视频详情失败: {str(e)}")
             return []
 
+    def _hydrate(self, video_paths: List[str], video_m_ids: List[Optional[str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        批量获取视频详细信息,返回与输入顺序一致的列表(未找到的视频为None)。
+
+        帧记录带有视频主键时按主键获取,迁移前写入的帧按路径批量查询。
+        """
+        video_m_ids = list(video_m_ids) + [None] * (len(video_paths) - len(video_m_ids))
+
+        # 批量获取视频详细信息(不含向量字段)
+        videos_by_id = self.video_dao.get_by_ids([m_id for m_id in video_m_ids if m_id])
+        videos_by_path = self.video_dao.get_by_paths(
+            [path for path, m_id in zip(video_paths, video_m_ids) if m_id not in videos_by_id]
+        )
+
+        videos = []
+        for video_path, m_id in zip(video_paths, video_m_ids):
+            video_info = videos_by_id.get(m_id) or videos_by_path.get(video_path)
+            if not video_info:
+                videos.append(None)
+                continue
+            video_data = dict(video_info)  # 同一视频可能出现多次,每条结果使用独立副本
+            # 处理其他可能的特殊类型字段
+            for key, value in video_data.items():
+                if hasattr(value, 'item'):  # 处理 numpy 标量类型
+                    video_data[key] = value.item()
+                elif hasattr(value, 'tolist'):  # 处理 numpy 数组类型
+                    video_data[key] = value.tolist()
+            videos.append(video_data)
+        return videos
@@ -3,7 +3,10 @@ import numpy as np
 from PIL import Image
 import uuid
 import os
-from typing import Dict, Any, List, Tuple
+import shutil
+import threading
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+from flask import current_app
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
 
@@ -12,8 +15,14 @@ from app.utils.logger import logger
 from app.utils.common import *
 from app.utils.text_embedding import *
 from app.utils.minio_uploader import MinioFileUploader
-from app.utils.clip_embedding import clip_embedding
+from app.utils.embedding_factory import EmbeddingFactory
 from app.utils.milvus_operator import video_frame_operator
+from app.utils.milvus_writer import frame_writer
+from app.utils.frame_pipeline import FramePipeline
+from app.utils.frame_cache import frame_cache
+from app.utils.fingerprint import compute_phash, fingerprint_index
+from app.utils.job_queue import Job, job_queue, job_stage
+from app.utils.stage_graph import StageGraph
 from config import Config
 from app.utils.video_processor import VideoProcessor
 from app.prompt.title import system_instruction, prompt
@@ -24,7 +33,7 @@ from openai import OpenAI
 class UploadVideoService:
     def __init__(self):
         self.video_dao = VideoDAO()
-        self.minioFileUploader = MinioFileUploader()
+        self.minioFileUploader = MinioFileUploader.get_instance()
         self.frame_interval = Config.VIDEO_FRAME_INTERVAL
         self.batch_size = Config.VIDEO_FRAME_BATCH_SIZE
         self.video_processor = VideoProcessor()
@@ -39,130 +48,298 @@ class UploadVideoService:
         Returns:
             Dict[str, Any]: 包含视频URL和处理结果的字典
         """
-        # 保存临时文件
+        if not Config.OSS_STREAMING_UPLOAD:
+            video_file_path = self._save_upload(video_file)
+            return self.process(video_file_path)
+
+        video_file_path, staged_object = self._stream_upload(video_file)
+        return self.process(video_file_path, staged_object=staged_object)
+
+    def upload_async(self, video_file: FileStorage) -> Dict[str, Any]:
+        """
+        保存上传文件并提交后台入库任务,立即返回任务ID。
+
+        Args:
+            video_file: 上传的视频文件
+
+        Returns:
+            Dict[str, Any]: 任务ID与任务状态
+        """
+        video_file_path = self._save_upload(video_file)
+        app = current_app._get_current_object()
+
+        def run(job: Job) -> Dict[str, Any]:
+            # 工作线程中没有请求上下文,需要显式进入应用上下文
+            with app.app_context():
+                return UploadVideoService().process(video_file_path, job)
+
+        job = job_queue.submit("upload", run)
+        return {
+            "job_id": job.job_id,
+            "status": job.status
+        }
+
+    def _stream_upload(self, video_file: FileStorage) -> Tuple[str, str]:
+        """
+        将上传请求流直接分片写入对象存储。
+
+        读取的数据同时写入暂存目录作为抽帧解码的输入并计算内容哈希,
+        不再先保存文件、再读取上传、再读取计算哈希。
+        数据先写入临时对象 <uuid>.part,去重通过后才改名为正式对象名,
+        重复或失败的上传不会产生孤立对象,也不会覆盖已入库的同名视频。
+
+        Returns:
+            Tuple[str, str]: (本地副本路径, 临时对象名)
+        """
+        video_file_path = self._staging_path(video_file)
+        staged_object = f"{uuid.uuid4().hex}.part"
+        try:
+            _, content_hash = self.minioFileUploader.upload_stream(
+                staged_object,
+                video_file.stream,
+                video_file_path,
+                content_type=video_file.mimetype or None
+            )
+        except Exception:
+            shutil.rmtree(os.path.dirname(video_file_path), ignore_errors=True)
+            self._remove_staged_object(staged_object)
+            raise
+        frame_cache.remember_hash(video_file_path, content_hash)
+        return video_file_path, staged_object
+
+    def _remove_staged_object(self, staged_object: str) -> None:
+        """删除流式上传的临时对象(已改名或不存在时无操作)"""
+        try:
+            self.minioFileUploader.remove_object(staged_object)
+        except Exception as e:
+            logger.warning(f"删除临时对象失败 {staged_object}: {str(e)}")
+
+    @staticmethod
+    def _staging_path(video_file: FileStorage) -> str:
+        """在独立的暂存目录中为上传文件分配路径,保留原文件名作为OSS对象名"""
         filename = secure_filename(video_file.filename)
-        video_file_path = os.path.join('/tmp', filename)
+        staging_dir = os.path.join(Config.UPLOAD_STAGING_DIR, get_uuid())
+        os.makedirs(staging_dir, exist_ok=True)
+        return os.path.join(staging_dir, filename)
+
+    @staticmethod
+    def _save_upload(video_file: FileStorage) -> str:
+        """将上传文件保存到独立的暂存目录"""
+        video_file_path = UploadVideoService._staging_path(video_file)
         video_file.save(video_file_path)
+        return video_file_path
 
-        result = {
-            "frame_count": 0,
-            "processed_frames": 0
-        }
+    def process(
+            self,
+            video_file_path: str,
+            job: Optional[Job] = None,
+            remove_source: bool = True,
+            staged_object: Optional[str] = None,
+            object_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        处理已保存到本地的视频:上传OSS、抽帧向量化、生成缩略图与标题并入库。
+
+        处理前先按内容指纹去重,已入库(或正在入库)的视频直接返回已有结果。
+        各阶段按依赖关系并行执行:OSS上传与其余阶段同时进行,帧向量化边解码边推理,
+        解码写完视频帧缓存后缩略图和标题生成随即开始,最后汇总写入视频信息。任一阶段失败时
+        回滚已写入的帧向量、缩略图和视频对象。
+
+        Args:
+            video_file_path: 本地视频文件路径
+            job: 后台任务记录,用于上报阶段进度;同步调用时为None
+            remove_source: 处理结束后是否删除视频文件所在的暂存目录
+            staged_object: 视频已通过流式上传写入OSS时的临时对象名,OSS上传阶段只需将其改名,
+                重复视频或处理失败时删除
+            object_name: OSS对象名,默认使用文件名
+
+        Returns:
+            Dict[str, Any]: 包含视频URL和处理结果的字典
+        """
+        filename = object_name or os.path.basename(video_file_path)
+        cache_key = None
+        reserved = False
 
         try:
-            # 上传视频到OSS
-            video_oss_url = upload_thumbnail_to_oss(filename, video_file_path)
-            thumbnail_oss_url = self.minioFileUploader.generate_video_thumbnail_url(video_oss_url)
-            
-            # 处理视频帧
-            frames = self._extract_frames(video_file_path)
-            result["frame_count"] = len(frames)
-            
-            if frames:
-                self._process_frames(video_oss_url, frames)
-                result["processed_frames"] = len(frames)
-
-            # 生成并更新标题
-            title = self.generate_title(video_file_path)
-
-            # 添加视频信息到数据库
-            if not self.video_dao.check_url_exists(video_oss_url):
-                embedding = embed_fn(" ")
-                summary_embedding = embed_fn(" ")
-                self.video_dao.init_video(video_oss_url, embedding, summary_embedding, thumbnail_oss_url, title)
-            
-            result.update({
+            with job_stage(job, "dedupe"):
+                # 内容哈希同时作为视频帧缓存的键
+                cache_key = frame_cache.key_for(video_file_path)
+                existing = fingerprint_index.reserve(cache_key)
+                reserved = existing is None
+                phash = None
+                if reserved and Config.FINGERPRINT_PHASH_ENABLED:
+                    phash = compute_phash(video_file_path)
+                    existing = fingerprint_index.find_similar(phash, Config.FINGERPRINT_PHASH_MAX_DISTANCE)
+            if existing is not None:
+                if reserved:
+                    fingerprint_index.release(cache_key)
+                    reserved = False
+                return self._duplicate_result(existing)
+
+            # OSS地址可以预先确定,帧记录与缩略图无需等待上传完成
+            video_oss_url = self.minioFileUploader.get_object_url(filename)
+            # 视频主键预先生成,帧记录写入时即可引用
+            video_m_id = str(uuid.uuid4())
+            frame_cache.add_alias(video_oss_url, cache_key)
+
+            def upload_oss(_):
+                if staged_object:
+                    return self.minioFileUploader.rename_object(staged_object, filename)
+                return upload_thumbnail_to_oss(filename, video_file_path)
+
+            def remove_oss(url):
+                # 同名视频已入库时保留对象
+                if not self.video_dao.check_url_exists(url):
+                    self.minioFileUploader.remove_object(filename)
+
+            # 帧向量化直接消费流式解码的帧,解码过程中顺带写入视频帧缓存
+            decoded = threading.Event()
+
+            def stream_frames():
+                try:
+                    yield from frame_cache.iter_frames(video_file_path, cache_key)
+                finally:
+                    decoded.set()
+
+            def frames(_):
+                on_progress = (lambda n: job.update_stage("frames", processed_frames=n)) if job else None
+                try:
+                    return self._process_frames(stream_frames(), video_oss_url, on_progress, video_m_id)
+                finally:
+                    decoded.set()
+
+            def decode(_):
+                # 等待流式解码写完缓存(早于帧向量化完成),缩略图与标题随后从缓存读取
+                decoded.wait()
+                cached_video = frame_cache.lookup(video_file_path, cache_key)
+                if cached_video is None:
+                    raise RuntimeError(f"视频帧缓存未生成: {video_file_path}")
+                return cached_video
+
+            def remove_frames(pipeline):
+                self._remove_frames(pipeline.inserted_ids)
+
+            def thumbnail(_):
+                # 缩略图直接取自缓存帧
+                return self.minioFileUploader.generate_video_thumbnail_url(video_oss_url)
+
+            def remove_thumbnail(url):
+                self.minioFileUploader.remove_object(os.path.basename(url))
+
+            def title(_):
+                return self.generate_title(video_file_path)
+
+            def save(results):
+                # 添加视频信息到数据库
+                if not self.video_dao.check_url_exists(video_oss_url):
+                    embedding = embed_fn(" ")
+                    summary_embedding = embed_fn(" ")
+                    self.video_dao.init_video(video_oss_url, embedding, summary_embedding,
+                                              results["thumbnail"], results["title"], m_id=video_m_id)
+
+            graph = StageGraph(max_workers=Config.UPLOAD_STAGE_WORKERS, wrapper=lambda name: job_stage(job, name))
+            graph.add("upload_oss", upload_oss, cleanup=remove_oss)
+            graph.add("frames", frames, cleanup=remove_frames)
+            graph.add("decode", decode)
+            graph.add("thumbnail", thumbnail, deps=["decode"], cleanup=remove_thumbnail)
+            graph.add("title", title, deps=["decode"])
+            graph.add("save", save, deps=["upload_oss", "frames", "thumbnail", "title"])
+            # 缩略图与标题读取缓存帧期间,缓存条目不会被其他上传触发的淘汰删除
+            with frame_cache.pin(cache_key):
+                results = graph.run()
+
+            fingerprint_index.complete(cache_key, video_oss_url, phash)
+            reserved = False
+            pipeline = results["frames"]
+            return {
+                "frame_count": pipeline.frame_count,
+                "processed_frames": pipeline.processed_frames,
                 "file_name": video_oss_url,
                 "video_url": video_oss_url,
-                "title": title
-            })
+                "title": results["title"],
+                "duplicate": False
+            }
 
         except Exception as e:
             logger.error(f"处理视频失败: {str(e)}")
             raise
         finally:
+            if reserved:
+                fingerprint_index.release(cache_key)
+            # 重复视频或处理失败时临时对象仍在,成功时已改名
+            if staged_object:
+                self._remove_staged_object(staged_object)
             # 清理临时文件
-            os.remove(video_file_path)
-            logger.debug(f"Deleted temporary file: {video_file_path}")
+            if remove_source:
+                shutil.rmtree(os.path.dirname(video_file_path), ignore_errors=True)
+                logger.debug(f"Deleted temporary file: {video_file_path}")
 
-        return result
+    def _duplicate_result(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """重复视频的返回结果:指向已入库的视频,不做任何处理"""
+        video_url = record["video_url"]
+        title = None
+        if video_url:
+            title = self.video_dao.get_by_paths([video_url]).get(video_url, {}).get("title")
+            logger.info(f"视频已入库,跳过处理: {video_url}")
+        else:
+            logger.info(f"相同视频正在入库,跳过处理: {record['content_hash']}")
+        return {
+            "frame_count": 0,
+            "processed_frames": 0,
+            "file_name": video_url,
+            "video_url": video_url,
+            "title": title,
+            "duplicate": True,
+            "status": record["status"]
+        }
 
-    def _extract_frames(self, video_path: str) -> List[Image.Image]:
-        """提取视频帧"""
-        frames = []
-        cap = cv2.VideoCapture(video_path)
-        
-        if not cap.isOpened():
-            raise ValueError(f"无法打开视频: {video_path}")
+    def _process_frames(
+            self,
+            frames: Iterable[Tuple[int, np.ndarray]],
+            video_url: str,
+            on_progress: Optional[Callable[[int], None]] = None,
+            video_m_id: Optional[str] = None
+    ) -> FramePipeline:
+        """
+        流式处理视频帧并存入向量数据库。
 
-        try:
-            frame_count = 0
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                    
-                if frame_count % self.frame_interval == 0:
-                    # 转换为PIL Image
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    pil_image = Image.fromarray(frame_rgb)
-                    frames.append(pil_image)
-                    
-                frame_count += 1
-        finally:
-            cap.release()
-            
-        return frames
+        解码、预处理、向量化与写入在有界队列衔接的独立线程中并行执行,
+        内存占用不随视频时长增长。失败时删除已写入的帧向量。
 
-    def _process_frames(self, video_url: str, frames: List[Image.Image]) -> None:
-        """
-        处理视频帧并存入向量数据库。
-        
         Args:
+            frames: 采样帧来源,产出 (时间戳秒, BGR图像)
             video_url: 视频文件URL
-            frames: 提取的视频帧列表
+            on_progress: 批量写入后的进度回调
+            video_m_id: 视频主键,随帧记录写入
+
+        Returns:
+            FramePipeline: 已执行完成的管道,包含帧数统计与已写入的帧主键
         """
-        m_ids, embeddings, paths, at_seconds = [], [], [], []
-
-        # 获取视频的FPS
-        cap = cv2.VideoCapture(video_url)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        cap.release()
-
-        for idx, frame in enumerate(frames):
-            try:
-                # 生成帧的向量表示
-                embedding = clip_embedding.embedding_image(frame)
-                if embedding is None:
-                    continue
-
-                # 准备数据
-                m_ids.append(str(uuid.uuid4()))
-                # embeddings.append(embedding[0].detach().cpu().numpy().tolist())
-                embeddings.append(embedding)
-                paths.append(video_url)
-
-                # 正确计算时间戳（秒）
-                # 当前帧实际的帧号 = 索引 * 帧间隔
-                # 时间戳 = 帧号 / FPS
-                frame_number = idx * self.frame_interval
-                timestamp = int(frame_number / fps)
-                at_seconds.append(timestamp)
-
-                # 使用配置的批处理大小
-                if len(m_ids) >= self.batch_size:
-                    video_frame_operator.insert_data([m_ids, embeddings, paths, at_seconds])
-                    logger.info(f"批量插入 {len(m_ids)} 帧，时间戳范围: {at_seconds[0]}-{at_seconds[-1]}秒")
-                    m_ids, embeddings, paths, at_seconds = [], [], [], []
-
-            except Exception as e:
-                logger.error(f"处理帧 {idx} 失败: {str(e)}")
-                continue
-
-        # 处理剩余的帧
+        pipeline = FramePipeline(
+            frames=frames,
+            video_url=video_url,
+            embedding=EmbeddingFactory.create_embedding(Config.get_frame_embedding_model_type()),
+            operator=video_frame_operator,
+            frame_interval=self.frame_interval,
+            batch_size=self.batch_size,
+            queue_size=Config.VIDEO_PIPELINE_QUEUE_SIZE,
+            on_progress=on_progress,
+            video_m_id=video_m_id,
+            writer=frame_writer
+        )
+        try:
+            pipeline.run()
+        except Exception:
+            self._remove_frames(pipeline.inserted_ids)
+            raise
+        return pipeline
+
+    @staticmethod
+    def _remove_frames(m_ids: List[str]) -> None:
+        """删除已写入的帧向量"""
         if m_ids:
-            video_frame_operator.insert_data([m_ids, embeddings, paths, at_seconds])
-            logger.info(f"批量插入剩余 {len(m_ids)} 帧，时间戳范围: {at_seconds[0]}-{at_seconds[-1]}秒")
+            video_frame_operator.delete_by_ids(m_ids)
+            logger.info(f"已回滚 {len(m_ids)} 条帧向量")
 
     def generate_title(self, video_path):
         """生成视频标题"""
@@ -1,4 +1,4 @@
-from typing import List, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 from PIL import Image
 import os
 import requests
@@ -6,8 +6,19 @@ from io import BytesIO
 import re
 import numpy as np
 
+from app.utils.cursor import after_cursor, decode_cursor, encode_cursor
 from app.utils.embedding_factory import EmbeddingFactory
 from app.utils.milvus_operator import video_frame_operator
+from app.utils.query_embedding_cache import embedding_model_key, query_embedding_cache
+from config import Config
+
+
+def _frame_output_fields() -> List[str]:
+    """帧检索的返回字段,已迁移的集合额外返回视频主键"""
+    output_fields = ['video_id', 'at_seconds']
+    if video_frame_operator.has_field('video_m_id'):
+        output_fields.append('video_m_id')
+    return output_fields
 
 
 def _is_valid_url(url: str) -> bool:
@@ -51,7 +62,7 @@ def _load_image_from_url(url: str) -> Image.Image:
         raise Exception(f"从URL加载图片失败: {str(e)}")
 
 
-def _process_search_results(results) -> Tuple[List[str], List[int]]:
+def _process_search_results(results) -> Tuple[List[str], List[int], List[Optional[str]]]:
     """
     处理搜索结果。
 
@@ -59,20 +70,77 @@ def _process_search_results(results) -> Tuple[List[str], List[int]]:
         results: Milvus 搜索返回的结果
 
     Returns:
-        Tuple[List[str], List[int]]: 视频路径和时间戳列表
+        Tuple[List[str], List[int], List[Optional[str]]]: 视频路径、时间戳和视频主键列表
+            (迁移前写入的帧没有视频主键,对应位置为None)
     """
     video_paths = []
     at_seconds = []
+    video_m_ids = []
     for result in results:
         video_id = result.get('video_id')
         timestamp = result.get('at_seconds')
         if video_id is not None and timestamp is not None:
             video_paths.append(video_id)
             at_seconds.append(timestamp)
-    return video_paths, at_seconds
+            video_m_ids.append(result.get('video_m_id'))
+    return video_paths, at_seconds, video_m_ids
 
 
-def video_frame_search(query: Union[str, Image.Image]) -> Tuple[List[str], List[int]]:
+def _query_embedding(query: Union[str, Image.Image]) -> Optional[np.ndarray]:
+    """
+    生成查询向量。
+
+    Args:
+        query: 文本、PIL.Image 对象、本地图片路径或在线图片URL
+
+    Returns:
+        Optional[np.ndarray]: float32 查询向量,无法生成时返回None
+    """
+    if query is None:
+        print("没有任何输入！")
+        return None
+
+    # 获取embedding实例(并发查询合并为微批推理)
+    embedding = EmbeddingFactory.create_query_embedding()
+
+    # 根据输入类型生成向量
+    if isinstance(query, str):
+        if _is_valid_url(query):  # 检查是否为URL
+            try:
+                image = _load_image_from_url(query)
+                input_embedding = embedding.embedding_image(image)
+            except Exception as e:
+                print(f"处理在线图片失败: {str(e)}")
+                return None
+        elif os.path.isfile(query):  # 本地图片路径
+            try:
+                image = Image.open(query).convert('RGB')
+                input_embedding = embedding.embedding_image(image)
+            except Exception as e:
+                print(f"读取本地图片失败: {str(e)}")
+                return None
+        else:  # 文本查询,重复的查询文本命中缓存,不经过模型推理
+            input_embedding = query_embedding_cache.get_or_compute(
+                embedding_model_key(Config.get_embedding_model_type()), query, embedding.embedding_text
+            )
+    elif isinstance(query, Image.Image):
+        input_embedding = embedding.embedding_image(query)
+    else:
+        print(f"不支持的查询类型: {type(query)}")
+        return None
+
+    if input_embedding is None or len(input_embedding) == 0:
+        print("无法生成查询向量")
+        return None
+
+    # 转换向量格式为numpy数组
+    return np.array(input_embedding, dtype='float32')
+
+
+def video_frame_search(
+        query: Union[str, Image.Image],
+        search_profile: Optional[str] = None
+) -> Tuple[List[str], List[int], List[Optional[str]]]:
     """
     通过文本或图片搜索视频帧。
 
@@ -82,55 +150,23 @@ def video_frame_search(query: Union[str, Image.Image]) -> Tuple[List[str], List[
             - PIL.Image 对象
             - 本地图片路径
             - 在线图片URL
+        search_profile: 检索配置('fast'|'balanced'|'exact'),默认使用 FRAME_SEARCH_PROFILE
 
     Returns:
-        Tuple[List[str], List[int]]: 返回视频路径列表和对应的时间戳列表
+        Tuple[List[str], List[int], List[Optional[str]]]: 返回视频路径列表、对应的时间戳列表和视频主键列表
     """
-    if query is None:
-        print("没有任何输入！")
-        return [], []
-
     try:
-        # 获取embedding实例
-        embedding = EmbeddingFactory.create_embedding()
-        
-        # 根据输入类型生成向量
-        if isinstance(query, str):
-            if _is_valid_url(query):  # 检查是否为URL
-                try:
-                    image = _load_image_from_url(query)
-                    input_embedding = embedding.embedding_image(image)
-                except Exception as e:
-                    print(f"处理在线图片失败: {str(e)}")
-                    return [], []
-            elif os.path.isfile(query):  # 本地图片路径
-                try:
-                    image = Image.open(query).convert('RGB')
-                    input_embedding = embedding.embedding_image(image)
-                except Exception as e:
-                    print(f"读取本地图片失败: {str(e)}")
-                    return [], []
-            else:  # 文本查询
-                input_embedding = embedding.embedding_text(query)
-        elif isinstance(query, Image.Image):
-            input_embedding = embedding.embedding_image(query)
-        else:
-            print(f"不支持的查询类型: {type(query)}")
-            return [], []
-
-        if input_embedding is None or len(input_embedding) == 0:
-            print("无法生成查询向量")
-            return [], []
-
-        # 转换向量格式为numpy数组
-        input_embedding = np.array(input_embedding, dtype='float32')
+        input_embedding = _query_embedding(query)
+        if input_embedding is None:
+            return [], [], []
 
         print("input_embedding shape:", input_embedding.shape)
 
         # 执行搜索
         results = video_frame_operator.search_data(
             embedding=input_embedding,
-            output_fields=['video_id', 'at_seconds']
+            output_fields=_frame_output_fields(),
+            search_profile=search_profile
         )
 
         print("找到结果数量:", len(results))
@@ -139,10 +175,125 @@ def video_frame_search(query: Union[str, Image.Image]) -> Tuple[List[str], List[
 
     except Exception as e:
         print(f"搜索失败: {str(e)}")
-        return [], []
+        return [], [], []
+
 
+def group_frame_hits(hits: List[Dict[str, Any]], aggregate: str = "max") -> List[Dict[str, Any]]:
+    """
+    将帧命中结果按视频聚合。
+
+    Args:
+        hits: 帧命中结果,包含 distance、video_id、at_seconds,可选 video_m_id
+        aggregate: 视频得分的聚合方式,'max' 取最相似帧的得分,'sum' 累加各帧得分
+
+    Returns:
+        List[Dict[str, Any]]: 按得分从高到低(同分按视频ID)排列的视频列表,
+            包含 video_id、video_m_id、score、timestamp(最相似帧的时间点)、hit_count
+    """
+    if aggregate not in ("max", "sum"):
+        raise ValueError(f"不支持的聚合方式: {aggregate}")
+
+    # IP 距离越大越相似,L2 距离越小越相似
+    sign = 1 if video_frame_operator.metric_type == "IP" else -1
+    groups: Dict[str, Dict[str, Any]] = {}
+    for hit in hits:
+        video_id = hit.get("video_id")
+        if video_id is None or hit.get("at_seconds") is None:
+            continue
+        similarity = sign * float(hit["distance"])
+        group = groups.get(video_id)
+        if group is None:
+            groups[video_id] = {
+                "video_id": video_id,
+                "video_m_id": hit.get("video_m_id"),
+                "score": similarity,
+                "best": similarity,
+                "timestamp": int(hit["at_seconds"]),
+                "hit_count": 1
+            }
+            continue
+        group["hit_count"] += 1
+        group["score"] = max(group["score"], similarity) if aggregate == "max" else group["score"] + similarity
+        if similarity > group["best"]:
+            group["best"] = similarity
+            group["timestamp"] = int(hit["at_seconds"])
+
+    videos = sorted(groups.values(), key=lambda item: (-item["score"], item["video_id"]))
+    for video in videos:
+        del video["best"]
+        video["score"] = round(video["score"], 6)
+    return videos
+
+
+def video_frame_search_grouped(
+        query: Union[str, Image.Image],
+        limit: int,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        search_profile: Optional[str] = None,
+        aggregate: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    按视频分组检索:多取若干帧后按视频聚合,再对视频分页。
 
-def image_to_frame(image_source: Union[str, Image.Image]) -> Tuple[List[str], List[int]]:
+    服务端支持分组检索(FRAME_SEARCH_GROUP_BY)时由 Milvus 按 video_id 分组返回,
+    否则取 FRAME_SEARCH_TOP_K 帧在本地聚合。排序键为(得分降序, 视频ID),
+    同一查询在数据不变时结果顺序稳定。
+
+    Args:
+        query: 文本、PIL.Image 对象、本地图片路径或在线图片URL
+        limit: 返回的视频数量
+        offset: 跳过的视频数量(按页码分页时使用)
+        cursor: 上一页最后一个视频的游标,提供时忽略 offset
+        search_profile: 检索配置
+        aggregate: 视频得分的聚合方式('max'|'sum'),默认使用 FRAME_SEARCH_AGGREGATE
+
+    Returns:
+        List[Dict[str, Any]]: 当前页的视频,包含 video_id、video_m_id、score、timestamp、hit_count、cursor
+
+    Raises:
+        ValueError: 当游标或聚合方式无效时
+    """
+    aggregate = aggregate or Config.FRAME_SEARCH_AGGREGATE
+    after = decode_cursor(cursor) if cursor else None
+
+    input_embedding = _query_embedding(query)
+    if input_embedding is None:
+        return []
+
+    if Config.FRAME_SEARCH_GROUP_BY:
+        hits = video_frame_operator.search_many(
+            input_embedding,
+            limit=Config.FRAME_SEARCH_MAX_VIDEOS,
+            output_fields=_frame_output_fields(),
+            search_profile=search_profile,
+            group_by_field="video_id",
+            group_size=Config.FRAME_SEARCH_GROUP_SIZE if aggregate == "sum" else 1
+        )[0]
+    else:
+        hits = video_frame_operator.search_many(
+            input_embedding,
+            limit=Config.FRAME_SEARCH_TOP_K,
+            output_fields=_frame_output_fields(),
+            search_profile=search_profile
+        )[0]
+
+    videos = group_frame_hits(hits, aggregate)
+    if after is not None:
+        videos = [video for video in videos if after_cursor(video["score"], video["video_id"], after)]
+    else:
+        videos = videos[offset:]
+
+    page = videos[:limit]
+    for video in page:
+        video["cursor"] = encode_cursor(video["score"], video["video_id"])
+    return page
+
+
+def image_to_frame(
+        image_source: Union[str, Image.Image],
+        search_profile: Optional[str] = None
+) -> Tuple[List[str], List[int], List[Optional[str]]]:
     """
     通过图片搜索视频帧。
 
@@ -151,30 +302,35 @@ def image_to_frame(image_source: Union[str, Image.Image]) -> Tuple[List[str], Li
             - 本地图片路径
             - 在线图片URL
             - PIL.Image 对象
+        search_profile: 检索配置
 
     Returns:
-        Tuple[List[str], List[int]]: 返回视频路径列表和对应的时间戳列表
+        Tuple[List[str], List[int], List[Optional[str]]]: 返回视频路径列表、对应的时间戳列表和视频主键列表
     """
-    return video_frame_search(image_source)
+    return video_frame_search(image_source, search_profile)
 
 
-def text_to_frame(text: str) -> Tuple[List[str], List[int]]:
+def text_to_frame(
+        text: str,
+        search_profile: Optional[str] = None
+) -> Tuple[List[str], List[int], List[Optional[str]]]:
     """
     通过文本搜索视频帧。
 
     Args:
         text: 搜索文本
+        search_profile: 检索配置
 
     Returns:
-        Tuple[List[str], List[int]]: 返回视频路径列表和对应的时间戳列表
+        Tuple[List[str], List[int], List[Optional[str]]]: 返回视频路径列表、对应的时间戳列表和视频主键列表
     """
-    return video_frame_search(text)
+    return video_frame_search(text, search_profile)
 
 
 if __name__ == "__main__":
     # 文本搜索示例
     print("\n=== 文本搜索测试 ===")
-    video_paths, at_seconds = text_to_frame("高速路")
+    video_paths, at_seconds, _ = text_to_frame("高速路")
     print("文本搜索结果:")
     print("视频路径:", video_paths)
     print("时间戳:", at_seconds)
@@ -183,7 +339,7 @@ if __name__ == "__main__":
     print("\n=== 本地图片搜索测试 ===")
     local_image_path = r"E:\workspace\ai-ground\dataset\traffic\CAM_BACK\1537295813887.jpg"
     if os.path.exists(local_image_path):
-        video_paths, at_seconds = image_to_frame(local_image_path)
+        video_paths, at_seconds, _ = image_to_frame(local_image_path)
         print("本地图片搜索结果:")
         print("视频路径:", video_paths)
         print("时间戳:", at_seconds)
@@ -192,7 +348,7 @@ if __name__ == "__main__":
     print("\n=== 在线图片搜索测试 ===")
     online_image_url = "http://10.66.12.37:30946/perception-mining/b7ec1001240181ceb5ec3e448c7f9b78.mp4_t_0.jpg"
     try:
-        video_paths, at_seconds = image_to_frame(online_image_url)
+        video_paths, at_seconds, _ = image_to_frame(online_image_url)
         print("在线图片搜索结果:")
         print("视频路径:", video_paths)
         print("时间戳:", at_seconds)
@@ -0,0 +1,70 @@
+"""
+对比 CN-CLIP 的 PyTorch 实现与 ONNX Runtime 实现生成的向量。
+
+两者写入同一个帧集合,向量必须一致:逐条计算余弦相似度与最大绝对误差,超出容差时以非零状态退出。
+
+用法:
+    python -m app.tests.embedding.clip_onnx_parity
+    python -m app.tests.embedding.clip_onnx_parity --min-cosine 0.9999 --max-abs-diff 0.01
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.utils.clip_embedding import ClipEmbedding
+from app.utils.clip_onnx_embedding import ClipOnnxEmbedding
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES = [
+    os.path.join(CURRENT_DIR, "256_1.png"),
+    os.path.join(CURRENT_DIR, "first_frame.png"),
+]
+TEXTS = ["一辆白色轿车在路口左转", "行人横穿马路", "夜间高速公路上的货车", "雨天"]
+
+
+def compare(name: str, expected: np.ndarray, actual: np.ndarray, min_cosine: float, max_abs_diff: float) -> bool:
+    """逐条比较两组向量,返回是否全部在容差内"""
+    ok = True
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        cosine = float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+        abs_diff = float(np.max(np.abs(a - b)))
+        passed = cosine >= min_cosine and abs_diff <= max_abs_diff
+        ok = ok and passed
+        print(f"{'通过' if passed else '失败'} {name}[{i}] 余弦相似度: {cosine:.6f} 最大绝对误差: {abs_diff:.6f}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比 CN-CLIP 的 PyTorch 与 ONNX Runtime 向量")
+    parser.add_argument("--min-cosine", type=float, default=0.9999, help="最低余弦相似度")
+    parser.add_argument("--max-abs-diff", type=float, default=0.01, help="最大绝对误差")
+    args = parser.parse_args()
+
+    # GPU 上的 PyTorch 实现使用半精度,固定在 CPU 上以 fp32 对比
+    torch_model = ClipEmbedding(device="cpu", quantize="none")
+    onnx_model = ClipOnnxEmbedding()
+    images = [Image.open(path).convert("RGB") for path in IMAGES]
+
+    start_time = time.time()
+    torch_images = torch_model.embedding_images(images)
+    torch_texts = torch_model.embedding_texts(TEXTS)
+    print(f"PyTorch 耗时: {time.time() - start_time:.2f}s")
+
+    start_time = time.time()
+    onnx_images = onnx_model.embedding_images(images)
+    onnx_texts = onnx_model.embedding_texts(TEXTS)
+    print(f"ONNX Runtime 耗时: {time.time() - start_time:.2f}s")
+
+    ok = compare("image", torch_images, onnx_images, args.min_cosine, args.max_abs_diff)
+    ok = compare("text", torch_texts, onnx_texts, args.min_cosine, args.max_abs_diff) and ok
+    print("向量一致" if ok else "向量不一致")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+评估 CN-CLIP 查询模型 INT8 动态量化(CLIP_QUERY_QUANTIZE=dynamic)相对 fp32 的检索质量偏移。
+
+量化只用于在线查询,帧向量始终由 fp32 模型写入,因此以"INT8 查询检索 fp32 帧向量"的召回率作为上线门槛。
+
+在一组未参与调参的帧图片与查询文本上分别用 fp32 与 INT8 模型向量化,输出:
+    - 图片/文本向量与 fp32 的余弦相似度(均值与最小值)
+    - Recall@K:以 fp32 查询在 fp32 帧向量上的 Top-K 为基准,INT8 查询检索 fp32 帧向量的召回率
+      (另输出 INT8 查询检索 INT8 帧向量的召回率供参考,该组合不会出现在线上)
+    - 单张图片/单条文本的推理耗时与权重大小
+召回率低于 --min-recall 时以非零状态退出。
+
+用法:
+    python -m app.tests.embedding.clip_quantization_drift --frames-dir data/holdout_frames
+    python -m app.tests.embedding.clip_quantization_drift --frames-dir data/holdout_frames --queries queries.txt --top-k 10
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+from typing import List, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+
+from app.utils.clip_embedding import ClipEmbedding
+
+DEFAULT_QUERIES = [
+    "高速路", "变道", "行人横穿", "夜间行车", "雨天路面", "隧道", "路口左转",
+    "前方车辆急刹", "大货车", "施工路段", "拥堵", "交通信号灯",
+]
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_frames(frames_dir: str, limit: int) -> List[Image.Image]:
+    paths = sorted(
+        os.path.join(frames_dir, name) for name in os.listdir(frames_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:limit]
+    if not paths:
+        raise ValueError(f"目录中没有图片: {frames_dir}")
+    return [Image.open(path).convert("RGB") for path in paths]
+
+
+def load_queries(path: str) -> List[str]:
+    if not path:
+        return DEFAULT_QUERIES
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def weight_size_mb(model: torch.nn.Module) -> float:
+    """序列化后的权重大小(量化层的 INT8 权重打包保存在 state_dict 中)"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1024 / 1024
+
+
+def embed(model: ClipEmbedding, images: List[Image.Image], queries: List[str]) -> Tuple[np.ndarray, np.ndarray, float, float]:
+    """返回归一化的图片/文本向量,以及单张图片、单条文本的平均耗时(毫秒)"""
+    start_time = time.time()
+    image_vectors = np.array([model.embedding_image(image) for image in images])
+    image_ms = (time.time() - start_time) * 1000 / len(images)
+
+    start_time = time.time()
+    text_vectors = np.array([model.embedding_text(query) for query in queries])
+    text_ms = (time.time() - start_time) * 1000 / len(queries)
+    return normalize(image_vectors), normalize(text_vectors), image_ms, text_ms
+
+
+def recall_at_k(queries: np.ndarray, frames: np.ndarray, reference: np.ndarray, k: int) -> float:
+    """queries 在 frames 上的 Top-K 与基准 Top-K 的重合比例"""
+    top_k = np.argsort(-(queries @ frames.T), axis=1)[:, :k]
+    hits = [len(set(row) & set(ref)) for row, ref in zip(top_k, reference)]
+    return sum(hits) / (len(reference) * k)
+
+
+def cosine_summary(a: np.ndarray, b: np.ndarray) -> str:
+    cosine = np.sum(a * b, axis=1)
+    return f"均值 {cosine.mean():.5f} 最小 {cosine.min():.5f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评估 CN-CLIP INT8 动态量化的检索质量偏移")
+    parser.add_argument("--frames-dir", required=True, help="留出集帧图片目录")
+    parser.add_argument("--queries", default="", help="查询文本文件(每行一条),默认使用内置查询")
+    parser.add_argument("--limit", type=int, default=500, help="最多使用的图片数")
+    parser.add_argument("--top-k", type=int, default=10, help="Recall@K 的 K")
+    parser.add_argument("--min-recall", type=float, default=0.9, help="INT8 查询检索 fp32 帧向量的最低召回率")
+    args = parser.parse_args()
+
+    images = load_frames(args.frames_dir, args.limit)
+    queries = load_queries(args.queries)
+    top_k = min(args.top_k, len(images))
+    print(f"留出集: {len(images)} 张图片, {len(queries)} 条查询, K={top_k}")
+
+    fp32_model = ClipEmbedding(device="cpu", quantize="none")
+    fp32_size = weight_size_mb(fp32_model.model)
+    fp32_images, fp32_texts, fp32_image_ms, fp32_text_ms = embed(fp32_model, images, queries)
+    del fp32_model
+
+    int8_model = ClipEmbedding(device="cpu", quantize="dynamic")
+    int8_size = weight_size_mb(int8_model.model)
+    int8_images, int8_texts, int8_image_ms, int8_text_ms = embed(int8_model, images, queries)
+
+    reference = np.argsort(-(fp32_texts @ fp32_images.T), axis=1)[:, :top_k]
+    query_only_recall = recall_at_k(int8_texts, fp32_images, reference, top_k)
+    full_recall = recall_at_k(int8_texts, int8_images, reference, top_k)
+
+    print(f"图片向量余弦相似度: {cosine_summary(fp32_images, int8_images)}")
+    print(f"文本向量余弦相似度: {cosine_summary(fp32_texts, int8_texts)}")
+    print(f"Recall@{top_k}(INT8 查询 / fp32 帧向量): {query_only_recall:.4f}")
+    print(f"Recall@{top_k}(INT8 查询 / INT8 帧向量,仅供参考): {full_recall:.4f}")
+    print(f"图片耗时: fp32 {fp32_image_ms:.1f}ms / INT8 {int8_image_ms:.1f}ms ({fp32_image_ms / int8_image_ms:.2f}x)")
+    print(f"文本耗时: fp32 {fp32_text_ms:.1f}ms / INT8 {int8_text_ms:.1f}ms ({fp32_text_ms / int8_text_ms:.2f}x)")
+    print(f"权重大小: fp32 {fp32_size:.0f}MB / INT8 {int8_size:.0f}MB ({fp32_size / int8_size:.2f}x)")
+
+    ok = query_only_recall >= args.min_recall
+    print("召回率达标" if ok else f"召回率低于 {args.min_recall}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,17 @@ from dotenv import load_dotenv
 from pymilvus import MilvusClient
 import logging
 
+from app.utils.milvus_connection import milvus_connections
+
 # 加载环境变量
 load_dotenv()
 
 
 class VideoCollectionPaginator:
-    """视频集合分页迭代器 - Milvus版本"""
+    """视频集合分页迭代器 - Milvus版本
+
+    基于 query_iterator 按主键顺序分批读取,每页代价相同,不受 offset + limit 上限约束。
+    """
 
     def __init__(self, client: MilvusClient, collection_name: str, page_size: int = 100):
         """
@@ -23,47 +28,44 @@ class VideoCollectionPaginator:
         self.client = client
         self.collection_name = collection_name
         self.page_size = page_size
-        self.current_offset = 0
+        self.fetched = 0
         self.logger = logging.getLogger(__name__)
 
         # 获取总数
         self.total = self.client.get_collection_stats(collection_name)["row_count"]
 
+        # 定义要查询的输出字段
+        output_fields = [
+            "m_id", "path", "thumbnail_path",
+            "title", "summary_txt", "tags"
+        ]
+        self.iterator = self.client.query_iterator(
+            collection_name=self.collection_name,
+            batch_size=self.page_size,
+            filter="",  # 无过滤条件
+            output_fields=output_fields
+        )
+
     def __iter__(self) -> Iterator[List[Dict[str, Any]]]:
         """实现迭代器接口"""
         return self
 
     def __next__(self) -> List[Dict[str, Any]]:
         """获取下一页数据"""
-        if self.current_offset >= self.total:
-            raise StopIteration
-
         try:
-            # 定义要查询的输出字段
-            output_fields = [
-                "m_id", "path", "thumbnail_path",
-                "title", "summary_txt", "tags"
-            ]
-
-            # 执行查询
-            results = self.client.query(
-                collection_name=self.collection_name,
-                filter="",  # 无过滤条件
-                output_fields=output_fields,
-                limit=self.page_size,
-                offset=self.current_offset
-            )
-
-            if not results:
-                raise StopIteration
-
-            self.current_offset += self.page_size
-            return results
-
+            results = self.iterator.next()
         except Exception as e:
-            self.logger.error(f"获取数据失败(offset={self.current_offset}): {str(e)}")
+            self.logger.error(f"获取数据失败(已读取{self.fetched}条): {str(e)}")
+            self.iterator.close()
             raise
 
+        if not results:
+            self.iterator.close()
+            raise StopIteration
+
+        self.fetched += len(results)
+        return results
+
 
 def get_video_paginator(
         host: str = None,
@@ -90,10 +92,7 @@ def get_video_paginator(
         if not db_name:
             db_name = os.getenv("DB_NAME")
 
-        client = MilvusClient(
-            uri=host,
-            db_name=db_name
-        )
+        client = milvus_connections.get_client(host, db_name)
         return VideoCollectionPaginator(client, collection_name, page_size)
 
     except Exception as e:
@@ -1,12 +1,17 @@
 import os
-from typing import Optional, List, Tuple
+import time
+from typing import Optional, List, Tuple, Union
+import numpy as np
 import torch
 # import cn_clip.clip as clip
 import cn_clip.clip as clip
 from cn_clip.clip import load_from_name, available_models
+from cn_clip.clip.model import convert_weights
+from cn_clip.clip.utils import create_model, image_transform
 from PIL import Image
 from config import Config
 from app.utils.embedding_base import EmbeddingBase
+from app.utils.logger import logger
 
 
 # # 从视频中提取帧，并跳过指定数量的帧。
@@ -57,25 +62,149 @@ from app.utils.embedding_base import EmbeddingBase
 #         print(f"Error processing video {video_path}: {e}")
 
 
+def load_clip_model(
+        checkpoint_path: str,
+        device: str,
+        vision_model_name: str,
+        text_model_name: str,
+        input_resolution: int,
+        mmap: bool = True,
+        quantize: str = "none"
+):
+    """
+    加载 CN-CLIP 模型。
+
+    与 cn_clip 的 load_from_name 不同,模型结构在 meta 设备上构建(不分配内存、不做随机初始化),
+    参数直接引用加载的权重张量:.safetensors 与 mmap 方式加载的 .pt 文件按需从磁盘分页读入,
+    不再先读出一份完整副本再复制进模型。
+
+    Args:
+        checkpoint_path: 权重文件路径(.pt 或 .safetensors)
+        device: 运行设备
+        vision_model_name: 视觉模型结构名
+        text_model_name: 文本模型结构名
+        input_resolution: 输入图片分辨率
+        mmap: 是否以 mmap 方式加载 .pt 文件
+        quantize: 量化方式,"dynamic" 表示在 CPU 上对全连接层做 INT8 动态量化
+
+    Returns:
+        (模型, 图片预处理函数)
+    """
+    start_time = time.time()
+    if checkpoint_path.endswith(".safetensors"):
+        from safetensors.torch import load_file
+        state_dict = load_file(checkpoint_path, device="cpu")
+    else:
+        checkpoint = torch.load(checkpoint_path, map_location="cpu", mmap=mmap)
+        state_dict = checkpoint.get("state_dict", checkpoint)
+    if next(iter(state_dict)).startswith("module"):
+        state_dict = {k[len("module."):]: v for k, v in state_dict.items() if "bert.pooler" not in k}
+
+    with torch.device("meta"):
+        model = create_model(f"{vision_model_name}@{text_model_name}")
+    model.load_state_dict(state_dict, assign=True)
+
+    if str(device) == "cpu":
+        model.float()
+        if quantize == "dynamic":
+            model = quantize_dynamic_int8(model)
+    else:
+        if quantize != "none":
+            logger.warning(f"INT8 量化仅支持 CPU 推理,{device} 上忽略 quantize={quantize}")
+        # 参数沿用权重文件中的精度,GPU 上与 cn_clip 一致使用半精度
+        convert_weights(model)
+        model.to(device)
+    logger.info(f"CN-CLIP 模型已加载({checkpoint_path}),耗时 {time.time() - start_time:.1f}s")
+    return model, image_transform(input_resolution)
+
+
+def quantize_dynamic_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    对模型中的全连接层做 INT8 动态量化(权重离线量化,激活在推理时按批量化)。
+
+    覆盖视觉塔 ResidualAttentionBlock.mlp 与 BERT 各层的 Linear,它们占 CPU 推理的大部分耗时;
+    nn.MultiheadAttention 的投影矩阵不在 PyTorch 动态量化的支持范围内,保持 fp32。
+    量化后向量与 fp32 存在少量偏差,只用于在线查询(CLIP_QUERY_QUANTIZE),帧向量始终以 fp32 写入;
+    上线前用 app/tests/embedding/clip_quantization_drift.py 评估 INT8 查询检索 fp32 帧向量的召回率。
+    """
+    start_time = time.time()
+    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    logger.info(f"CN-CLIP 全连接层已量化为 INT8,耗时 {time.time() - start_time:.1f}s")
+    return model
+
+
 class ClipEmbedding(EmbeddingBase):
-    """CN-CLIP模型实现"""
+    """CN-CLIP模型实现
+
+    模型较大,应通过 EmbeddingFactory.create_embedding(EmbeddingType.CLIP) 获取进程内共享的实例。
+    """
+
+    supports_batching = True
     
-    def __init__(self):
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model, self.processor = clip.load_from_name(
-            name=Config.CN_CLIP_MODEL_PATH,
+    def __init__(self, device: Optional[str] = None, quantize: str = "none"):
+        """
+        Args:
+            device: 运行设备,默认有 GPU 时使用 GPU
+            quantize: 量化方式(none/dynamic),仅用于查询模型,见 EmbeddingFactory.create_query_embedding
+        """
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.model, self.processor = load_clip_model(
+            Config.CN_CLIP_MODEL_PATH,
             device=self.device,
-            vision_model_name="ViT-L-14-336", 
+            vision_model_name="ViT-L-14-336",
             text_model_name="RoBERTa-wwm-ext-base-chinese",
-            input_resolution=336)
+            input_resolution=336,
+            mmap=Config.CLIP_LOAD_MMAP,
+            quantize=quantize
+        )
         self.model.eval()
         self.tokenizer = clip.tokenize
+
+    def warm_up(self) -> None:
+        """执行一次图片与文本推理,提前完成 CUDA 初始化与内核选择"""
+        self.embedding_text("预热")
+        self.embedding_images([Image.new("RGB", (336, 336))])
         
     def embedding_image(self, image: Image.Image) -> List[float]:
         process_image = self.processor(image).unsqueeze(0).to(self.device)
         with torch.no_grad():
             image_features = self.model.encode_image(process_image)
             return image_features[0].detach().cpu().numpy().tolist()
+
+    def preprocess_images(self, images: List[Image.Image]) -> torch.Tensor:
+        """将PIL图片列表预处理为 (N, 3, H, W) 张量"""
+        return torch.stack([self.processor(image) for image in images])
+
+    def embedding_images(
+            self,
+            images: Union[List[Image.Image], torch.Tensor],
+            batch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        批量生成图片embedding向量
+
+        Args:
+            images: PIL图片列表,或已预处理的 (N, 3, H, W) 张量
+            batch_size: 每次前向推理的微批大小,默认使用 VIDEO_FRAME_BATCH_SIZE
+        Returns:
+            np.ndarray: 形状为 (N, D) 的 float32 矩阵
+        """
+        batch_size = batch_size or Config.VIDEO_FRAME_BATCH_SIZE
+        total = len(images)
+        if total == 0:
+            return np.empty((0, self.model.visual.output_dim), dtype=np.float32)
+
+        features = []
+        with torch.no_grad():
+            for start in range(0, total, batch_size):
+                batch = images[start:start + batch_size]
+                # PIL图片按微批预处理,避免一次性堆叠全部帧
+                if not isinstance(batch, torch.Tensor):
+                    batch = self.preprocess_images(batch)
+                image_features = self.model.encode_image(batch.to(self.device))
+                features.append(image_features.float().cpu().numpy())
+
+        return np.concatenate(features, axis=0).astype(np.float32, copy=False)
             
     def embedding_text(self, text: str) -> List[float]:
         text = self.tokenizer([text]).to(self.device)
@@ -83,15 +212,21 @@ class ClipEmbedding(EmbeddingBase):
             text_features = self.model.encode_text(text)
             return text_features[0].detach().cpu().numpy().tolist()
             
+    def embedding_texts(self, texts: List[str]) -> np.ndarray:
+        """批量生成文本embedding向量,一次前向推理"""
+        tokens = self.tokenizer(texts).to(self.device)
+        with torch.no_grad():
+            text_features = self.model.encode_text(tokens)
+        return text_features.float().cpu().numpy().astype(np.float32, copy=False)
+            
     def embedding(self, image: Image.Image, text: str) -> Tuple[List[float], List[float]]:
         img_emb = self.embedding_image(image)
         txt_emb = self.embedding_text(text)
         return img_emb, txt_emb
 
 
-clip_embedding = ClipEmbedding()
-
 if __name__ == "__main__":
+    clip_embedding = ClipEmbedding()
     image_path = r"E:\playground\ai\datasets\bdd100k\bdd100k\images\10k\train\00a7ef03-00000000.jpg"
 
     pil_image = Image.open(image_path)
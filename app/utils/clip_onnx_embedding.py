@@ -0,0 +1,158 @@
+"""
+CN-CLIP 的 ONNX Runtime 实现。
+
+加载 cn_clip/deploy/pytorch_to_onnx.py 导出的图片与文本编码器(*.img.fp32.onnx / *.txt.fp32.onnx),
+预处理与分词沿用 PyTorch 实现,输出与 ClipEmbedding 一致的未归一化向量,可直接替换使用。
+适用于只有 CPU 的节点:图优化后的推理比 PyTorch eager 模式快,线程数可按节点核数配置。
+"""
+
+import os
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import onnxruntime as ort
+import torch
+import cn_clip.clip as clip
+from cn_clip.clip.utils import image_transform
+from PIL import Image
+
+from app.utils.embedding_base import EmbeddingBase
+from app.utils.logger import logger
+from config import Config
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+def create_session(model_path: str) -> ort.InferenceSession:
+    """按配置创建 CPU 推理会话(图优化级别、算子内/算子间线程数)"""
+    if not os.path.isfile(model_path):
+        raise FileNotFoundError(f"ONNX 模型不存在: {model_path},请先使用 cn_clip/deploy/pytorch_to_onnx.py 导出")
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[Config.ONNX_GRAPH_OPTIMIZATION]
+    if Config.ONNX_INTRA_OP_THREADS > 0:
+        options.intra_op_num_threads = Config.ONNX_INTRA_OP_THREADS
+    if Config.ONNX_INTER_OP_THREADS > 0:
+        options.inter_op_num_threads = Config.ONNX_INTER_OP_THREADS
+        options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+    return ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+class ClipOnnxEmbedding(EmbeddingBase):
+    """CN-CLIP 模型的 ONNX Runtime 实现"""
+
+    def __init__(
+            self,
+            image_model_path: Optional[str] = None,
+            text_model_path: Optional[str] = None,
+            input_resolution: int = 336
+    ):
+        """
+        Args:
+            image_model_path: 图片编码器 ONNX 文件,默认 CLIP_ONNX_IMAGE_MODEL
+            text_model_path: 文本编码器 ONNX 文件,默认 CLIP_ONNX_TEXT_MODEL
+            input_resolution: 输入图片分辨率
+        """
+        self.image_session = create_session(image_model_path or Config.CLIP_ONNX_IMAGE_MODEL)
+        self.text_session = create_session(text_model_path or Config.CLIP_ONNX_TEXT_MODEL)
+        self.processor = image_transform(input_resolution)
+        self.tokenizer = clip.tokenize
+
+        image_input = self.image_session.get_inputs()[0]
+        text_input = self.text_session.get_inputs()[0]
+        self._image_input, self._image_output = image_input.name, self.image_session.get_outputs()[0].name
+        self._text_input, self._text_output = text_input.name, self.text_session.get_outputs()[0].name
+        # 文本长度与导出时一致
+        self._context_length = text_input.shape[1] if isinstance(text_input.shape[1], int) else 52
+        # 导出时未声明动态批维度的模型只能逐条推理
+        self._image_batch = image_input.shape[0] if isinstance(image_input.shape[0], int) else None
+        self._text_batch = text_input.shape[0] if isinstance(text_input.shape[0], int) else None
+        self.supports_batching = self._image_batch is None and self._text_batch is None
+        self.output_dim = self.image_session.get_outputs()[0].shape[-1]
+        logger.info(
+            f"CN-CLIP ONNX 模型已加载,批维度: 图片 {self._image_batch or '动态'} / 文本 {self._text_batch or '动态'}"
+        )
+
+    @staticmethod
+    def _run(session: ort.InferenceSession, input_name: str, output_name: str, data: np.ndarray) -> np.ndarray:
+        """通过 IO binding 执行推理,输入直接绑定到已有的内存,避免额外复制"""
+        binding = session.io_binding()
+        binding.bind_cpu_input(input_name, np.ascontiguousarray(data))
+        binding.bind_output(output_name)
+        session.run_with_iobinding(binding)
+        return binding.copy_outputs_to_cpu()[0]
+
+    def _run_batches(
+            self,
+            session: ort.InferenceSession,
+            input_name: str,
+            output_name: str,
+            data: np.ndarray,
+            fixed_batch: Optional[int],
+            batch_size: int
+    ) -> np.ndarray:
+        step = fixed_batch or batch_size
+        features = []
+        for start in range(0, len(data), step):
+            chunk = data[start:start + step]
+            size = len(chunk)
+            # 固定批维度的模型:最后一批补齐后推理,只取有效部分
+            if fixed_batch and size < fixed_batch:
+                padding = np.zeros((fixed_batch - size,) + chunk.shape[1:], dtype=chunk.dtype)
+                chunk = np.concatenate([chunk, padding], axis=0)
+            features.append(self._run(session, input_name, output_name, chunk)[:size])
+        return np.concatenate(features, axis=0).astype(np.float32, copy=False)
+
+    def preprocess_images(self, images: List[Image.Image]) -> torch.Tensor:
+        """将PIL图片列表预处理为 (N, 3, H, W) 张量"""
+        return torch.stack([self.processor(image) for image in images])
+
+    def embedding_image(self, image: Image.Image) -> List[float]:
+        return self.embedding_images([image])[0].tolist()
+
+    def embedding_images(
+            self,
+            images: Union[List[Image.Image], torch.Tensor],
+            batch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        批量生成图片embedding向量
+
+        Args:
+            images: PIL图片列表,或已预处理的 (N, 3, H, W) 张量
+            batch_size: 每次推理的微批大小,默认使用 VIDEO_FRAME_BATCH_SIZE
+        Returns:
+            np.ndarray: 形状为 (N, D) 的 float32 矩阵
+        """
+        if len(images) == 0:
+            return np.empty((0, self.output_dim), dtype=np.float32)
+        if not isinstance(images, torch.Tensor):
+            images = self.preprocess_images(images)
+        return self._run_batches(
+            self.image_session, self._image_input, self._image_output, images.numpy(),
+            self._image_batch, batch_size or Config.VIDEO_FRAME_BATCH_SIZE
+        )
+
+    def embedding_text(self, text: str) -> List[float]:
+        return self.embedding_texts([text])[0].tolist()
+
+    def embedding_texts(self, texts: List[str]) -> np.ndarray:
+        """批量生成文本embedding向量"""
+        tokens = self.tokenizer(texts, context_length=self._context_length).numpy()
+        return self._run_batches(
+            self.text_session, self._text_input, self._text_output, tokens,
+            self._text_batch, len(texts)
+        )
+
+    def embedding(self, image: Image.Image, text: str) -> Tuple[List[float], List[float]]:
+        return self.embedding_image(image), self.embedding_text(text)
+
+    def warm_up(self) -> None:
+        """执行一次图片与文本推理,完成图优化与内存分配"""
+        self.embedding_text("预热")
+        self.embedding_images([Image.new("RGB", (336, 336))])
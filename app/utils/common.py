@@ -1,4 +1,6 @@
 from .minio_uploader import MinioFileUploader
+from .frame_sampler import FrameSampler
+from .frame_cache import frame_cache
 import shortuuid
 import requests
 import os
@@ -10,8 +12,8 @@ import ffmpeg
 
 
 def upload_thumbnail_to_oss(object_name, file_path):
-    # 创建 MinioFileUploader 实例
-    uploader = MinioFileUploader()
+    # 复用进程内共享的 MinioFileUploader 实例
+    uploader = MinioFileUploader.get_instance()
     return uploader.upload_file(object_name, file_path)
 
 
@@ -28,41 +30,20 @@ def extract_frames_from_video(video_url, output_dir, frame_interval=1):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # 打开视频文件
-    cap = cv2.VideoCapture(video_url)
+    # 按秒间隔打开视频
+    with FrameSampler(video_url, interval_seconds=frame_interval) as sampler:
+        frame_interval_frames = sampler.frame_interval
 
-    # 获取视频的帧率
-    fps = cap.get(cv2.CAP_PROP_FPS)
+        # 计算图片名称补全位数
+        total_frames_count = sampler.frame_count / frame_interval_frames
+        num_digits = len(str(int(total_frames_count)))
 
-    # 获取视频的总帧数
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-    # 计算抽帧间隔
-    frame_interval_frames = int(fps * frame_interval)
-
-    # 计算图片名称补全位数
-    total_frames_count = total_frames / frame_interval_frames
-    num_digits = len(str(int(total_frames_count)))
-
-    # 初始化帧计数器
-    frame_count = 0
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        if frame_count % frame_interval_frames == 0:
+        for frame_count, frame in sampler:
             # 构建保存路径
             frame_path = os.path.join(output_dir, f'frame_{frame_count // frame_interval_frames:0{num_digits}d}.jpg')
             # 保存帧
             cv2.imwrite(frame_path, frame)
-            # print(f'Saved frame: {frame_path}')
-
-        frame_count += 1
 
-    # 释放视频捕获对象
-    cap.release()
     print('Done extracting frames.')
 
 
@@ -86,10 +67,25 @@ def video_frames_and_convert_to_base64(image_folder):
 
 
 def extract_frames_and_convert_to_base64(video_url):
-    frames_image_folder = os.path.join("/tmp", get_uuid())
-    extract_frames_from_video(video_url, frames_image_folder)
-    base64_images = video_frames_and_convert_to_base64(frames_image_folder)
-    return base64_images
+    # 从视频帧缓存中按时间戳取每秒最接近的一帧(下标即秒数),未缓存时解码一次并写入缓存
+    with frame_cache.acquire(video_url) as cached_video:
+        frame_paths = cached_video.frame_paths_per_seconds(1)
+        return [encode_image(frame_path) for frame_path in frame_paths]
+
+
+def generate_thumbnail(video_url: str, thumbnail_path: str, time_seconds: float) -> None:
+    """
+    生成视频指定时间点的缩略图,优先使用视频帧缓存,未缓存时回退到 ffmpeg
+
+    Args:
+        video_url: 视频URL
+        thumbnail_path: 缩略图保存路径
+        time_seconds: 指定的时间点(秒)
+    """
+    with frame_cache.acquire(video_url, create=False) as cached_video:
+        if cached_video is not None and cached_video.save_thumbnail(time_seconds, thumbnail_path, width=1280):
+            return
+    generate_thumbnail_from_video(video_url, thumbnail_path, time_seconds)
 
 
 def get_uuid():
@@ -0,0 +1,39 @@
+"""
+分页游标。
+
+游标是对排序键(得分, 主键)的不透明编码:检索结果按(得分降序, 主键)排序,
+列表结果按主键排序(得分为空)。下一页只取排序键大于游标的记录,
+无需跳过前面的结果,任意页的代价与第一页相同。
+"""
+
+import base64
+import json
+from typing import Optional, Tuple
+
+
+def encode_cursor(score: Optional[float], key: str) -> str:
+    """将排序键(得分, 主键)编码为分页游标,按主键分页时得分为None"""
+    payload = json.dumps({"s": score, "v": key}, ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[float], str]:
+    """
+    解码分页游标。
+
+    Raises:
+        ValueError: 游标格式无效时
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        score = payload["s"]
+        return (None if score is None else float(score)), str(payload["v"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+
+def after_cursor(score: Optional[float], key: str, cursor: Tuple[Optional[float], str]) -> bool:
+    """判断排序键(得分, 主键)是否排在游标之后(得分降序, 主键升序)"""
+    if cursor[0] is None or score is None:
+        return key > cursor[1]
+    return (-score, key) > (-cursor[0], cursor[1])
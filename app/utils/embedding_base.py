@@ -1,21 +1,50 @@
 from abc import ABC, abstractmethod
-from typing import Tuple, List
+from typing import Tuple, List, Optional
+import numpy as np
 from PIL import Image
 
 class EmbeddingBase(ABC):
     """多模态向量化基类"""
+
+    # 是否支持单次前向推理处理多条输入(本地模型),支持时查询请求可合并为微批
+    supports_batching = False
     
     @abstractmethod
     def embedding_image(self, image: Image.Image) -> List[float]:
         """生成图片embedding向量"""
         pass
+
+    def embedding_images(self, images: List[Image.Image], batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        批量生成图片embedding向量
+
+        默认实现逐张调用 embedding_image,支持批量推理的子类应覆盖此方法。
+
+        Args:
+            images: 图片列表
+            batch_size: 每次推理的微批大小,默认实现中不使用
+        Returns:
+            np.ndarray: 形状为 (N, D) 的 float32 矩阵
+        """
+        return np.asarray([self.embedding_image(image) for image in images], dtype=np.float32)
         
     @abstractmethod 
     def embedding_text(self, text: str) -> List[float]:
         """生成文本embedding向量"""
         pass
+
+    def embedding_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        批量生成文本embedding向量
+
+        默认实现逐条调用 embedding_text,支持批量推理的子类应覆盖此方法。
+
+        Returns:
+            np.ndarray: 形状为 (N, D) 的 float32 矩阵
+        """
+        return np.asarray([self.embedding_text(text) for text in texts], dtype=np.float32)
         
     @abstractmethod
     def embedding(self, image: Image.Image, text: str) -> Tuple[List[float], List[float]]:
         """生成图文联合embedding向量"""
-        pass 
\ No newline at end of file
+        pass 
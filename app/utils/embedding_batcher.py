@@ -0,0 +1,162 @@
+"""
+查询向量化微批调度。
+
+并发的检索请求各自只向量化一条文本或一张图片,直接调用共享模型时以批大小1逐个执行。
+BatchingEmbedding 在模型前为文本与图片分别维护一个请求队列:后台线程取到第一个请求后
+最多再等待 EMBEDDING_BATCH_MAX_WAIT_MS 毫秒凑批(或凑满 EMBEDDING_BATCH_MAX_SIZE 条),
+一次前向推理后把结果交还给各请求的 Future。文本与图片两路互不阻塞。
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.utils.embedding_base import EmbeddingBase
+from app.utils.logger import logger
+
+
+class MicroBatcher:
+    """将单条请求合并为批次执行"""
+
+    def __init__(
+            self,
+            name: str,
+            batch_fn: Callable[[List[Any]], np.ndarray],
+            max_batch_size: int = 32,
+            max_wait_ms: float = 5.0
+    ):
+        """
+        Args:
+            name: 队列名称(用于线程名与日志)
+            batch_fn: 批处理函数,输入请求列表,返回与之对应的 (N, D) 结果
+            max_batch_size: 单批最大请求数
+            max_wait_ms: 取到第一个请求后最长等待凑批的时间(毫秒)
+        """
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+
+        # 统计
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_observed_batch = 0
+
+        self._thread = threading.Thread(target=self._run, name=f"embedding-batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """提交一条请求,返回结果的 Future"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": self.max_observed_batch
+            }
+
+    def _collect(self) -> List[Tuple[Any, Future]]:
+        """阻塞取到第一个请求后,在等待时间内继续收集,直到凑满一批"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # 等待时间耗尽后仍取走已在队列中的请求,不额外等待
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            # 已取消的请求不参与推理
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+            except Exception as e:
+                logger.error(f"向量化微批 {self.name} 失败({len(batch)} 条): {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.max_observed_batch = max(self.max_observed_batch, len(batch))
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+class BatchingEmbedding(EmbeddingBase):
+    """在共享模型前合并单条查询的向量化请求,其余调用直接转发给模型"""
+
+    supports_batching = True
+
+    def __init__(self, embedding: EmbeddingBase, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """
+        Args:
+            embedding: 支持批量推理的模型实例
+            max_batch_size: 单批最大请求数
+            max_wait_ms: 凑批最长等待时间(毫秒)
+        """
+        # 不能命名为 embedding,否则实例属性会遮蔽 embedding(image, text) 方法
+        self.model_embedding = embedding
+        self.text_batcher = MicroBatcher("text", embedding.embedding_texts, max_batch_size, max_wait_ms)
+        self.image_batcher = MicroBatcher("image", self._embed_images, max_batch_size, max_wait_ms)
+
+    def _embed_images(self, items: List[Any]) -> np.ndarray:
+        preprocess = getattr(self.model_embedding, "preprocess_images", None)
+        if preprocess is None:
+            return self.model_embedding.embedding_images(items)
+        # 请求线程已完成预处理,这里只拼接张量做一次前向推理
+        import torch
+        return self.model_embedding.embedding_images(torch.cat(items), batch_size=len(items))
+
+    def embedding_text(self, text: str) -> List[float]:
+        return self.text_batcher.submit(text).result().tolist()
+
+    def _image_item(self, image: Image.Image) -> Any:
+        # 预处理在请求线程中并行完成,不占用推理线程
+        preprocess = getattr(self.model_embedding, "preprocess_images", None)
+        return preprocess([image]) if preprocess is not None else image
+
+    def embedding_image(self, image: Image.Image) -> List[float]:
+        return self.image_batcher.submit(self._image_item(image)).result().tolist()
+
+    def embedding_texts(self, texts: List[str]) -> np.ndarray:
+        return self.model_embedding.embedding_texts(texts)
+
+    def embedding_images(self, images, batch_size=None) -> np.ndarray:
+        return self.model_embedding.embedding_images(images, batch_size=batch_size)
+
+    def embedding(self, image: Image.Image, text: str) -> Tuple[List[float], List[float]]:
+        image_future = self.image_batcher.submit(self._image_item(image))
+        text_future = self.text_batcher.submit(text)
+        return image_future.result().tolist(), text_future.result().tolist()
+
+    def stats(self) -> Dict[str, Any]:
+        """各队列的批次统计"""
+        return {"text": self.text_batcher.stats(), "image": self.image_batcher.stats()}
+
+    def __getattr__(self, name: str) -> Any:
+        # 其他属性(如 preprocess_images、warm_up、model)转发给模型实例
+        if name == "model_embedding":
+            raise AttributeError(name)
+        return getattr(self.model_embedding, name)
@@ -1,19 +1,46 @@
-from typing import Optional, Dict
+import threading
+import time
+from typing import Dict, Iterable, Optional
 from app.utils.embedding_base import EmbeddingBase
-from app.utils.clip_embedding import ClipEmbedding
-from app.utils.multimodal_embedding import MultiModalEmbedding
 from app.utils.embedding_types import EmbeddingType
+from app.utils.logger import logger
 from config import Config
 
 
 class EmbeddingFactory:
-    """Embedding模型工厂类"""
+    """Embedding模型工厂类
+
+    每种模型在进程内只加载一次,首次使用时才加载(线程安全);
+    模型实现延迟导入,不使用本地模型的进程无需导入 torch 与模型代码。
+    """
 
     # 使用字典存储实例
-    _instances: Dict[EmbeddingType, Optional[EmbeddingBase]] = {
-        EmbeddingType.CLIP: None,
-        EmbeddingType.MULTIMODAL: None
-    }
+    _instances: Dict[EmbeddingType, EmbeddingBase] = {}
+    # 在线查询使用的微批调度实例
+    _batchers: Dict[EmbeddingType, EmbeddingBase] = {}
+    # 在线查询专用的量化模型(CLIP_QUERY_QUANTIZE),帧向量化不使用
+    _query_models: Dict[EmbeddingType, EmbeddingBase] = {}
+    # 每种模型一把加载锁,加载 CLIP 时不阻塞其他模型
+    _locks: Dict[EmbeddingType, threading.Lock] = {}
+    _locks_guard = threading.Lock()
+
+    @staticmethod
+    def _build(model_type: EmbeddingType) -> EmbeddingBase:
+        if model_type == EmbeddingType.CLIP:
+            from app.utils.clip_embedding import ClipEmbedding
+            return ClipEmbedding()
+        if model_type == EmbeddingType.CLIP_ONNX:
+            from app.utils.clip_onnx_embedding import ClipOnnxEmbedding
+            return ClipOnnxEmbedding()
+        if model_type == EmbeddingType.MULTIMODAL:
+            from app.utils.multimodal_embedding import MultiModalEmbedding
+            return MultiModalEmbedding()
+        raise ValueError(f"不支持的模型类型: {model_type}")
+
+    @classmethod
+    def _lock_for(cls, model_type: EmbeddingType) -> threading.Lock:
+        with cls._locks_guard:
+            return cls._locks.setdefault(model_type, threading.Lock())
 
     @classmethod
     def create_embedding(cls, model_type: Optional[EmbeddingType] = None) -> EmbeddingBase:
@@ -28,11 +55,116 @@ class EmbeddingFactory:
         if model_type is None:
             model_type = Config.get_embedding_model_type()
 
-        # 如果实例不存在,创建新实例
-        if cls._instances[model_type] is None:
-            if model_type == EmbeddingType.CLIP:
-                cls._instances[model_type] = ClipEmbedding()
-            elif model_type == EmbeddingType.MULTIMODAL:
-                cls._instances[model_type] = MultiModalEmbedding()
+        instance = cls._instances.get(model_type)
+        if instance is not None:
+            return instance
+
+        # 并发的首次调用只有一个线程加载,其余等待后复用
+        with cls._lock_for(model_type):
+            instance = cls._instances.get(model_type)
+            if instance is None:
+                start_time = time.time()
+                instance = cls._build(model_type)
+                cls._instances[model_type] = instance
+                logger.info(f"向量化模型 {model_type.value} 已加载,耗时 {time.time() - start_time:.1f}s")
+        return instance
+
+    @classmethod
+    def create_query_embedding(cls, model_type: Optional[EmbeddingType] = None) -> EmbeddingBase:
+        """
+        获取用于在线查询的Embedding实例。
+
+        CPU 上配置了 CLIP_QUERY_QUANTIZE 时 CLIP 查询使用单独加载的量化模型,入库的帧向量仍由
+        create_embedding 返回的 fp32 模型生成,同一集合中不会混入量化向量。
+        EMBEDDING_BATCHING 开启且模型支持批量推理时,返回合并并发请求的 BatchingEmbedding
+        (每种模型一个),否则返回模型实例本身。
+        """
+        if model_type is None:
+            model_type = Config.get_embedding_model_type()
+
+        embedding = cls._query_model(model_type)
+        if not Config.EMBEDDING_BATCHING or not embedding.supports_batching:
+            return embedding
+
+        batcher = cls._batchers.get(model_type)
+        if batcher is None:
+            with cls._lock_for(model_type):
+                batcher = cls._batchers.get(model_type)
+                if batcher is None:
+                    from app.utils.embedding_batcher import BatchingEmbedding
+                    batcher = BatchingEmbedding(
+                        embedding,
+                        max_batch_size=Config.EMBEDDING_BATCH_MAX_SIZE,
+                        max_wait_ms=Config.EMBEDDING_BATCH_MAX_WAIT_MS
+                    )
+                    cls._batchers[model_type] = batcher
+        return batcher
+
+    @classmethod
+    def query_quantize(cls, model_type: EmbeddingType) -> str:
+        """查询模型实际使用的量化方式(仅 CPU 上的 CLIP 支持量化)"""
+        if model_type != EmbeddingType.CLIP or Config.CLIP_QUERY_QUANTIZE == "none":
+            return "none"
+        import torch
+        return "none" if torch.cuda.is_available() else Config.CLIP_QUERY_QUANTIZE
+
+    @classmethod
+    def _query_model(cls, model_type: EmbeddingType) -> EmbeddingBase:
+        quantize = cls.query_quantize(model_type)
+        if quantize == "none":
+            return cls.create_embedding(model_type)
+
+        instance = cls._query_models.get(model_type)
+        if instance is None:
+            with cls._lock_for(model_type):
+                instance = cls._query_models.get(model_type)
+                if instance is None:
+                    from app.utils.clip_embedding import ClipEmbedding
+                    start_time = time.time()
+                    instance = ClipEmbedding(device="cpu", quantize=quantize)
+                    cls._query_models[model_type] = instance
+                    logger.info(f"查询模型 {model_type.value}({quantize}) 已加载,耗时 {time.time() - start_time:.1f}s")
+        return instance
+
+    @classmethod
+    def is_loaded(cls, model_type: Optional[EmbeddingType] = None) -> bool:
+        return (model_type or Config.get_embedding_model_type()) in cls._instances
+
+    @classmethod
+    def warm_up(
+            cls,
+            model_types: Optional[Iterable[EmbeddingType]] = None,
+            background: bool = True,
+            query_model_types: Iterable[EmbeddingType] = ()
+    ) -> Optional[threading.Thread]:
+        """
+        加载并预热模型,避免首个请求承担加载与首次推理的耗时。
+
+        Args:
+            model_types: 要预热的模型类型,默认为配置的模型
+            background: 是否在后台线程中执行
+            query_model_types: 要预热的在线查询模型类型(见 create_query_embedding)
+
+        Returns:
+            Optional[threading.Thread]: 后台执行时返回预热线程
+        """
+        model_types = list(dict.fromkeys(model_types or [Config.get_embedding_model_type()]))
+        targets = [(model_type, cls.create_embedding) for model_type in model_types]
+        targets += [(model_type, cls._query_model) for model_type in dict.fromkeys(query_model_types)]
+
+        def run():
+            for model_type, create in targets:
+                try:
+                    embedding = create(model_type)
+                    # 远程 API 模型没有预热步骤
+                    if hasattr(embedding, "warm_up"):
+                        embedding.warm_up()
+                except Exception as e:
+                    logger.warning(f"预热向量化模型 {model_type.value} 失败,将在首次使用时加载: {str(e)}")
 
-        return cls._instances[model_type]
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="embedding-warmup", daemon=True)
+        thread.start()
+        return thread
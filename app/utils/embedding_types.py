@@ -3,4 +3,5 @@ from enum import Enum
 class EmbeddingType(Enum):
     """Embedding模型类型枚举"""
     CLIP = 'clip'
-    MULTIMODAL = 'multimodal' 
\ No newline at end of file
+    MULTIMODAL = 'multimodal'
+    CLIP_ONNX = 'clip_onnx'  # CN-CLIP 的 ONNX Runtime 实现,向量与 CLIP 一致 
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+视频指纹索引。
+
+入库前用文件内容的 SHA-256(可选附加少量帧的感知哈希)判断视频是否已入库,
+重复上传在任何上传、向量化、大模型调用之前即可返回。索引保存在本地 SQLite 中,
+同一主机上的多个工作进程共享;入库中的视频先登记为 pending,避免并发重复处理。
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+
+from app.utils.frame_cache import frame_cache, warm_cache
+from app.utils.frame_sampler import FrameSampler
+from config import Config
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+
+
+def compute_phash(source: str, samples: int = 3) -> List[int]:
+    """
+    计算视频的感知哈希:在时间轴上均匀取若干帧,每帧计算64位差值哈希(dHash)。
+
+    Args:
+        source: 视频文件路径
+        samples: 采样帧数
+
+    Returns:
+        List[int]: 每个采样帧的64位哈希
+    """
+    hashes = []
+    with FrameSampler(source) as sampler:
+        if sampler.frame_count <= 0:
+            return hashes
+        # 取 1/(n+1) ... n/(n+1) 位置的帧,避开片头片尾
+        sampler.frame_interval = max(1, sampler.frame_count // (samples + 1))
+        sampler.seek_threshold = 1
+        for frame_number, frame in sampler:
+            if frame_number == 0:
+                continue
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+            bits = (small[:, 1:] > small[:, :-1]).flatten()
+            hashes.append(int(sum(1 << i for i, bit in enumerate(bits) if bit)))
+            if len(hashes) >= samples:
+                break
+    return hashes
+
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class FingerprintIndex:
+    """基于 SQLite 的视频指纹索引"""
+
+    def __init__(self, db_path: str, pending_ttl: int):
+        """
+        Args:
+            db_path: SQLite 数据库文件路径
+            pending_ttl: pending 记录的有效期(秒),超时视为入库进程已崩溃
+        """
+        self.db_path = db_path
+        self.pending_ttl = pending_ttl
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                "content_hash TEXT PRIMARY KEY, video_url TEXT, phash TEXT, status TEXT, updated_at REAL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # 每次操作使用独立连接,可在多线程/多进程间安全使用
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_record(row) -> Dict[str, Any]:
+        return {
+            "content_hash": row[0],
+            "video_url": row[1],
+            "phash": json.loads(row[2]) if row[2] else None,
+            "status": row[3]
+        }
+
+    def _is_stale(self, status: str, updated_at: float) -> bool:
+        return status == STATUS_PENDING and updated_at < time.time() - self.pending_ttl
+
+    def lookup(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """按内容哈希查找指纹记录"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT content_hash, video_url, phash, status, updated_at FROM fingerprints WHERE content_hash = ?",
+                (content_hash,)
+            ).fetchone()
+        if row is None or self._is_stale(row[3], row[4]):
+            return None
+        return self._to_record(row)
+
+    def reserve(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        登记即将入库的视频。
+
+        Returns:
+            Optional[Dict[str, Any]]: 已存在(已入库或正在入库)时返回已有记录,登记成功返回None
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT content_hash, video_url, phash, status, updated_at FROM fingerprints WHERE content_hash = ?",
+                (content_hash,)
+            ).fetchone()
+            if row is not None and not self._is_stale(row[3], row[4]):
+                return self._to_record(row)
+            conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (content_hash, video_url, phash, status, updated_at) "
+                "VALUES (?, NULL, NULL, ?, ?)",
+                (content_hash, STATUS_PENDING, time.time())
+            )
+        return None
+
+    def complete(self, content_hash: str, video_url: str, phash: Optional[List[int]] = None) -> None:
+        """入库完成后记录视频地址与感知哈希"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (content_hash, video_url, phash, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (content_hash, video_url, json.dumps(phash) if phash else None, STATUS_DONE, time.time())
+            )
+
+    def release(self, content_hash: str) -> None:
+        """入库失败时撤销 pending 登记"""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM fingerprints WHERE content_hash = ? AND status = ?",
+                (content_hash, STATUS_PENDING)
+            )
+
+    def find_similar(self, phash: List[int], max_distance: int) -> Optional[Dict[str, Any]]:
+        """
+        查找感知哈希相近的已入库视频(每个采样帧的汉明距离都不超过阈值)。
+
+        Args:
+            phash: 待比较视频的感知哈希
+            max_distance: 单帧允许的最大汉明距离
+        """
+        if not phash:
+            return None
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT content_hash, video_url, phash, status, updated_at FROM fingerprints "
+                "WHERE status = ? AND phash IS NOT NULL",
+                (STATUS_DONE,)
+            ).fetchall()
+        for row in rows:
+            other = json.loads(row[2])
+            if len(other) == len(phash) and all(_hamming(a, b) <= max_distance for a, b in zip(phash, other)):
+                return self._to_record(row)
+        return None
+
+
+def warm_cache_unless_known(source: str) -> Tuple[str, str, Optional[int]]:
+    """
+    已入库的视频只计算内容哈希,否则按 warm_cache 解码写入缓存。
+
+    与 warm_cache 一样只依赖轻量模块,可在进程池中执行。
+
+    Returns:
+        Tuple[str, str, Optional[int]]: (视频路径, 内容哈希, 缓存帧数),已入库时帧数为None
+    """
+    key = frame_cache.key_for(source)
+    record = fingerprint_index.lookup(key)
+    if record is not None and record["status"] == STATUS_DONE:
+        return source, key, None
+    return warm_cache(source)
+
+
+fingerprint_index = FingerprintIndex(
+    db_path=Config.FINGERPRINT_DB_PATH,
+    pending_ttl=Config.FINGERPRINT_PENDING_TTL
+)
@@ -0,0 +1,342 @@
+"""
+视频帧本地磁盘缓存。
+
+一个视频只解码一次:按 VIDEO_FRAME_INTERVAL 稀疏采样得到的帧以 JPEG 形式
+写入本地缓存目录,连同 fps、时长、总帧数等元数据一起按文件内容哈希索引。
+上传、标题生成、缩略图、摘要与挖掘都从缓存读取帧,不再各自打开视频。
+远程地址(如OSS URL)通过别名映射到同一缓存条目;缓存总大小超过上限时按
+最近访问时间(LRU)淘汰,正在使用的条目(pin)不会被淘汰。
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.utils.frame_sampler import FrameSampler
+from app.utils.logger import logger
+from config import Config
+
+_META_FILE = "meta.json"
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """流式计算文件内容的 SHA-256"""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class CachedVideo:
+    """缓存中的一个视频:采样帧文件与元数据"""
+
+    def __init__(self, key: str, path: str, meta: Dict):
+        self.key = key
+        self.path = path
+        self.fps = meta["fps"]
+        self.duration = meta["duration"]
+        self.frame_count = meta["frame_count"]
+        self.frame_interval = meta["frame_interval"]
+        # [(帧号, 文件名), ...]
+        self.frames: List[Tuple[int, str]] = [tuple(item) for item in meta["frames"]]
+
+    def timestamp(self, frame_number: int) -> int:
+        """帧号对应的时间点(秒)"""
+        return int(frame_number / self.fps) if self.fps else 0
+
+    def frame_paths(self, step: int = 1) -> List[str]:
+        """按步长返回缓存帧文件路径"""
+        return [os.path.join(self.path, name) for _, name in self.frames[::max(1, step)]]
+
+    def iter_frames(self, step: int = 1) -> Iterator[Tuple[int, np.ndarray]]:
+        """按步长读取缓存帧,产出 (时间戳秒, BGR图像)"""
+        for frame_number, name in self.frames[::max(1, step)]:
+            yield self.timestamp(frame_number), cv2.imread(os.path.join(self.path, name))
+
+    def frame_paths_per_seconds(self, interval_seconds: float = 1) -> List[str]:
+        """
+        按时间轴每隔 interval_seconds 秒取最接近该时间点的缓存帧路径。
+
+        返回列表的下标与时间点一一对应(第 i 个为第 i*interval_seconds 秒),
+        缓存帧间隔大于该间隔时相邻时间点可能对应同一帧。
+        """
+        if not self.frames or not self.fps:
+            return self.frame_paths()
+        times = [frame_number / self.fps for frame_number, _ in self.frames]
+        paths = []
+        seconds = 0.0
+        while seconds * self.fps < self.frame_count:
+            index = bisect.bisect_left(times, seconds)
+            if index == len(times) or (index > 0 and seconds - times[index - 1] <= times[index] - seconds):
+                index -= 1
+            paths.append(os.path.join(self.path, self.frames[index][1]))
+            seconds += interval_seconds
+        return paths
+
+    def frame_near(self, seconds: float) -> Optional[str]:
+        """返回最接近指定时间点的缓存帧路径"""
+        if not self.frames:
+            return None
+        _, name = min(self.frames, key=lambda item: abs(item[0] / (self.fps or 1) - seconds))
+        return os.path.join(self.path, name)
+
+    def save_thumbnail(self, seconds: float, thumbnail_path: str, width: Optional[int] = None) -> bool:
+        """
+        将最接近指定时间点的缓存帧保存为缩略图。
+
+        Args:
+            seconds: 时间点(秒)
+            thumbnail_path: 缩略图保存路径
+            width: 缩放后的宽度(保持宽高比),为None时保持原尺寸
+        Returns:
+            bool: 缓存中没有可用帧时返回False
+        """
+        frame_path = self.frame_near(seconds)
+        if frame_path is None:
+            return False
+        frame = cv2.imread(frame_path)
+        if width:
+            height = int(frame.shape[0] * width / frame.shape[1])
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        return cv2.imwrite(thumbnail_path, frame)
+
+
+class FrameCache:
+    """按内容哈希索引、LRU淘汰的视频帧磁盘缓存"""
+
+    def __init__(self, cache_dir: str, max_bytes: int, frame_interval: int):
+        """
+        初始化缓存。
+
+        Args:
+            cache_dir: 缓存根目录
+            max_bytes: 缓存总大小上限(字节)
+            frame_interval: 抽帧间隔(每N帧缓存一帧)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.frame_interval = frame_interval
+        self._alias_dir = os.path.join(cache_dir, "aliases")
+        os.makedirs(self._alias_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # 本地文件哈希缓存: (路径, 大小, 修改时间) -> 哈希
+        self._hashes: Dict[Tuple[str, int, float], str] = {}
+        # 正在使用的条目引用计数,淘汰时跳过(仅在本进程内有效)
+        self._pins: Dict[str, int] = {}
+
+    def key_for(self, source: str) -> str:
+        """
+        计算视频来源对应的缓存键。
+
+        本地文件使用内容哈希;远程地址优先使用已登记的别名,否则使用地址哈希。
+        """
+        if os.path.isfile(source):
+            stat = os.stat(source)
+            hash_key = (os.path.abspath(source), stat.st_size, stat.st_mtime)
+            with self._lock:
+                content_hash = self._hashes.get(hash_key)
+            if content_hash is None:
+                content_hash = file_sha256(source)
+                with self._lock:
+                    self._hashes[hash_key] = content_hash
+            return content_hash
+
+        alias_path = self._alias_path(source)
+        if os.path.exists(alias_path):
+            with open(alias_path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        return "url-" + hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def remember_hash(self, file_path: str, content_hash: str) -> None:
+        """登记已知的文件内容哈希(如上传时边读边算得到),避免再次读取文件"""
+        stat = os.stat(file_path)
+        with self._lock:
+            self._hashes[(os.path.abspath(file_path), stat.st_size, stat.st_mtime)] = content_hash
+
+    def add_alias(self, alias: str, key: str) -> None:
+        """为缓存条目登记别名(如上传后的OSS地址)"""
+        tmp_path = self._alias_path(alias) + f".{uuid.uuid4().hex}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(key)
+        os.replace(tmp_path, self._alias_path(alias))
+
+    def lookup(self, source: str, key: Optional[str] = None) -> Optional[CachedVideo]:
+        """查找缓存条目,命中时刷新访问时间"""
+        key = key or self.key_for(source)
+        entry_path = os.path.join(self.cache_dir, key)
+        meta_path = os.path.join(entry_path, _META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            # 条目可能正被淘汰
+            return None
+        return CachedVideo(key, entry_path, meta)
+
+    @contextmanager
+    def pin(self, key: str) -> Iterator[None]:
+        """with 块内保持缓存条目不被淘汰,可嵌套"""
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins[key] -= 1
+                if not self._pins[key]:
+                    del self._pins[key]
+
+    @contextmanager
+    def acquire(self, source: str, key: Optional[str] = None, create: bool = True) -> Iterator[Optional[CachedVideo]]:
+        """
+        获取缓存条目,with 块内读取缓存帧期间条目不会被淘汰。
+
+        Args:
+            source: 视频来源(本地路径或远程地址)
+            key: 缓存键,默认由 source 计算
+            create: 未命中时是否解码视频并写入缓存;为False时未命中产出None
+        """
+        key = key or self.key_for(source)
+        with self.pin(key):
+            yield self.get_or_create(source, key) if create else self.lookup(source, key)
+
+    def get_or_create(self, source: str, key: Optional[str] = None) -> CachedVideo:
+        """获取缓存条目,未命中时解码视频并写入缓存"""
+        key = key or self.key_for(source)
+        entry = self.lookup(source, key)
+        if entry is None:
+            for _ in self.iter_frames(source, key):
+                pass
+            entry = self.lookup(source, key)
+        return entry
+
+    def iter_frames(self, source: str, key: Optional[str] = None) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        流式产出采样帧 (时间戳秒, BGR图像)。
+
+        命中缓存时直接读取缓存帧;未命中时边解码边写入缓存,
+        全部帧写完后原子地提交为缓存条目。未命中时产出的也是 JPEG 编解码后的帧,
+        与命中时读到的像素一致,同一视频的帧向量不因是否命中缓存而不同。
+        """
+        key = key or self.key_for(source)
+        with self.pin(key):
+            yield from self._iter_frames(source, key)
+
+    def _iter_frames(self, source: str, key: str) -> Iterator[Tuple[int, np.ndarray]]:
+        entry = self.lookup(source, key)
+        if entry is not None:
+            yield from entry.iter_frames()
+            return
+
+        tmp_path = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex}")
+        os.makedirs(tmp_path)
+        try:
+            frames = []
+            with FrameSampler(source, self.frame_interval) as sampler:
+                for frame_number, frame in sampler:
+                    name = f"{frame_number:08d}.jpg"
+                    _, buffer = cv2.imencode(".jpg", frame)
+                    with open(os.path.join(tmp_path, name), "wb") as f:
+                        f.write(buffer.tobytes())
+                    frames.append((frame_number, name))
+                    yield sampler.timestamp(frame_number), cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+                meta = {
+                    "source": source,
+                    "fps": sampler.fps,
+                    "duration": sampler.duration,
+                    "frame_count": sampler.frame_count,
+                    "frame_interval": sampler.frame_interval,
+                    "frames": frames,
+                    "created_at": time.time()
+                }
+            with open(os.path.join(tmp_path, _META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+            self._commit(tmp_path, os.path.join(self.cache_dir, key))
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+        self._evict()
+
+    def _alias_path(self, alias: str) -> str:
+        return os.path.join(self._alias_dir, hashlib.sha256(alias.encode("utf-8")).hexdigest())
+
+    @staticmethod
+    def _commit(tmp_path: str, entry_path: str) -> None:
+        """原子地提交缓存条目,已被其他进程写入时保留已有条目"""
+        try:
+            os.rename(tmp_path, entry_path)
+        except OSError:
+            if not os.path.exists(os.path.join(entry_path, _META_FILE)):
+                raise
+
+    def _evict(self) -> None:
+        """总大小超过上限时,按最近访问时间淘汰缓存条目,跳过正在使用的条目"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            meta_path = os.path.join(self.cache_dir, name, _META_FILE)
+            if name.startswith(".") or not os.path.exists(meta_path):
+                continue
+            entry_path = os.path.join(self.cache_dir, name)
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_path))
+                entries.append((os.path.getmtime(meta_path), size, entry_path))
+            except OSError:
+                continue
+            total += size
+
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            key = os.path.basename(entry_path)
+            # 持锁检查引用并改名下线,之后的 lookup 不会再命中该条目
+            with self._lock:
+                if key in self._pins:
+                    continue
+                evicted_path = os.path.join(self.cache_dir, f".evict.{key}.{uuid.uuid4().hex}")
+                try:
+                    os.rename(entry_path, evicted_path)
+                except OSError:
+                    continue
+            shutil.rmtree(evicted_path, ignore_errors=True)
+            total -= size
+            logger.debug(f"淘汰视频帧缓存: {entry_path}")
+
+
+def warm_cache(source: str) -> Tuple[str, str, int]:
+    """
+    计算视频内容哈希并将采样帧写入缓存。
+
+    该函数只依赖轻量模块,可在进程池中并行执行,解码结果通过磁盘缓存共享给主进程。
+
+    Returns:
+        Tuple[str, str, int]: (视频路径, 内容哈希, 缓存帧数)
+    """
+    key = frame_cache.key_for(source)
+    cached_video = frame_cache.get_or_create(source, key)
+    return source, key, len(cached_video.frames)
+
+
+frame_cache = FrameCache(
+    cache_dir=Config.FRAME_CACHE_DIR,
+    max_bytes=Config.FRAME_CACHE_MAX_MB * 1024 * 1024,
+    frame_interval=Config.VIDEO_FRAME_INTERVAL
+)
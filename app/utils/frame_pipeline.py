@@ -0,0 +1,252 @@
+"""
+视频帧流式处理管道。
+
+解码 → 采样 → 预处理 → 批量向量化 → 缓冲写入 Milvus,各阶段运行在独立线程中,
+通过有界队列衔接。任意时刻内存中只保留有限个批次的帧,峰值内存与视频时长无关,
+且解码与模型推理可以重叠执行。
+"""
+
+import queue
+import threading
+import uuid
+from concurrent.futures import Future, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.utils.embedding_base import EmbeddingBase
+from app.utils.logger import logger
+
+# 阶段结束标记
+_END = object()
+
+
+class FramePipeline:
+    """视频帧向量化入库管道"""
+
+    def __init__(
+            self,
+            frames: Iterable[Tuple[int, np.ndarray]],
+            video_url: str,
+            embedding: EmbeddingBase,
+            operator,
+            frame_interval: int,
+            batch_size: int,
+            queue_size: int = 4,
+            on_progress: Optional[Callable[[int], None]] = None,
+            video_m_id: Optional[str] = None,
+            writer=None
+    ):
+        """
+        初始化管道。
+
+        Args:
+            frames: 采样帧来源,产出 (时间戳秒, BGR图像)
+            video_url: 视频OSS地址(写入帧记录的 video_id)
+            embedding: 向量化模型实例
+            operator: 帧向量集合的 MilvusOperator
+            frame_interval: 抽帧间隔(每N帧抽取一帧)
+            batch_size: 推理微批与批量写入大小
+            queue_size: 各阶段之间队列的最大批次数
+            on_progress: 每次批量写入后回调,参数为累计已入库帧数
+            video_m_id: 视频在视频集合中的主键,集合包含 video_m_id 字段时随帧写入
+            writer: BufferedMilvusWriter,提供时帧向量交给写入器与其他视频合并提交,
+                否则每批直接调用 operator.insert_data
+        """
+        self.frames = frames
+        self.video_url = video_url
+        self.embedding = embedding
+        self.operator = operator
+        self.frame_interval = frame_interval
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.on_progress = on_progress
+        self.video_m_id = video_m_id
+        self.writer = writer
+
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+        self.frame_count = 0
+        self.processed_frames = 0
+        # 已写入的帧主键,用于失败时回滚
+        self.inserted_ids: List[str] = []
+        # 交给写入器、尚未确认的写入
+        self._writes: List[Future] = []
+        self._progress_lock = threading.Lock()
+
+    def run(self) -> Dict[str, int]:
+        """
+        运行管道直至全部帧写入完成。
+
+        Returns:
+            Dict[str, int]: 抽取帧数与已入库帧数
+
+        Raises:
+            Exception: 任一阶段失败时抛出该阶段的异常
+        """
+        frames_q = queue.Queue(maxsize=self.queue_size * self.batch_size)
+        batches_q = queue.Queue(maxsize=self.queue_size)
+        vectors_q = queue.Queue(maxsize=self.queue_size)
+
+        threads = [
+            self._start_stage("decode", lambda: self._decode_stage(frames_q)),
+            self._start_stage("preprocess", lambda: self._preprocess_stage(frames_q, batches_q)),
+            self._start_stage("embed", lambda: self._embed_stage(batches_q, vectors_q)),
+            self._start_stage("insert", lambda: self._insert_stage(vectors_q)),
+        ]
+        for thread in threads:
+            thread.join()
+
+        # 等待写入器提交本视频的全部帧,失败时回滚的主键才完整
+        wait(self._writes)
+        for future in self._writes:
+            if future.exception() is not None:
+                self._errors.append(future.exception())
+                break
+
+        if self._errors:
+            raise self._errors[0]
+
+        return {
+            "frame_count": self.frame_count,
+            "processed_frames": self.processed_frames
+        }
+
+    def _start_stage(self, name: str, target: Callable[[], None]) -> threading.Thread:
+        """在独立线程中启动一个阶段,异常时通知其他阶段停止"""
+        def runner():
+            try:
+                target()
+            except BaseException as e:
+                logger.error(f"帧处理管道阶段 {name} 失败: {str(e)}")
+                self._errors.append(e)
+                self._stop.set()
+
+        thread = threading.Thread(target=runner, name=f"frame-pipeline-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _put(self, q: queue.Queue, item: Any) -> bool:
+        """向下游队列放入数据,管道停止时放弃"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue) -> Any:
+        """从上游队列取数据,管道停止时返回结束标记"""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _iter_frames(self) -> Iterator[Tuple[int, Image.Image]]:
+        """将采样帧转换为 (时间戳秒, PIL图片)"""
+        for timestamp, frame in self.frames:
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            yield timestamp, Image.fromarray(frame_rgb)
+
+    def _decode_stage(self, out_q: queue.Queue) -> None:
+        try:
+            for item in self._iter_frames():
+                if not self._put(out_q, item):
+                    return
+                self.frame_count += 1
+        finally:
+            self._put(out_q, _END)
+
+    def _preprocess_stage(self, in_q: queue.Queue, out_q: queue.Queue) -> None:
+        preprocess = getattr(self.embedding, "preprocess_images", None)
+
+        def emit(timestamps, images):
+            # 支持预处理的模型在此阶段完成张量化,推理线程只做前向计算
+            batch = preprocess(images) if preprocess else images
+            return self._put(out_q, (timestamps, batch))
+
+        try:
+            timestamps, images = [], []
+            while True:
+                item = self._get(in_q)
+                if item is _END:
+                    break
+                timestamps.append(item[0])
+                images.append(item[1])
+                if len(images) >= self.batch_size:
+                    if not emit(timestamps, images):
+                        return
+                    timestamps, images = [], []
+
+            if images and not self._stop.is_set():
+                emit(timestamps, images)
+        finally:
+            self._put(out_q, _END)
+
+    def _embed_stage(self, in_q: queue.Queue, out_q: queue.Queue) -> None:
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _END:
+                    break
+                timestamps, batch = item
+                vectors = self.embedding.embedding_images(batch, batch_size=self.batch_size)
+                if not self._put(out_q, (timestamps, vectors)):
+                    return
+        finally:
+            self._put(out_q, _END)
+
+    def _insert_stage(self, in_q: queue.Queue) -> None:
+        m_ids, embeddings, paths, at_seconds = [], [], [], []
+
+        # 尚未迁移的集合没有 video_m_id 字段
+        with_video_m_id = self.video_m_id is not None and self.operator.has_field("video_m_id")
+
+        def written(ids, first, last):
+            with self._progress_lock:
+                self.inserted_ids.extend(ids)
+                self.processed_frames += len(ids)
+                processed = self.processed_frames
+            logger.info(f"批量插入 {len(ids)} 帧，时间戳范围: {first}-{last}秒")
+            if self.on_progress:
+                self.on_progress(processed)
+
+        def flush():
+            columns = [m_ids, embeddings, paths, at_seconds]
+            if with_video_m_id:
+                columns.append([self.video_m_id] * len(m_ids))
+            if self.writer is None:
+                self.operator.insert_data(columns)
+                written(m_ids, at_seconds[0], at_seconds[-1])
+                return
+
+            # 写入器在后台提交,写满时在此阻塞形成反压
+            future = self.writer.write(columns)
+            ids, first, last = m_ids, at_seconds[0], at_seconds[-1]
+            future.add_done_callback(
+                lambda f: written(ids, first, last) if f.exception() is None else None
+            )
+            self._writes.append(future)
+
+        while True:
+            item = self._get(in_q)
+            if item is _END:
+                break
+            timestamps, vectors = item
+            for timestamp, vector in zip(timestamps, vectors):
+                m_ids.append(str(uuid.uuid4()))
+                embeddings.append(vector.tolist())
+                paths.append(self.video_url)
+                at_seconds.append(timestamp)
+
+            if len(m_ids) >= self.batch_size:
+                flush()
+                m_ids, embeddings, paths, at_seconds = [], [], [], []
+
+        if m_ids and not self._stop.is_set():
+            flush()
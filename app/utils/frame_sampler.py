@@ -0,0 +1,102 @@
+"""
+视频稀疏抽帧工具。
+
+按固定帧间隔采样时,只对需要保留的帧执行完整的 read(解码 + 颜色转换 + 拷贝),
+跳过的帧仅调用 grab();当间隔超过阈值时,直接按帧号 seek 到目标位置,
+由解码器从最近的关键帧开始解码,避免逐帧处理整段视频。
+"""
+
+from typing import Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import Config
+
+
+class FrameSampler:
+    """按帧间隔稀疏采样视频帧"""
+
+    def __init__(
+            self,
+            source: str,
+            frame_interval: int = 1,
+            seek_threshold: Optional[int] = None,
+            interval_seconds: Optional[float] = None
+    ):
+        """
+        初始化采样器。
+
+        Args:
+            source: 视频文件路径或URL
+            frame_interval: 抽帧间隔(每N帧抽取一帧)
+            seek_threshold: 间隔达到该帧数时改用 seek 定位,默认使用 VIDEO_SEEK_THRESHOLD
+            interval_seconds: 按秒指定抽帧间隔,提供时覆盖 frame_interval
+
+        Raises:
+            ValueError: 当视频无法打开时
+        """
+        self.source = source
+        self.seek_threshold = seek_threshold or Config.VIDEO_SEEK_THRESHOLD
+
+        self._cap = cv2.VideoCapture(source)
+        if not self._cap.isOpened():
+            raise ValueError(f"无法打开视频: {source}")
+
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.duration = self.frame_count / self.fps if self.fps else 0
+
+        if interval_seconds is not None:
+            frame_interval = self.fps * interval_seconds
+        self.frame_interval = max(1, int(frame_interval))
+
+    def __enter__(self) -> 'FrameSampler':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.release()
+
+    def release(self) -> None:
+        """释放视频句柄"""
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def timestamp(self, frame_number: int) -> int:
+        """帧号对应的时间点(秒)"""
+        return int(frame_number / self.fps) if self.fps else 0
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        依次产出采样帧。
+
+        Yields:
+            Tuple[int, np.ndarray]: (帧号, BGR图像)
+        """
+        # 帧数未知(部分流媒体)时无法按帧号定位,只能顺序跳帧
+        if self.frame_interval >= self.seek_threshold and self.frame_count > 0:
+            return self._iter_seek()
+        return self._iter_grab()
+
+    def _iter_grab(self) -> Iterator[Tuple[int, np.ndarray]]:
+        frame_number = 0
+        while self._cap is not None:
+            if frame_number % self.frame_interval == 0:
+                ret, frame = self._cap.read()
+                if not ret:
+                    break
+                yield frame_number, frame
+            elif not self._cap.grab():
+                break
+            frame_number += 1
+
+    def _iter_seek(self) -> Iterator[Tuple[int, np.ndarray]]:
+        for frame_number in range(0, self.frame_count, self.frame_interval):
+            if self._cap is None:
+                break
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            ret, frame = self._cap.read()
+            if not ret:
+                break
+            yield frame_number, frame
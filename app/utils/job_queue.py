@@ -0,0 +1,166 @@
+"""
+后台任务队列。
+
+耗时的视频入库流程以任务形式提交到本地工作线程池中执行,接口只返回任务ID,
+调用方通过任务ID轮询阶段级进度。队列后端通过 JobQueueBase 抽象,
+当前提供基于线程池的本地实现,后续可替换为外部消息队列。
+"""
+
+import threading
+import time
+import traceback
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils.logger import logger
+from config import Config
+
+
+class JobStatus:
+    """任务状态"""
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class Job:
+    """任务记录及其阶段进度"""
+
+    def __init__(self, job_type: str):
+        self.job_id = uuid.uuid4().hex
+        self.job_type = job_type
+        self.status = JobStatus.PENDING
+        self.stages: List[Dict[str, Any]] = []
+        self.result: Optional[Any] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+
+    def update_stage(self, stage: str, status: str = JobStatus.RUNNING, **info) -> None:
+        """
+        更新阶段进度。
+
+        Args:
+            stage: 阶段名称
+            status: 阶段状态
+            **info: 阶段附加信息(如已处理帧数)
+        """
+        now = time.time()
+        with self._lock:
+            record = next((item for item in self.stages if item["name"] == stage), None)
+            if record is None:
+                record = {"name": stage, "status": status, "started_at": now, "finished_at": None}
+                self.stages.append(record)
+            record["status"] = status
+            record.update(info)
+            if status in (JobStatus.SUCCEEDED, JobStatus.FAILED):
+                record["finished_at"] = now
+            self.updated_at = now
+
+    @contextmanager
+    def stage(self, stage: str):
+        """以上下文管理器的方式记录一个阶段的开始、完成或失败"""
+        self.update_stage(stage)
+        try:
+            yield
+        except Exception:
+            self.update_stage(stage, JobStatus.FAILED)
+            raise
+        self.update_stage(stage, JobStatus.SUCCEEDED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "job_type": self.job_type,
+                "status": self.status,
+                "stages": [dict(item) for item in self.stages],
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at
+            }
+
+
+class JobQueueBase(ABC):
+    """任务队列基类"""
+
+    @abstractmethod
+    def submit(self, job_type: str, fn: Callable[[Job], Any]) -> Job:
+        """提交任务,fn 接收任务记录用于上报阶段进度,返回值作为任务结果"""
+        pass
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        """查询任务"""
+        pass
+
+
+class LocalJobQueue(JobQueueBase):
+    """基于本地线程池的任务队列"""
+
+    def __init__(self, max_workers: int, job_ttl: int):
+        """
+        Args:
+            max_workers: 工作线程数
+            job_ttl: 已结束任务的保留时间(秒)
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-worker")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._job_ttl = job_ttl
+
+    def submit(self, job_type: str, fn: Callable[[Job], Any]) -> Job:
+        job = Job(job_type)
+        with self._lock:
+            self._prune()
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._run, job, fn)
+        logger.info(f"任务已提交: {job.job_id} ({job_type})")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @staticmethod
+    def _run(job: Job, fn: Callable[[Job], Any]) -> None:
+        job.status = JobStatus.RUNNING
+        try:
+            job.result = fn(job)
+            job.status = JobStatus.SUCCEEDED
+        except Exception as e:
+            logger.error(f"任务 {job.job_id} 执行失败: {str(e)}\n{traceback.format_exc()}")
+            job.error = str(e)
+            job.status = JobStatus.FAILED
+        finally:
+            job.updated_at = time.time()
+
+    def _prune(self) -> None:
+        """清理超过保留时间的已结束任务"""
+        expire_before = time.time() - self._job_ttl
+        finished = (JobStatus.SUCCEEDED, JobStatus.FAILED)
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.status in finished and job.updated_at < expire_before]:
+            del self._jobs[job_id]
+
+
+def job_stage(job: Optional[Job], stage: str):
+    """任务存在时记录阶段进度,同步调用(无任务)时不做任何事"""
+    return job.stage(stage) if job is not None else nullcontext()
+
+
+def create_job_queue() -> JobQueueBase:
+    """按配置创建任务队列"""
+    backend = Config.JOB_QUEUE_BACKEND
+    if backend == "local":
+        return LocalJobQueue(max_workers=Config.JOB_QUEUE_WORKERS, job_ttl=Config.JOB_TTL_SECONDS)
+    raise ValueError(f"不支持的任务队列后端: {backend}")
+
+
+job_queue = create_job_queue()
@@ -0,0 +1,153 @@
+"""
+Milvus 连接管理。
+
+每个 (uri, 数据库) 只建立一个 MilvusClient 和一个绑定该数据库的 ORM 连接别名,
+进程内所有 DAO、MilvusOperator 与脚本共享。gRPC 通道本身是线程安全的,
+并发请求复用同一通道,不再为每个请求建立连接;ORM 连接在别名上绑定数据库,
+不再通过进程全局的 db.using_database 切换数据库。
+
+后台线程按 MILVUS_HEALTH_CHECK_INTERVAL 探测连接,失败时重建连接。
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from pymilvus import MilvusClient, connections, utility
+
+from app.utils.logger import logger
+from config import Config
+
+
+class MilvusConnectionManager:
+    """按 (uri, 数据库) 共享 Milvus 连接"""
+
+    def __init__(self, health_check_interval: int = 30):
+        """
+        Args:
+            health_check_interval: 健康检查间隔(秒),0 表示不做后台检查
+        """
+        self.health_check_interval = health_check_interval
+        self._clients: Dict[Tuple[str, str], MilvusClient] = {}
+        self._aliases: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.RLock()
+        self._checker: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _key(uri: Optional[str], db_name: Optional[str]) -> Tuple[str, str]:
+        return uri or Config.MILVUS_URI, db_name or Config.MILVUS_DB_NAME
+
+    def get_client(self, uri: Optional[str] = None, db_name: Optional[str] = None) -> MilvusClient:
+        """
+        获取共享的 MilvusClient。
+
+        Args:
+            uri: Milvus 地址,默认 MILVUS_URI
+            db_name: 数据库名,默认 DB_NAME
+        """
+        key = self._key(uri, db_name)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = MilvusClient(uri=key[0], db_name=key[1])
+                    self._clients[key] = client
+                    logger.info(f"已连接 Milvus {key[0]} (数据库 {key[1]})")
+                    self._start_checker()
+        return client
+
+    def get_alias(self, uri: Optional[str] = None, db_name: Optional[str] = None) -> str:
+        """
+        获取绑定到指定数据库的 ORM 连接别名,供 Collection(using=...) 与 utility(using=...) 使用。
+        """
+        key = self._key(uri, db_name)
+        alias = self._aliases.get(key)
+        if alias is None:
+            with self._lock:
+                alias = self._aliases.get(key)
+                if alias is None:
+                    alias = "milvus_" + hashlib.md5(f"{key[0]}|{key[1]}".encode("utf-8")).hexdigest()[:12]
+                    connections.connect(alias=alias, uri=key[0], db_name=key[1])
+                    self._aliases[key] = alias
+                    self._start_checker()
+        return alias
+
+    def health_check(self, uri: Optional[str] = None, db_name: Optional[str] = None) -> bool:
+        """
+        探测连接是否可用,不可用时重建连接后再探测一次。
+
+        Returns:
+            bool: 连接是否可用
+        """
+        key = self._key(uri, db_name)
+        if self._ping(key):
+            return True
+        logger.warning(f"Milvus 连接 {key[0]} (数据库 {key[1]}) 不可用,重新连接")
+        try:
+            self.reconnect(*key)
+        except Exception as e:
+            logger.error(f"Milvus 重新连接失败: {str(e)}")
+            return False
+        return self._ping(key)
+
+    def reconnect(self, uri: Optional[str] = None, db_name: Optional[str] = None) -> None:
+        """重建指定 (uri, 数据库) 的客户端与 ORM 连接,持有别名的 Collection 无需重建"""
+        key = self._key(uri, db_name)
+        with self._lock:
+            client = self._clients.pop(key, None)
+            if client is not None:
+                try:
+                    client.close()
+                except Exception:
+                    pass
+                self.get_client(*key)
+
+            alias = self._aliases.get(key)
+            if alias is not None:
+                connections.disconnect(alias)
+                connections.connect(alias=alias, uri=key[0], db_name=key[1])
+
+    def close_all(self) -> None:
+        """关闭全部连接"""
+        with self._lock:
+            for client in self._clients.values():
+                try:
+                    client.close()
+                except Exception:
+                    pass
+            for alias in self._aliases.values():
+                connections.disconnect(alias)
+            self._clients.clear()
+            self._aliases.clear()
+
+    def _ping(self, key: Tuple[str, str]) -> bool:
+        try:
+            if key in self._clients:
+                self._clients[key].get_server_version()
+            if key in self._aliases:
+                utility.get_server_version(using=self._aliases[key])
+            return True
+        except Exception as e:
+            logger.warning(f"Milvus 健康检查失败: {str(e)}")
+            return False
+
+    def _start_checker(self) -> None:
+        if self.health_check_interval <= 0 or (self._checker is not None and self._checker.is_alive()):
+            return
+
+        def check():
+            while True:
+                time.sleep(self.health_check_interval)
+                with self._lock:
+                    keys = set(self._clients) | set(self._aliases)
+                for key in keys:
+                    self.health_check(*key)
+
+        self._checker = threading.Thread(target=check, name="milvus-health-check", daemon=True)
+        self._checker.start()
+
+
+# 进程内共享的连接管理器
+milvus_connections = MilvusConnectionManager(health_check_interval=Config.MILVUS_HEALTH_CHECK_INTERVAL)
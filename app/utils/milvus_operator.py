@@ -4,13 +4,22 @@ Milvus 数据库操作工具类。
 """
 
 import os
+import json
+import threading
+import time
 import numpy as np
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Union
 from dotenv import load_dotenv
-from pymilvus import connections, db, Collection, utility
+from pymilvus import Collection, utility
+from pymilvus.client.types import LoadState
 from pymilvus.orm.mutation import MutationResult
 
+from app.utils.logger import logger
+from app.utils.milvus_connection import milvus_connections
+from app.utils.search_profiles import IndexSpec, get_search_profile
+from config import Config
+
 # 加载环境变量
 load_dotenv()
 
@@ -25,7 +34,9 @@ class MilvusOperator:
             collection: str,
             metric_type: str = 'IP',  # 默认使用 IP
             host: Optional[str] = None,
-            port: Optional[str] = None
+            port: Optional[str] = None,
+            index: Optional[IndexSpec] = None,
+            search_profile: str = 'balanced'
     ):
         """
         初始化 Milvus 操作器。
@@ -34,35 +45,43 @@ class MilvusOperator:
             database: 数据库名称
             collection: 集合名称
             metric_type: 度量类型 ('L2'|'IP')，默认为'IP'
-            host: Milvus 服务器地址，默认从环境变量获取
-            port: Milvus 服务器端口，默认从环境变量获取
+            host: Milvus 服务器地址，未指定 host/port 时使用 Config.MILVUS_URI
+            port: Milvus 服务器端口，未指定 host/port 时使用 Config.MILVUS_URI
+            index: 向量字段的索引配置,需与建索引脚本一致,默认 IVF_FLAT
+            search_profile: 默认检索配置 ('fast'|'balanced'|'exact')
 
         Raises:
-            ValueError: 当 metric_type 不是有效值时抛出
+            ValueError: 当 metric_type 或 search_profile 不是有效值时抛出
         """
         if metric_type not in self._VALID_METRIC_TYPES:
             raise ValueError(f"无效的度量类型: {metric_type}。必须是 {self._VALID_METRIC_TYPES} 之一")
+        get_search_profile(search_profile)
 
         self.database = database
         self.coll_name = collection
         self.metric_type = metric_type
-
-        # 使用环境变量或传入参数配置连接信息
-        self.host = host or os.getenv('MILVUS_HOST', '127.0.0.1')
-        self.port = port or os.getenv('MILVUS_PORT', '19530')
+        self.index = index or IndexSpec('ivf_flat')
+        self.search_profile = search_profile
+
+        # 显式传入 host/port 时按其拼接地址,否则与 VideoDAO 等共用 Config.MILVUS_URI
+        self.uri: Optional[str] = None
+        if host or port:
+            self.uri = f"http://{host or Config.MILVUS_HOST}:{port or Config.MILVUS_PORT}"
+        self.alias: Optional[str] = None
+
+        # 集合生命周期:缓存集合句柄,加载一次后保持加载状态
+        self._collection: Optional[Collection] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._last_used = time.time()
+        self._reaper: Optional[threading.Thread] = None
 
         self._connect()
 
     def _connect(self) -> None:
-        """建立与 Milvus 的连接"""
+        """获取绑定到本操作器数据库的共享连接,不切换进程全局的当前数据库"""
         try:
-            connections.connect(
-                # alias=f"{self.database}_{self.coll_name}",
-                alias="default",
-                host=self.host,
-                port=self.port
-            )
-            db.using_database(self.database)
+            self.alias = milvus_connections.get_alias(self.uri, self.database)
         except Exception as e:
             raise ConnectionError(f"连接 Milvus 失败: {str(e)}")
 
@@ -91,54 +110,150 @@ class MilvusOperator:
             cls._instances[instance_key] = cls(database, collection, metric_type, **kwargs)
         return cls._instances[instance_key]
 
-    def insert_data(self, data: List[Dict[str, Any]]) -> Optional[MutationResult]:
+    @classmethod
+    def load_all(cls) -> None:
+        """加载所有已创建操作器的集合(服务启动时调用)"""
+        for instance in list(cls._instances.values()):
+            instance.ensure_loaded()
+
+    @classmethod
+    def release_all(cls) -> None:
+        """释放所有已加载的集合(仅在明确停止服务时调用)"""
+        for instance in list(cls._instances.values()):
+            instance.release()
+
+    @property
+    def collection(self) -> Collection:
+        """缓存的集合句柄"""
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    self._collection = Collection(self.coll_name, using=self.alias)
+        return self._collection
+
+    def has_field(self, field_name: str) -> bool:
+        """集合结构中是否包含指定字段(用于兼容尚未迁移的集合)"""
+        return any(field.name == field_name for field in self.collection.schema.fields)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def ensure_loaded(self) -> Collection:
+        """
+        确保集合已加载到查询节点内存,只在首次使用或被释放后加载。
+
+        Returns:
+            Collection: 已加载的集合句柄
+        """
+        self._last_used = time.time()
+        if self._loaded:
+            return self.collection
+
+        with self._lock:
+            if not self._loaded:
+                collection = self._collection or Collection(self.coll_name, using=self.alias)
+                self._collection = collection
+                # 其他进程可能已经加载过该集合
+                if utility.load_state(self.coll_name, using=self.alias) != LoadState.Loaded:
+                    start_time = time.time()
+                    collection.load()
+                    logger.info(f"集合 {self.coll_name} 已加载,耗时 {time.time() - start_time:.2f}s")
+                self._loaded = True
+                self._start_reaper()
+        return self._collection
+
+    def release(self) -> None:
+        """释放集合占用的查询节点内存"""
+        with self._lock:
+            if not self._loaded:
+                return
+            try:
+                self.collection.release()
+                logger.info(f"集合 {self.coll_name} 已释放")
+            except Exception as e:
+                logger.error(f"释放集合 {self.coll_name} 失败: {str(e)}")
+            finally:
+                self._loaded = False
+
+    def _check_released(self, error: Exception) -> None:
+        """集合被外部释放时重置加载状态,下次使用时重新加载"""
+        if "not loaded" in str(error).lower():
+            self._loaded = False
+
+    def _start_reaper(self) -> None:
+        """按 MILVUS_RELEASE_IDLE_SECONDS 启动空闲释放线程(为0时不释放)"""
+        idle_seconds = Config.MILVUS_RELEASE_IDLE_SECONDS
+        if idle_seconds <= 0 or (self._reaper is not None and self._reaper.is_alive()):
+            return
+
+        def reap():
+            while self._loaded:
+                time.sleep(min(idle_seconds, 60))
+                if self._loaded and time.time() - self._last_used >= idle_seconds:
+                    logger.info(f"集合 {self.coll_name} 空闲超过 {idle_seconds}s,释放内存")
+                    self.release()
+
+        self._reaper = threading.Thread(target=reap, name=f"milvus-reaper-{self.coll_name}", daemon=True)
+        self._reaper.start()
+
+    def insert_data(self, data: List[Any]) -> MutationResult:
         """
         插入数据到集合。
-        
+
+        高频或多生产者写入应使用 BufferedMilvusWriter 合并后提交。
+
         Args:
-            data: 要插入的数据列表
-            
+            data: 按字段顺序排列的列数据,或按行组织的字典列表
+
         Returns:
-            Optional[MutationResult]: 插入结果,失败时返回 None
+            MutationResult: 插入结果
+
+        Raises:
+            ValueError: 数据格式无效时
+            Exception: 插入失败时抛出 Milvus 的异常,由调用方决定重试或回滚
         """
-        collection = None
-        try:
-            # 验证输入数据
-            if not data or not isinstance(data, list):
-                print(f"无效的输入数据格式: {type(data)}")
-                return None
-            
-            collection = Collection(self.coll_name)
-            
-            # 打印调试信息
-            print(f"正在插入数据到集合 {self.coll_name}")
-            print(f"数据示例: {data[0] if data else None}")
-            
-            res = collection.insert(data)
-            
-            # 打印插入结果
-            print(f"数据插入成功: {res}")
-            return res
-        
-        except Exception as e:
-            print(f"插入数据失败: {str(e)}")
-            # 返回 None 而不是抛出异常
-            return None
-        
-        finally:
-            # 确保释放资源
-            if collection:
-                try:
-                    collection.release()
-                except Exception as e:
-                    print(f"释放集合资源失败: {str(e)}")
+        if not data or not isinstance(data, list):
+            raise ValueError(f"无效的输入数据格式: {type(data)}")
+
+        # 写入不需要加载集合,也不应释放其他请求正在使用的已加载集合
+        start_time = time.time()
+        res = self.collection.insert(data)
+        logger.debug(
+            f"集合 {self.coll_name} 插入 {res.insert_count} 行,耗时 {(time.time() - start_time) * 1000:.0f}ms"
+        )
+        return res
+
+    def upsert_data(self, data: List[Any]) -> MutationResult:
+        """
+        按主键插入或覆盖数据,重复提交同一批数据不会产生重复记录。
+
+        Args:
+            data: 按字段顺序排列的列数据,或按行组织的字典列表
+
+        Returns:
+            MutationResult: 写入结果
+
+        Raises:
+            ValueError: 数据格式无效时
+        """
+        if not data or not isinstance(data, list):
+            raise ValueError(f"无效的输入数据格式: {type(data)}")
+
+        start_time = time.time()
+        res = self.collection.upsert(data)
+        logger.debug(
+            f"集合 {self.coll_name} 写入(upsert) {res.upsert_count} 行,耗时 {(time.time() - start_time) * 1000:.0f}ms"
+        )
+        return res
 
     def search_data(
             self,
             embedding: List[float],
             limit: int = 5,
             output_fields: Optional[List[str]] = None,
-            expr: Optional[str] = None
+            expr: Optional[str] = None,
+            search_profile: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         搜索相似向量。
@@ -148,40 +263,111 @@ class MilvusOperator:
             limit: 返回结果数量
             output_fields: 返回字段列表
             expr: 过滤表达式
+            search_profile: 检索配置,默认使用操作器的检索配置
 
         Returns:
             搜索结果列表
         """
         try:
-            collection = Collection(self.coll_name)
-            collection.load()
-
-            search_params = {
-                "metric_type": self.metric_type,
-                "offset": 0,
-                "ignore_growing": False,
-                "params": {"nprobe": 5}
-            }
-
-            results = collection.search(
-                data=[embedding],
-                anns_field="embedding",
-                param=search_params,
-                limit=limit,
-                expr=expr,
-                output_fields=output_fields or ['m_id', 'video_id', 'at_seconds'],
-                consistency_level="Strong"
-            )
-
+            results = self._search([embedding], limit, output_fields, expr, search_profile)
             return self._format_search_results(results)
         except Exception as e:
             print(f"搜索数据失败: {str(e)}")  # 添加错误日志
+            self._check_released(e)
             return []  # 发生错误时返回空列表
-        finally:
-            try:
-                collection.release()
-            except Exception:
-                pass  # 忽略释放时的错误
+
+    def search_many(
+            self,
+            embeddings: Union[np.ndarray, Sequence[Sequence[float]]],
+            limit: int = 5,
+            output_fields: Optional[List[str]] = None,
+            expr: Optional[str] = None,
+            search_profile: Optional[str] = None,
+            group_by_field: Optional[str] = None,
+            group_size: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        批量搜索相似向量:一次请求发送多个查询向量,结果按查询分组返回。
+
+        Args:
+            embeddings: 查询向量矩阵 (n, dim),可直接传入 float32 numpy 数组,无需转换为列表
+            limit: 每个查询返回的结果数量
+            output_fields: 返回字段列表
+            expr: 过滤表达式
+            search_profile: 检索配置,默认使用操作器的检索配置
+            group_by_field: 服务端分组字段(Milvus 2.4+),limit 表示分组数,每组返回 group_size 条
+            group_size: 每组返回的结果数量(Milvus 2.5+)
+
+        Returns:
+            List[List[Dict[str, Any]]]: 与查询顺序一致的结果列表,每组按相似度从高到低排列
+
+        Raises:
+            Exception: 搜索失败时
+        """
+        if isinstance(embeddings, np.ndarray):
+            matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+            if matrix.ndim == 1:
+                matrix = matrix.reshape(1, -1)
+            # 按行传入 float32 数组,pymilvus 直接序列化为字节,不经过 Python 浮点列表
+            data = list(matrix)
+        else:
+            data = list(embeddings)
+        if not data:
+            return []
+
+        output_fields = output_fields or ['m_id', 'video_id', 'at_seconds']
+        try:
+            grouping = {}
+            if group_by_field:
+                grouping["group_by_field"] = group_by_field
+                if group_size and group_size > 1:
+                    grouping["group_size"] = group_size
+            results = self._search(data, limit, output_fields, expr, search_profile, **grouping)
+        except Exception as e:
+            self._check_released(e)
+            raise Exception(f"批量搜索数据失败: {str(e)}")
+
+        return [[self._format_hit(hit, output_fields) for hit in hits] for hits in results]
+
+    def _search(
+            self,
+            data: List[Any],
+            limit: int,
+            output_fields: Optional[List[str]],
+            expr: Optional[str],
+            search_profile: Optional[str] = None,
+            **kwargs
+    ):
+        """发送一次搜索请求,data 中的每个向量对应一组结果;kwargs 透传给 Collection.search"""
+        collection = self.ensure_loaded()
+
+        search_params, consistency_level = self.index.search_params(
+            search_profile or self.search_profile, self.metric_type, limit
+        )
+
+        return collection.search(
+            data=data,
+            anns_field="embedding",
+            param=search_params,
+            limit=limit,
+            expr=expr,
+            output_fields=output_fields or ['m_id', 'video_id', 'at_seconds'],
+            consistency_level=consistency_level,
+            **kwargs
+        )
+
+    @staticmethod
+    def _format_hit(hit, output_fields: List[str]) -> Dict[str, Any]:
+        """将单个命中结果转换为字典,包含主键、距离与请求的输出字段"""
+        entity = {
+            'm_id': hit.id,
+            'distance': hit.distance,
+        }
+        if hasattr(hit, 'entity'):
+            for field in output_fields:
+                if field != 'm_id':
+                    entity[field] = hit.entity.get(field)
+        return entity
 
     def _format_search_results(self, results) -> List[Dict[str, Any]]:
         """
@@ -206,6 +392,7 @@ class MilvusOperator:
                     if hasattr(hit, 'entity'):
                         entity['video_id'] = hit.entity.get('video_id')
                         entity['at_seconds'] = hit.entity.get('at_seconds')
+                        entity['video_m_id'] = hit.entity.get('video_m_id')
                     
                     entity_list.append(entity)
 
@@ -226,11 +413,10 @@ class MilvusOperator:
             查询结果列表
         """
         try:
-            collection = Collection(self.coll_name)
-            collection.load()
+            collection = self.ensure_loaded()
 
-            ids_str = ', '.join(str(id) for id in ids)
-            expr = f'm_id in [{ids_str}]'
+            # 字符串主键需要加引号并转义
+            expr = f'm_id in {json.dumps(list(ids))}'
 
             return collection.query(
                 expr=expr,
@@ -238,9 +424,8 @@ class MilvusOperator:
                 limit=len(ids)
             )
         except Exception as e:
+            self._check_released(e)
             raise Exception(f"查询数据失败: {str(e)}")
-        finally:
-            collection.release()
 
     def delete_by_ids(self, ids: List[str]) -> None:
         """
@@ -250,16 +435,13 @@ class MilvusOperator:
             ids: 要删除的ID列表
         """
         try:
-            collection = Collection(self.coll_name)
-            collection.load()
+            collection = self.ensure_loaded()
 
-            ids_str = ', '.join(str(id) for id in ids)
-            expr = f'm_id in [{ids_str}]'
+            # 字符串主键需要加引号并转义
+            expr = f'm_id in {json.dumps(list(ids))}'
             collection.delete(expr)
         except Exception as e:
             raise Exception(f"删除数据失败: {str(e)}")
-        finally:
-            collection.release()
 
 
 # 示例使用方式
@@ -272,7 +454,9 @@ class MilvusOperator:
 # 使用默认的 IP 度量类型
 video_frame_operator = MilvusOperator.get_instance(
     database='video_db',
-    collection='video_frame_vector'
+    collection='video_frame_vector',
+    index=IndexSpec(Config.FRAME_INDEX_PROFILE, nlist=Config.FRAME_INDEX_NLIST),
+    search_profile=Config.FRAME_SEARCH_PROFILE
 )
 
 
@@ -0,0 +1,409 @@
+"""
+Milvus 批量写入工具。
+
+BufferedMilvusWriter:多个生产者(如并发处理的多个视频)写入的数据先在内存中合并,
+达到行数阈值或等待超时后由后台线程一次提交,连接中断、超时、限流等可重试错误按指数退避
+以 upsert 重试(服务端可能已写入,insert 不按主键去重);
+未写入的数据超过上限时写入方阻塞,形成反压。
+
+MilvusBulkImporter:大规模回填时将数据写成 Parquet/NumPy 文件上传到 Milvus 使用的对象存储,
+再调用 bulk_insert 由服务端直接导入,绕过逐批 insert 的 RPC 开销。
+"""
+
+import atexit
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import grpc
+from pymilvus import BulkInsertState, CollectionSchema, utility
+from pymilvus.exceptions import MilvusException, MilvusUnavailableException
+
+from app.utils.logger import logger
+from app.utils.milvus_connection import milvus_connections
+from app.utils.milvus_operator import MilvusOperator, video_frame_operator
+from config import Config
+
+
+# 可重试错误的特征:连接中断、超时与限流,其余错误(如数据格式、字段不匹配)重试也不会成功
+_RETRYABLE_GRPC_CODES = {"UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED"}
+_RETRYABLE_MESSAGES = ("unavailable", "timeout", "timed out", "deadline exceeded", "rate limit", "connection")
+
+
+def _is_retryable(error: Exception) -> bool:
+    """判断写入失败是否可重试"""
+    if isinstance(error, (MilvusUnavailableException, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, grpc.RpcError):
+        return error.code().name in _RETRYABLE_GRPC_CODES
+    if isinstance(error, MilvusException):
+        return any(text in str(error).lower() for text in _RETRYABLE_MESSAGES)
+    return False
+
+
+class BufferedMilvusWriter:
+    """合并多生产者写入、后台批量提交的 Milvus 写入器"""
+
+    def __init__(
+            self,
+            operator: MilvusOperator,
+            batch_rows: int = 2000,
+            max_delay: float = 0.5,
+            max_pending_rows: int = 20000,
+            max_retries: int = 3,
+            retry_backoff: float = 0.5
+    ):
+        """
+        Args:
+            operator: 目标集合的 MilvusOperator
+            batch_rows: 每次提交的最大行数
+            max_delay: 数据在缓冲区中最长等待时间(秒),到期即使不足 batch_rows 也提交
+            max_pending_rows: 缓冲中与提交中的行数上限,超过时 write 阻塞
+            max_retries: 提交失败后的重试次数
+            retry_backoff: 首次重试前的等待时间(秒),之后每次翻倍
+        """
+        self.operator = operator
+        self.batch_rows = batch_rows
+        self.max_delay = max_delay
+        self.max_pending_rows = max_pending_rows
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._cond = threading.Condition()
+        # 待提交的写入:(按列组织的数据, 写入结果)
+        self._buffer: List[Tuple[List[list], Future]] = []
+        self._buffer_rows = 0
+        self._buffer_since: Optional[float] = None
+        self._inflight_rows = 0
+        self._force = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+        # 统计
+        self.written_rows = 0
+        self.failed_rows = 0
+        self.flushes = 0
+        self.retries = 0
+        self.backpressure_waits = 0
+
+    @property
+    def pending_rows(self) -> int:
+        """缓冲中与提交中的行数"""
+        return self._buffer_rows + self._inflight_rows
+
+    @property
+    def backpressured(self) -> bool:
+        """未写入的行数是否已达到上限"""
+        return self.pending_rows >= self.max_pending_rows
+
+    def write(self, columns: List[list], timeout: Optional[float] = None) -> Future:
+        """
+        写入一组按列组织的数据(与 MilvusOperator.insert_data 格式相同)。
+
+        同一次写入的数据总在同一批中提交。未写入的行数超过上限时阻塞,直到后台提交腾出空间。
+
+        Args:
+            columns: 按集合字段顺序排列的列数据
+            timeout: 反压时最长等待时间(秒),None 表示一直等待
+
+        Returns:
+            Future: 提交完成后结果为写入行数,重试耗尽后为对应异常
+
+        Raises:
+            TimeoutError: 反压等待超时
+            RuntimeError: 写入器已关闭
+        """
+        future = Future()
+        rows = len(columns[0]) if columns else 0
+        if rows == 0:
+            future.set_result(0)
+            return future
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("写入器已关闭")
+
+            waited = False
+            # 单次写入超过上限时,等已有数据全部提交后放行,避免永久阻塞
+            while self.pending_rows > 0 and self.pending_rows + rows > self.max_pending_rows:
+                waited = True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(
+                        f"集合 {self.operator.coll_name} 写入积压 {self.pending_rows} 行,超过上限 {self.max_pending_rows}"
+                    )
+                self._cond.wait(remaining)
+            if waited:
+                self.backpressure_waits += 1
+
+            self._buffer.append((columns, future))
+            self._buffer_rows += rows
+            if self._buffer_since is None:
+                self._buffer_since = time.monotonic()
+            self._ensure_thread()
+            self._cond.notify_all()
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        立即提交缓冲数据并等待全部写入结束。
+
+        Returns:
+            bool: 是否在超时前完成
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._force = True
+            self._cond.notify_all()
+            while self.pending_rows > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """提交剩余数据并停止后台线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """写入统计"""
+        with self._cond:
+            return {
+                "pending_rows": self.pending_rows,
+                "max_pending_rows": self.max_pending_rows,
+                "backpressured": self.backpressured,
+                "written_rows": self.written_rows,
+                "failed_rows": self.failed_rows,
+                "flushes": self.flushes,
+                "retries": self.retries,
+                "backpressure_waits": self.backpressure_waits
+            }
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name=f"milvus-writer-{self.operator.coll_name}", daemon=True
+            )
+            self._thread.start()
+
+    def _ready(self) -> bool:
+        if not self._buffer:
+            return False
+        return (
+                self._closed
+                or self._force
+                or self._buffer_rows >= self.batch_rows
+                or time.monotonic() - self._buffer_since >= self.max_delay
+        )
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._ready():
+                    if not self._buffer:
+                        self._force = False
+                        if self._closed:
+                            return
+                        self._cond.wait()
+                    else:
+                        self._cond.wait(max(0.0, self._buffer_since + self.max_delay - time.monotonic()))
+                batch = self._take_batch()
+            self._commit(batch)
+
+    def _take_batch(self) -> List[Tuple[List[list], Future]]:
+        """从缓冲区取出一批列数相同、总行数不超过 batch_rows 的写入(至少一条)"""
+        width = len(self._buffer[0][0])
+        batch, rows = [], 0
+        while self._buffer:
+            columns, future = self._buffer[0]
+            size = len(columns[0])
+            if batch and (len(columns) != width or rows + size > self.batch_rows):
+                break
+            batch.append(self._buffer.pop(0))
+            rows += size
+
+        self._buffer_rows -= rows
+        self._inflight_rows += rows
+        if not self._buffer:
+            self._buffer_since = None
+        return batch
+
+    def _commit(self, batch: List[Tuple[List[list], Future]]) -> None:
+        """
+        合并一批写入并提交,可重试的错误按指数退避以 upsert 重试。
+
+        合并写入因不可重试的错误(如某个生产者的数据不合法)失败时,拆回各生产者的写入
+        逐个提交,只有出错的写入失败,同批的其他写入不受牵连。
+        """
+        width = len(batch[0][0])
+        merged = [[] for _ in range(width)]
+        for columns, _ in batch:
+            for index, column in enumerate(columns):
+                merged[index].extend(column)
+        rows = len(merged[0])
+
+        error = self._write(merged)
+        if error is not None and len(batch) > 1 and not _is_retryable(error):
+            logger.warning(f"写入集合 {self.operator.coll_name} 失败({rows} 行),拆分为 {len(batch)} 次写入: {str(error)}")
+            # 合并写入可能已部分生效,拆分后以 upsert 写入避免重复
+            errors = [self._write(columns, upsert=True) for columns, _ in batch]
+        else:
+            errors = [error] * len(batch)
+
+        failed = sum(len(columns[0]) for (columns, _), e in zip(batch, errors) if e is not None)
+        with self._cond:
+            self._inflight_rows -= rows
+            self.flushes += 1
+            self.written_rows += rows - failed
+            self.failed_rows += failed
+            self._cond.notify_all()
+
+        for (columns, future), e in zip(batch, errors):
+            if e is None:
+                future.set_result(len(columns[0]))
+            else:
+                logger.error(f"写入集合 {self.operator.coll_name} 失败,已放弃 {len(columns[0])} 行: {str(e)}")
+                future.set_exception(e)
+
+    def _write(self, columns: List[list], upsert: bool = False) -> Optional[Exception]:
+        """写入一批列数据,返回最终的错误(成功时为None)"""
+        rows = len(columns[0])
+        error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                if attempt == 0 and not upsert:
+                    self.operator.insert_data(columns)
+                else:
+                    # 超时等失败时服务端可能已写入该批数据,insert 不按主键去重,重试改用 upsert
+                    self.operator.upsert_data(columns)
+                return None
+            except Exception as e:
+                error = e
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    break
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(
+                    f"写入集合 {self.operator.coll_name} 失败({rows} 行),{delay:.1f}s 后重试: {str(e)}"
+                )
+                with self._cond:
+                    self.retries += 1
+                time.sleep(delay)
+        return error
+
+
+class MilvusBulkImporter:
+    """将数据写成文件后通过 bulk_insert 导入集合,用于大规模回填"""
+
+    _FILE_TYPES = ("parquet", "numpy")
+
+    def __init__(
+            self,
+            collection_name: str,
+            schema: CollectionSchema,
+            file_type: str = "parquet",
+            segment_size_mb: int = 512,
+            using: Optional[str] = None
+    ):
+        """
+        Args:
+            collection_name: 目标集合
+            schema: 目标集合结构
+            file_type: 导入文件格式('parquet'|'numpy')
+            segment_size_mb: 单个导入文件的大小上限(MB)
+            using: pymilvus 连接别名,默认使用 MILVUS_URI / DB_NAME 的共享连接
+
+        Raises:
+            ValueError: 文件格式不支持时
+        """
+        if file_type not in self._FILE_TYPES:
+            raise ValueError(f"不支持的导入文件格式: {file_type},可选: {', '.join(self._FILE_TYPES)}")
+
+        # bulk_writer 依赖 pyarrow 等额外组件,只在回填时导入
+        from pymilvus.bulk_writer import BulkFileType, RemoteBulkWriter
+
+        self.collection_name = collection_name
+        self.using = using or milvus_connections.get_alias()
+        self.rows = 0
+        self._writer = RemoteBulkWriter(
+            schema=schema,
+            remote_path=f"bulk_import/{collection_name}/{uuid.uuid4().hex}",
+            connect_param=RemoteBulkWriter.S3ConnectParam(
+                endpoint=Config.MILVUS_BULK_ENDPOINT,
+                access_key=Config.MILVUS_BULK_ACCESS_KEY,
+                secret_key=Config.MILVUS_BULK_SECRET_KEY,
+                bucket_name=Config.MILVUS_BULK_BUCKET,
+                secure=False
+            ),
+            segment_size=segment_size_mb * 1024 * 1024,
+            file_type=BulkFileType.PARQUET if file_type == "parquet" else BulkFileType.NUMPY
+        )
+
+    def append(self, row: Dict[str, Any]) -> None:
+        """追加一行数据,写满一个文件后自动上传"""
+        self._writer.append_row(row)
+        self.rows += 1
+
+    def commit(self) -> List[int]:
+        """
+        上传剩余数据并为每组文件提交导入任务。
+
+        Returns:
+            List[int]: 导入任务ID
+        """
+        self._writer.commit()
+        task_ids = [
+            utility.do_bulk_insert(collection_name=self.collection_name, files=files, using=self.using)
+            for files in self._writer.batch_files
+        ]
+        logger.info(f"已提交 {len(task_ids)} 个导入任务,共 {self.rows} 行")
+        return task_ids
+
+    def wait(self, task_ids: List[int], timeout: Optional[float] = None, poll_interval: float = 5.0) -> int:
+        """
+        等待导入任务完成。
+
+        Returns:
+            int: 导入的总行数
+
+        Raises:
+            RuntimeError: 任一任务失败时
+            TimeoutError: 超时未完成时
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pending = list(task_ids)
+        imported = 0
+        while pending:
+            for task_id in list(pending):
+                state = utility.get_bulk_insert_state(task_id=task_id, using=self.using)
+                if state.state in (BulkInsertState.ImportFailed, BulkInsertState.ImportFailedAndCleaned):
+                    raise RuntimeError(f"导入任务 {task_id} 失败: {state.failed_reason}")
+                if state.state == BulkInsertState.ImportCompleted:
+                    imported += state.row_count
+                    pending.remove(task_id)
+            if not pending:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"导入任务未在 {timeout}s 内完成: {pending}")
+            time.sleep(poll_interval)
+        return imported
+
+
+# 帧向量集合共享的写入器,并发处理的多个视频合并提交
+frame_writer = BufferedMilvusWriter(
+    video_frame_operator,
+    batch_rows=Config.MILVUS_WRITE_BATCH_ROWS,
+    max_delay=Config.MILVUS_WRITE_MAX_DELAY,
+    max_pending_rows=Config.MILVUS_WRITE_MAX_PENDING_ROWS,
+    max_retries=Config.MILVUS_WRITE_MAX_RETRIES,
+    retry_backoff=Config.MILVUS_WRITE_RETRY_BACKOFF
+)
+atexit.register(frame_writer.close)
@@ -1,27 +1,89 @@
+import hashlib
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, List, Optional, Tuple
 
+import urllib3
 from minio import Minio
+from minio.commonconfig import ComposeSource
 from minio.error import S3Error
 from urllib.parse import urljoin
 import mimetypes
 import ffmpeg
 from ..utils.logger import logger
+from ..utils.frame_cache import frame_cache
+from config import Config
 from dotenv import load_dotenv
 load_dotenv()
 
 
+class TeeReader:
+    """
+    包装输入流:读取的数据同时计算 SHA-256 并写入本地文件。
+
+    对象存储客户端从该流读取分片上传,本地文件供后续抽帧解码使用,
+    数据只从请求流读取一次。
+    """
+
+    def __init__(self, stream: BinaryIO, copy_path: str):
+        self._stream = stream
+        self._copy = open(copy_path, "wb")
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        if data:
+            self._sha256.update(data)
+            self._copy.write(data)
+            self.size += len(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
+    def close(self) -> None:
+        self._copy.close()
+
+
 class MinioFileUploader:
+    # 已确认存在的桶,进程内只检查一次
+    _checked_buckets = set()
+    _bucket_lock = threading.Lock()
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
     def __init__(self):
         """
         初始化 MinIO 客户端
+
+        客户端与其连接池是线程安全的,进程内应通过 get_instance() 复用同一个实例。
         """
+        http_client = urllib3.PoolManager(
+            maxsize=Config.OSS_POOL_MAXSIZE,
+            block=True,
+            timeout=urllib3.Timeout(connect=10, read=Config.OSS_READ_TIMEOUT),
+            retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+        )
         self.minio_client = Minio(
             os.getenv('OSS_ENDPOINT'),  # MinIO 服务端点
             access_key=os.getenv('OSS_ACCESS_KEY'),  # 访问密钥
             secret_key=os.getenv('OSS_SECRET_KEY'),  # 秘密密钥
-            secure=False  # 如果你的 Minio 实例没有启用 SSL，请将 secure 参数设置为 False
+            secure=False,  # 如果你的 Minio 实例没有启用 SSL，请将 secure 参数设置为 False
+            http_client=http_client
         )
 
+    @classmethod
+    def get_instance(cls) -> 'MinioFileUploader':
+        """获取进程内共享的上传器实例"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
     def upload_file(self, object_name, file_path):
         """
         上传文件到 MinIO
@@ -29,13 +91,7 @@ class MinioFileUploader:
         :param file_path: 本地文件路径
         """
         bucket_name = os.getenv('OSS_BUCKET_NAME')
-        # 检查桶是否存在，如果不存在则创建
-        found = self.minio_client.bucket_exists(bucket_name)
-        if not found:
-            self.minio_client.make_bucket(bucket_name)
-            print(f"桶 {bucket_name} 已创建")
-        else:
-            print(f"桶 {bucket_name} 已存在")
+        self._ensure_bucket(bucket_name)
 
         try:
             # 获取文件的 MIME 类型
@@ -49,9 +105,119 @@ class MinioFileUploader:
         except S3Error as e:
             print(f"上传文件时发生错误: {e}")
 
-        url_prefix = urljoin("http://" + os.getenv('OSS_ENDPOINT'), bucket_name)
+        return self.get_object_url(object_name)
+
+    def upload_many(self, items: List[Tuple[str, str]], max_workers: Optional[int] = None) -> List[str]:
+        """
+        并行上传多个文件,共享同一个连接池。
+
+        Args:
+            items: [(对象名, 本地文件路径), ...]
+            max_workers: 并行上传数,默认使用 OSS_UPLOAD_PARALLEL
+
+        Returns:
+            List[str]: 与 items 顺序一致的对象访问地址
+        """
+        if not items:
+            return []
+        max_workers = min(max_workers or Config.OSS_UPLOAD_PARALLEL, len(items))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="oss-upload") as executor:
+            return list(executor.map(lambda item: self.upload_file(*item), items))
+
+    def upload_stream(
+            self,
+            object_name: str,
+            stream: BinaryIO,
+            copy_path: str,
+            content_type: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        将输入流直接分片上传到 MinIO,同时写入本地副本并计算内容哈希。
+
+        长度未知的流按 OSS_UPLOAD_PART_SIZE_MB 切分,分片并行上传,
+        不需要先把完整文件落盘再读取上传。
+
+        Args:
+            object_name: 对象名(包含路径)
+            stream: 输入流(如上传请求的文件流)
+            copy_path: 本地副本路径,供抽帧解码使用
+            content_type: MIME 类型,为None时按对象名推断
+
+        Returns:
+            Tuple[str, str]: (对象访问地址, 内容 SHA-256)
+
+        Raises:
+            S3Error: 上传失败时
+        """
+        bucket_name = os.getenv('OSS_BUCKET_NAME')
+        self._ensure_bucket(bucket_name)
+
+        if content_type is None:
+            content_type = mimetypes.guess_type(object_name)[0] or "application/octet-stream"
+
+        reader = TeeReader(stream, copy_path)
+        try:
+            self.minio_client.put_object(
+                bucket_name,
+                object_name,
+                reader,
+                length=-1,
+                content_type=content_type,
+                part_size=Config.OSS_UPLOAD_PART_SIZE_MB * 1024 * 1024,
+                num_parallel_uploads=Config.OSS_UPLOAD_PARALLEL
+            )
+        finally:
+            reader.close()
+        logger.info(f"文件流已上传到 {bucket_name}/{object_name} ({reader.size} bytes)")
+        return self.get_object_url(object_name), reader.hexdigest()
+
+    def _ensure_bucket(self, bucket_name):
+        """检查桶是否存在,不存在则创建;结果在进程内缓存"""
+        if bucket_name in self._checked_buckets:
+            return
+        with self._bucket_lock:
+            if bucket_name in self._checked_buckets:
+                return
+            if not self.minio_client.bucket_exists(bucket_name):
+                self.minio_client.make_bucket(bucket_name)
+                logger.info(f"桶 {bucket_name} 已创建")
+            self._checked_buckets.add(bucket_name)
+
+    @staticmethod
+    def get_object_url(object_name):
+        """
+        获取对象的访问地址(无需等待上传完成)
+        :param object_name: 对象名（包含路径）
+        """
+        url_prefix = urljoin("http://" + os.getenv('OSS_ENDPOINT'), os.getenv('OSS_BUCKET_NAME'))
         return url_prefix + "/" + object_name
 
+    def rename_object(self, source_name: str, object_name: str) -> str:
+        """
+        在对象存储内将对象改名(服务端复制后删除原对象),数据不经过本服务。
+
+        Args:
+            source_name: 原对象名
+            object_name: 新对象名
+
+        Returns:
+            str: 新对象的访问地址
+        """
+        bucket_name = os.getenv('OSS_BUCKET_NAME')
+        # compose_object 对超过 5GB 的对象自动按分片复制
+        self.minio_client.compose_object(bucket_name, object_name, [ComposeSource(bucket_name, source_name)])
+        self.minio_client.remove_object(bucket_name, source_name)
+        logger.debug(f"Renamed object: {source_name} -> {object_name}")
+        return self.get_object_url(object_name)
+
+    def remove_object(self, object_name):
+        """
+        删除 MinIO 中的对象
+        :param object_name: 对象名（包含路径）
+        """
+        self.minio_client.remove_object(os.getenv('OSS_BUCKET_NAME'), object_name)
+        logger.debug(f"Removed object: {object_name}")
+
     def generate_thumbnail_from_video(self, video_url, thumbnail_path, time_seconds):
         if not video_url:
             raise ValueError("视频URL不能为空")
@@ -64,16 +230,18 @@ class MinioFileUploader:
         )
 
     def upload_thumbnail_to_oss(self, object_name, file_path):
-        # 创建 MinioFileUploader 实例
-        uploader = MinioFileUploader()
-        return uploader.upload_file(object_name, file_path)
+        return self.upload_file(object_name, file_path)
 
 
     def generate_video_thumbnail_url(self, video_url):
         start_time = 0
         thumbnail_file_name = os.path.basename(video_url) + "_t_" + str(start_time) + ".jpg"
         thumbnail_local_path = os.path.join('/tmp', thumbnail_file_name)
-        self.generate_thumbnail_from_video(video_url, thumbnail_local_path, start_time)
+        # 优先使用已缓存的视频帧,避免再次通过网络解码视频
+        with frame_cache.acquire(video_url, create=False) as cached_video:
+            saved = cached_video is not None and cached_video.save_thumbnail(start_time, thumbnail_local_path)
+        if not saved:
+            self.generate_thumbnail_from_video(video_url, thumbnail_local_path, start_time)
         thumbnail_oss_url = self.upload_thumbnail_to_oss(thumbnail_file_name, thumbnail_local_path)
         print(f"thumbnail_oss_url:{thumbnail_oss_url}")
         os.remove(thumbnail_local_path)
@@ -83,8 +251,8 @@ class MinioFileUploader:
 
 # 示例用法
 if __name__ == "__main__":
-    # 创建 MinioFileUploader 实例
-    uploader = MinioFileUploader()
+    # 获取 MinioFileUploader 实例
+    uploader = MinioFileUploader.get_instance()
 
     # 上传文件
     # bucket_name = os.getenv('OSS_BUCKET_NAME')
@@ -0,0 +1,220 @@
+"""
+查询向量缓存。
+
+用户反复检索相同的文本("高速路"、"变道"、"行人横穿"),每次都要经过一次 BERT 前向推理(帧检索)
+或一次远程 embeddings 调用(摘要检索)。缓存以 (模型, 规范化文本, 维度) 为键:
+    - 内存层:进程内 LRU + TTL(TTLCache)
+    - 磁盘层(可选):本地 SQLite,同一主机上的多个工作进程共享,进程重启后仍可命中
+命中时既不调用模型也不访问网络。本地模型的键包含量化方式与权重文件标识(文件名、大小、修改时间),
+切换量化或更换权重后不会命中旧向量。
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.embedding_factory import EmbeddingFactory
+from app.utils.embedding_types import EmbeddingType
+from app.utils.logger import logger
+from app.utils.ttl_cache import TTLCache
+from config import Config
+
+# 每写入多少条清理一次磁盘层的过期条目
+_PRUNE_INTERVAL = 1000
+
+
+def normalize_query(text: str) -> str:
+    """规范化查询文本:全角/半角统一(NFKC),去除首尾空白并合并连续空白"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def _file_id(path: str) -> str:
+    try:
+        stat = os.stat(path)
+        return f"{os.path.basename(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        return os.path.basename(path)
+
+
+@lru_cache(maxsize=None)
+def embedding_model_key(model_type: EmbeddingType) -> str:
+    """
+    查询向量缓存键中的模型标识:模型类型、查询模型的量化方式与权重文件标识。
+
+    进程内模型只加载一次,标识随之固定;权重更换后重启进程即使用新的标识。
+    """
+    if model_type == EmbeddingType.CLIP:
+        files: List[str] = [Config.CN_CLIP_MODEL_PATH]
+    elif model_type == EmbeddingType.CLIP_ONNX:
+        files = [Config.CLIP_ONNX_IMAGE_MODEL, Config.CLIP_ONNX_TEXT_MODEL]
+    else:
+        # 远程 API 模型没有本地权重
+        files = []
+    checkpoint = hashlib.sha1("|".join(_file_id(path) for path in files).encode("utf-8")).hexdigest()[:12]
+    return f"{model_type.value}:{EmbeddingFactory.query_quantize(model_type)}:{checkpoint}"
+
+
+class QueryEmbeddingCache:
+    """查询向量的两级缓存(内存 LRU + 可选 SQLite)"""
+
+    def __init__(self, maxsize: int, ttl: float, db_path: str = ""):
+        """
+        Args:
+            maxsize: 内存层最大条目数,为0时不缓存
+            ttl: 条目有效期(秒)
+            db_path: 磁盘层 SQLite 文件路径,为空时只使用内存层
+        """
+        self.ttl = ttl
+        self.enabled = maxsize > 0
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.db_path = db_path if self.enabled else ""
+        if self.db_path:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    "model TEXT, text TEXT, dimensions INTEGER, embedding BLOB, created_at REAL, "
+                    "PRIMARY KEY (model, text, dimensions))"
+                )
+
+        # 统计
+        self._stats_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+        self._writes = 0
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # 每次操作使用独立连接,可在多线程/多进程间安全使用
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _disk_get(self, key: Tuple[str, str, int]) -> Optional[np.ndarray]:
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT embedding FROM query_embeddings "
+                    "WHERE model = ? AND text = ? AND dimensions = ? AND created_at >= ?",
+                    key + (time.time() - self.ttl,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"读取查询向量缓存失败: {str(e)}")
+            return None
+        return np.frombuffer(row[0], dtype=np.float32) if row is not None else None
+
+    def _disk_set(self, key: Tuple[str, str, int], vector: np.ndarray) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (model, text, dimensions, embedding, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    key + (vector.tobytes(), time.time())
+                )
+                with self._stats_lock:
+                    self._writes += 1
+                    prune = self._writes % _PRUNE_INTERVAL == 0
+                if prune:
+                    conn.execute("DELETE FROM query_embeddings WHERE created_at < ?", (time.time() - self.ttl,))
+        except sqlite3.Error as e:
+            logger.warning(f"写入查询向量缓存失败: {str(e)}")
+
+    def get_or_compute(
+            self,
+            model: str,
+            text: str,
+            compute: Callable[[str], Sequence[float]],
+            dimensions: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        获取查询文本的向量,未命中时调用 compute 生成并写入缓存。
+
+        Args:
+            model: 模型标识
+            text: 查询文本
+            compute: 向量化函数,输入规范化后的文本
+            dimensions: 向量维度(同一模型可输出多种维度时区分),None 表示模型固定维度
+
+        Returns:
+            np.ndarray: float32 查询向量(只读,调用方不应原地修改)
+        """
+        text = normalize_query(text)
+        if not self.enabled:
+            return np.asarray(compute(text), dtype=np.float32)
+
+        start_time = time.perf_counter()
+        key = (model, text, dimensions or 0)
+        vector = self.memory.get(key)
+        if vector is not None:
+            self._record("memory_hits", "hit_seconds", start_time)
+            return vector
+
+        if self.db_path:
+            vector = self._disk_get(key)
+            if vector is not None:
+                self.memory.set(key, vector)
+                self._record("disk_hits", "hit_seconds", start_time)
+                return vector
+
+        vector = np.asarray(compute(text), dtype=np.float32)
+        vector.setflags(write=False)
+        self.memory.set(key, vector)
+        if self.db_path:
+            self._disk_set(key, vector)
+        self._record("misses", "miss_seconds", start_time)
+        return vector
+
+    def _record(self, counter: str, timer: str, start_time: float) -> None:
+        elapsed = time.perf_counter() - start_time
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            setattr(self, timer, getattr(self, timer) + elapsed)
+
+    def clear(self) -> None:
+        """清空内存层与磁盘层"""
+        self.memory.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM query_embeddings")
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率与平均耗时(毫秒)"""
+        with self._stats_lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "size": len(self.memory),
+                "maxsize": self.memory.maxsize,
+                "disk_enabled": bool(self.db_path),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "avg_hit_ms": round(self.hit_seconds * 1000 / hits, 3) if hits else 0.0,
+                "avg_miss_ms": round(self.miss_seconds * 1000 / self.misses, 3) if self.misses else 0.0
+            }
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    maxsize=Config.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl=Config.QUERY_EMBEDDING_CACHE_TTL,
+    db_path=Config.QUERY_EMBEDDING_CACHE_DB_PATH
+)
@@ -0,0 +1,110 @@
+"""
+向量索引与检索参数配置。
+
+索引配置决定向量字段建立的索引类型(IVF_FLAT / IVF_SQ8 / IVF_PQ / HNSW),
+由建索引脚本和查询端共用,保证两者一致;检索配置(fast / balanced / exact)
+决定每次查询的 nprobe / ef 与一致性级别,可通过配置按接口选择,也可按请求指定,
+用于在召回率与延迟之间做显式取舍。
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+# 索引配置:索引类型与建索引参数(IVF 类索引的 nlist 按集合单独指定)
+INDEX_PROFILES: Dict[str, Dict[str, Any]] = {
+    "ivf_flat": {"index_type": "IVF_FLAT", "params": {}},
+    # 标量量化,内存约为 IVF_FLAT 的 1/4
+    "ivf_sq8": {"index_type": "IVF_SQ8", "params": {}},
+    # 乘积量化,内存占用最小,召回率损失最大;子空间数 m 按向量维度计算
+    "ivf_pq": {"index_type": "IVF_PQ", "params": {"nbits": 8}},
+    "hnsw": {"index_type": "HNSW", "params": {"M": 16, "efConstruction": 256}},
+}
+
+# 检索配置:IVF 类索引的 nprobe(None 表示搜索全部聚类)、HNSW 的 ef 与一致性级别
+SEARCH_PROFILES: Dict[str, Dict[str, Any]] = {
+    "fast": {"nprobe": 16, "ef": 64, "consistency_level": "Eventually"},
+    "balanced": {"nprobe": 64, "ef": 128, "consistency_level": "Bounded"},
+    "exact": {"nprobe": None, "ef": 512, "consistency_level": "Strong"},
+}
+
+
+def get_search_profile(name: str) -> Dict[str, Any]:
+    """
+    获取检索配置。
+
+    Raises:
+        ValueError: 当配置名不存在时
+    """
+    if name not in SEARCH_PROFILES:
+        raise ValueError(f"不支持的检索配置: {name},可选: {', '.join(SEARCH_PROFILES)}")
+    return SEARCH_PROFILES[name]
+
+
+class IndexSpec:
+    """一个向量字段的索引配置"""
+
+    def __init__(self, profile: str, nlist: int = 1024, dim: Optional[int] = None):
+        """
+        Args:
+            profile: 索引配置名(见 INDEX_PROFILES)
+            nlist: IVF 类索引的聚类数
+            dim: 向量维度,IVF_PQ 建索引时必填
+
+        Raises:
+            ValueError: 当配置名不存在时
+        """
+        if profile not in INDEX_PROFILES:
+            raise ValueError(f"不支持的索引配置: {profile},可选: {', '.join(INDEX_PROFILES)}")
+        self.profile = profile
+        self.index_type = INDEX_PROFILES[profile]["index_type"]
+        self.nlist = nlist
+        self.dim = dim
+
+    @property
+    def is_ivf(self) -> bool:
+        return self.index_type.startswith("IVF")
+
+    def index_params(self) -> Dict[str, Any]:
+        """建索引参数"""
+        params = dict(INDEX_PROFILES[self.profile]["params"])
+        if self.is_ivf:
+            params["nlist"] = self.nlist
+        if self.index_type == "IVF_PQ":
+            if not self.dim:
+                raise ValueError("IVF_PQ 索引需要指定向量维度")
+            # 每个子空间 16 维
+            params["m"] = max(1, self.dim // 16)
+        return params
+
+    def search_params(
+            self,
+            search_profile: str,
+            metric_type: str,
+            limit: int,
+            offset: int = 0
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        按检索配置生成搜索参数。
+
+        Args:
+            search_profile: 检索配置名(见 SEARCH_PROFILES)
+            metric_type: 度量类型
+            limit: 返回结果数量
+            offset: 结果偏移量
+
+        Returns:
+            Tuple[Dict[str, Any], str]: (搜索参数, 一致性级别)
+        """
+        profile = get_search_profile(search_profile)
+        if self.is_ivf:
+            params = {"nprobe": min(profile["nprobe"] or self.nlist, self.nlist)}
+        else:
+            # HNSW 要求 ef 不小于 topk
+            params = {"ef": max(profile["ef"], limit + offset)}
+
+        search_params = {
+            "metric_type": metric_type,
+            "offset": offset,
+            "ignore_growing": False,
+            "params": params
+        }
+        return search_params, profile["consistency_level"]
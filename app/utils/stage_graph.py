@@ -0,0 +1,123 @@
+"""
+阶段依赖图执行器。
+
+将一次处理拆分为若干有依赖关系的阶段,依赖满足的阶段在线程池中并行执行,
+总耗时趋近于最长依赖链而不是所有阶段之和。任一阶段失败时不再调度新阶段,
+等待运行中的阶段结束后,按完成的逆序执行各阶段注册的清理函数,并抛出首个异常。
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.utils.logger import logger
+
+
+class Stage:
+    """图中的一个阶段"""
+
+    def __init__(
+            self,
+            name: str,
+            fn: Callable[[Dict[str, Any]], Any],
+            deps: Iterable[str] = (),
+            cleanup: Optional[Callable[[Any], None]] = None
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.cleanup = cleanup
+
+
+class StageGraph:
+    """按依赖关系并行执行阶段"""
+
+    def __init__(self, max_workers: int = 4, wrapper: Optional[Callable[[str], Any]] = None):
+        """
+        Args:
+            max_workers: 并行执行的最大阶段数
+            wrapper: 以阶段名创建上下文管理器的函数,包裹每个阶段的执行(如记录任务进度)
+        """
+        self.max_workers = max_workers
+        self.wrapper = wrapper
+        self._stages: Dict[str, Stage] = {}
+
+    def add(
+            self,
+            name: str,
+            fn: Callable[[Dict[str, Any]], Any],
+            deps: Iterable[str] = (),
+            cleanup: Optional[Callable[[Any], None]] = None
+    ) -> 'StageGraph':
+        """
+        添加阶段。
+
+        Args:
+            name: 阶段名称
+            fn: 阶段函数,参数为已完成阶段的结果字典,返回值作为该阶段结果
+            deps: 依赖的阶段名称
+            cleanup: 整体失败时用于回滚该阶段产出的函数,参数为该阶段结果
+        """
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"阶段 {name} 依赖的阶段 {dep} 不存在")
+        self._stages[name] = Stage(name, fn, deps, cleanup)
+        return self
+
+    def run(self) -> Dict[str, Any]:
+        """
+        执行全部阶段。
+
+        Returns:
+            Dict[str, Any]: 阶段名到阶段结果的映射
+
+        Raises:
+            Exception: 首个失败阶段抛出的异常(已执行清理)
+        """
+        results: Dict[str, Any] = {}
+        completed: List[str] = []
+        pending = dict(self._stages)
+        running: Dict[Future, str] = {}
+        error: Optional[BaseException] = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as executor:
+            while pending or running:
+                if error is None:
+                    for name in [name for name, stage in pending.items()
+                                 if all(dep in results for dep in stage.deps)]:
+                        stage = pending.pop(name)
+                        running[executor.submit(self._run_stage, stage, dict(results))] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                        completed.append(name)
+                    except BaseException as e:
+                        logger.error(f"阶段 {name} 失败: {str(e)}")
+                        if error is None:
+                            error = e
+
+        if error is not None:
+            self._cleanup(completed, results)
+            raise error
+        return results
+
+    def _run_stage(self, stage: Stage, results: Dict[str, Any]) -> Any:
+        if self.wrapper is None:
+            return stage.fn(results)
+        with self.wrapper(stage.name):
+            return stage.fn(results)
+
+    def _cleanup(self, completed: List[str], results: Dict[str, Any]) -> None:
+        for name in reversed(completed):
+            stage = self._stages[name]
+            if stage.cleanup is None:
+                continue
+            try:
+                stage.cleanup(results[name])
+            except Exception as e:
+                logger.error(f"阶段 {name} 清理失败: {str(e)}")
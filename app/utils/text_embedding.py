@@ -1,8 +1,10 @@
 from sentence_transformers import SentenceTransformer
 import os, json
+from functools import lru_cache
 from openai import OpenAI
 from dotenv import load_dotenv
 from app.utils.logger import logger
+from app.utils.query_embedding_cache import query_embedding_cache
 load_dotenv()
 
 
@@ -11,18 +13,26 @@ load_dotenv()
 #     return model.encode(text, normalize_embeddings=True)
 
 
+# 摘要向量维度,与 video_collection 的 summary_embedding 字段一致
+SUMMARY_EMBEDDING_DIM = 512
+
+
+@lru_cache(maxsize=1)
+def _get_client() -> OpenAI:
+    """进程内复用同一个客户端(及其连接池)"""
+    return OpenAI(
+        api_key=os.getenv("API_KEY"),
+        base_url=os.getenv("BASE_URL"),
+    )
+
+
 def embed_fn(text):
     """生成文本的embedding向量"""
     try:
-        client = OpenAI(
-            api_key=os.getenv("API_KEY"),
-            base_url=os.getenv("BASE_URL"),
-        )
-
-        response = client.embeddings.create(
+        response = _get_client().embeddings.create(
             model=os.getenv("EMBEDDING_MODEL_NAME"),
             input=text,
-            dimensions=512,
+            dimensions=SUMMARY_EMBEDDING_DIM,
             encoding_format="float"
         )
 
@@ -38,3 +48,8 @@ def embed_fn(text):
         raise e
 
 
+def embed_query(text):
+    """生成检索文本的embedding向量,重复的查询从缓存返回,不再调用远程接口"""
+    return query_embedding_cache.get_or_compute(
+        os.getenv("EMBEDDING_MODEL_NAME") or "", text, embed_fn, dimensions=SUMMARY_EMBEDDING_DIM
+    ).tolist()
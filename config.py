@@ -12,16 +12,100 @@ class Config:
 
     # 视频处理配置
     VIDEO_FRAME_INTERVAL = int(os.getenv('VIDEO_FRAME_INTERVAL', '30'))  # 视频抽帧间隔
-    VIDEO_FRAME_BATCH_SIZE = int(os.getenv('VIDEO_FRAME_BATCH_SIZE', '50'))  # 批处理大小
+    VIDEO_FRAME_BATCH_SIZE = int(os.getenv('VIDEO_FRAME_BATCH_SIZE', '50'))  # 批处理大小(向量推理微批与批量插入)
+    VIDEO_SEEK_THRESHOLD = int(os.getenv('VIDEO_SEEK_THRESHOLD', '60'))  # 抽帧间隔达到该帧数时改用seek定位
+    FRAME_CACHE_DIR = os.getenv('FRAME_CACHE_DIR', '/tmp/frame_cache')  # 视频帧缓存目录
+    FRAME_CACHE_MAX_MB = int(os.getenv('FRAME_CACHE_MAX_MB', '10240'))  # 视频帧缓存容量上限(MB)
+    VIDEO_PIPELINE_QUEUE_SIZE = int(os.getenv('VIDEO_PIPELINE_QUEUE_SIZE', '4'))  # 帧处理管道各阶段队列容量(批次数)
+    UPLOAD_STAGE_WORKERS = int(os.getenv('UPLOAD_STAGE_WORKERS', '4'))  # 上传处理各阶段的最大并行数
+
+    # 对象存储上传配置
+    OSS_STREAMING_UPLOAD = os.getenv('OSS_STREAMING_UPLOAD', 'true').lower() == 'true'  # 同步上传时是否将请求流直接写入对象存储
+    OSS_UPLOAD_PART_SIZE_MB = int(os.getenv('OSS_UPLOAD_PART_SIZE_MB', '16'))  # 分片上传的分片大小(MB,不小于5)
+    OSS_UPLOAD_PARALLEL = int(os.getenv('OSS_UPLOAD_PARALLEL', '4'))  # 并行上传的分片数/文件数
+    OSS_POOL_MAXSIZE = int(os.getenv('OSS_POOL_MAXSIZE', '32'))  # 对象存储HTTP连接池大小
+    OSS_READ_TIMEOUT = int(os.getenv('OSS_READ_TIMEOUT', '300'))  # 对象存储读超时(秒)
+
+    # 视频指纹(去重)配置
+    FINGERPRINT_DB_PATH = os.getenv('FINGERPRINT_DB_PATH', 'data/fingerprints.db')  # 指纹索引文件
+    FINGERPRINT_PENDING_TTL = int(os.getenv('FINGERPRINT_PENDING_TTL', '3600'))  # 入库中记录的有效期(秒)
+    FINGERPRINT_PHASH_ENABLED = os.getenv('FINGERPRINT_PHASH_ENABLED', 'false').lower() == 'true'  # 是否启用感知哈希去重
+    FINGERPRINT_PHASH_MAX_DISTANCE = int(os.getenv('FINGERPRINT_PHASH_MAX_DISTANCE', '6'))  # 感知哈希单帧最大汉明距离
+
+    # 后台任务配置
+    UPLOAD_STAGING_DIR = os.getenv('UPLOAD_STAGING_DIR', '/tmp/uploads')  # 上传文件暂存目录
+    JOB_QUEUE_BACKEND = os.getenv('JOB_QUEUE_BACKEND', 'local')  # 任务队列后端
+    JOB_QUEUE_WORKERS = int(os.getenv('JOB_QUEUE_WORKERS', '2'))  # 任务工作线程数
+    JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', '86400'))  # 已结束任务的保留时间(秒)
+
+    # 批量入库配置
+    BULK_DECODE_WORKERS = int(os.getenv('BULK_DECODE_WORKERS', '4'))  # 解码进程数
+    BULK_INGEST_WORKERS = int(os.getenv('BULK_INGEST_WORKERS', '2'))  # 入库线程数
+    BULK_CHECKPOINT_PATH = os.getenv('BULK_CHECKPOINT_PATH', 'bulk_ingest_checkpoint.jsonl')  # 断点文件
+    BULK_INGEST_ROOT = os.getenv('BULK_INGEST_ROOT', '')  # 接口批量入库允许读取的根目录,为空时只接受上传的压缩包
+    BULK_ZIP_MAX_MB = int(os.getenv('BULK_ZIP_MAX_MB', '51200'))  # 压缩包中视频解压后的总大小上限(MB)
+    BULK_ZIP_MAX_ENTRIES = int(os.getenv('BULK_ZIP_MAX_ENTRIES', '10000'))  # 压缩包条目数上限
+    BULK_ZIP_MAX_RATIO = int(os.getenv('BULK_ZIP_MAX_RATIO', '100'))  # 单个条目的解压/压缩大小比上限
+
+    # 向量数据库配置
+    MILVUS_HOST = os.getenv('MILVUS_HOST', SERVER_HOST)  # Milvus 服务地址
+    MILVUS_PORT = int(os.getenv('MILVUS_PORT', '19530'))  # Milvus 服务端口
+    MILVUS_URI = os.getenv('MILVUS_URI', f'http://{MILVUS_HOST}:{MILVUS_PORT}')  # Milvus 连接地址,优先于 MILVUS_HOST/MILVUS_PORT
+    MILVUS_DB_NAME = os.getenv('DB_NAME', 'video_db')  # Milvus 数据库名
+    MILVUS_HEALTH_CHECK_INTERVAL = int(os.getenv('MILVUS_HEALTH_CHECK_INTERVAL', '30'))  # 连接健康检查间隔(秒),0表示不检查
+    MILVUS_PRELOAD_COLLECTIONS = os.getenv('MILVUS_PRELOAD_COLLECTIONS', 'true').lower() == 'true'  # 服务启动时预先加载集合
+    MILVUS_RELEASE_IDLE_SECONDS = int(os.getenv('MILVUS_RELEASE_IDLE_SECONDS', '0'))  # 集合空闲多久后释放内存(秒),0表示不释放
+
+    # 向量写入配置
+    MILVUS_WRITE_BATCH_ROWS = int(os.getenv('MILVUS_WRITE_BATCH_ROWS', '2000'))  # 缓冲写入每次提交的最大行数
+    MILVUS_WRITE_MAX_DELAY = float(os.getenv('MILVUS_WRITE_MAX_DELAY', '0.5'))  # 缓冲数据最长等待提交时间(秒)
+    MILVUS_WRITE_MAX_PENDING_ROWS = int(os.getenv('MILVUS_WRITE_MAX_PENDING_ROWS', '20000'))  # 未写入行数上限,超过时写入方阻塞
+    MILVUS_WRITE_MAX_RETRIES = int(os.getenv('MILVUS_WRITE_MAX_RETRIES', '3'))  # 写入失败重试次数
+    MILVUS_WRITE_RETRY_BACKOFF = float(os.getenv('MILVUS_WRITE_RETRY_BACKOFF', '0.5'))  # 重试初始间隔(秒),每次翻倍
+    MILVUS_BULK_ENDPOINT = os.getenv('MILVUS_BULK_ENDPOINT', os.getenv('OSS_ENDPOINT', ''))  # Milvus 使用的对象存储端点(bulk_insert)
+    MILVUS_BULK_ACCESS_KEY = os.getenv('MILVUS_BULK_ACCESS_KEY', os.getenv('OSS_ACCESS_KEY', ''))  # Milvus 对象存储访问密钥
+    MILVUS_BULK_SECRET_KEY = os.getenv('MILVUS_BULK_SECRET_KEY', os.getenv('OSS_SECRET_KEY', ''))  # Milvus 对象存储秘密密钥
+    MILVUS_BULK_BUCKET = os.getenv('MILVUS_BULK_BUCKET', 'a-bucket')  # Milvus 对象存储桶(与 milvus.yaml 中 minio.bucketName 一致)
+
+    # 向量索引与检索配置(索引类型: ivf_flat/ivf_sq8/ivf_pq/hnsw; 检索配置: fast/balanced/exact)
+    FRAME_INDEX_PROFILE = os.getenv('FRAME_INDEX_PROFILE', 'ivf_flat')  # 帧向量索引类型
+    FRAME_INDEX_NLIST = int(os.getenv('FRAME_INDEX_NLIST', '1536'))  # 帧向量IVF索引聚类数
+    FRAME_SEARCH_PROFILE = os.getenv('FRAME_SEARCH_PROFILE', 'balanced')  # 帧检索默认配置
+    VIDEO_INDEX_PROFILE = os.getenv('VIDEO_INDEX_PROFILE', 'ivf_flat')  # 视频向量索引类型
+    VIDEO_INDEX_NLIST = int(os.getenv('VIDEO_INDEX_NLIST', '512'))  # 视频向量IVF索引聚类数
+    VIDEO_SEARCH_PROFILE = os.getenv('VIDEO_SEARCH_PROFILE', 'balanced')  # 视频摘要检索默认配置
+    FRAME_SEARCH_GROUPED = os.getenv('FRAME_SEARCH_GROUPED', 'true').lower() == 'true'  # 帧检索结果按视频分组后分页
+    FRAME_SEARCH_GROUP_BY = os.getenv('FRAME_SEARCH_GROUP_BY', 'false').lower() == 'true'  # 使用Milvus服务端分组检索(2.4+)
+    FRAME_SEARCH_TOP_K = int(os.getenv('FRAME_SEARCH_TOP_K', '200'))  # 本地分组时多取的帧数
+    FRAME_SEARCH_MAX_VIDEOS = int(os.getenv('FRAME_SEARCH_MAX_VIDEOS', '100'))  # 服务端分组时返回的视频数
+    FRAME_SEARCH_GROUP_SIZE = int(os.getenv('FRAME_SEARCH_GROUP_SIZE', '3'))  # 服务端分组时每个视频返回的帧数(sum聚合)
+    FRAME_SEARCH_AGGREGATE = os.getenv('FRAME_SEARCH_AGGREGATE', 'max')  # 视频得分聚合方式(max/sum)
+    VIDEO_METADATA_CACHE_SIZE = int(os.getenv('VIDEO_METADATA_CACHE_SIZE', '10000'))  # 视频元数据缓存条目数
+    VIDEO_METADATA_CACHE_TTL = int(os.getenv('VIDEO_METADATA_CACHE_TTL', '60'))  # 视频元数据缓存有效期(秒)
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '10000'))  # 查询向量内存缓存条目数,0表示不缓存
+    QUERY_EMBEDDING_CACHE_TTL = int(os.getenv('QUERY_EMBEDDING_CACHE_TTL', '86400'))  # 查询向量缓存有效期(秒)
+    QUERY_EMBEDDING_CACHE_DB_PATH = os.getenv('QUERY_EMBEDDING_CACHE_DB_PATH', '')  # 查询向量磁盘缓存文件(多进程共享),为空时只用内存缓存
 
     # 模型配置
     MODEL_BASE_DIR = os.getenv('MODEL_BASE_DIR', 'models')
-    CN_CLIP_MODEL_PATH = os.path.join(
+    # CN-CLIP 权重,支持 .pt 与 .safetensors(由 app.scripts.convert_clip_checkpoint 转换)
+    CN_CLIP_MODEL_PATH = os.getenv('CN_CLIP_MODEL_PATH', os.path.join(
         MODEL_BASE_DIR,
         'embedding',
         'cn-clip',
         'clip_cn_vit-l-14-336.pt'
-    )
+    ))
+    CLIP_LOAD_MMAP = os.getenv('CLIP_LOAD_MMAP', 'true').lower() == 'true'  # 以 mmap 方式加载 .pt 权重,按需分页读入而非整体复制
+    CLIP_QUERY_QUANTIZE = os.getenv('CLIP_QUERY_QUANTIZE', 'none').lower()  # 在线查询的 CPU 量化方式:none 或 dynamic(全连接层 INT8 动态量化),帧向量始终为 fp32
+    EMBEDDING_WARMUP = os.getenv('EMBEDDING_WARMUP', 'false').lower() == 'true'  # 服务启动时在后台加载并预热向量化模型
+    CLIP_ONNX_IMAGE_MODEL = os.getenv('CLIP_ONNX_IMAGE_MODEL', os.path.join(MODEL_BASE_DIR, 'embedding', 'cn-clip', 'vit-l-14-336.img.fp32.onnx'))  # CN-CLIP 图片编码器 ONNX 文件
+    CLIP_ONNX_TEXT_MODEL = os.getenv('CLIP_ONNX_TEXT_MODEL', os.path.join(MODEL_BASE_DIR, 'embedding', 'cn-clip', 'vit-l-14-336.txt.fp32.onnx'))  # CN-CLIP 文本编码器 ONNX 文件
+    ONNX_INTRA_OP_THREADS = int(os.getenv('ONNX_INTRA_OP_THREADS', '0'))  # ONNX Runtime 算子内线程数,0表示使用物理核数
+    ONNX_INTER_OP_THREADS = int(os.getenv('ONNX_INTER_OP_THREADS', '0'))  # ONNX Runtime 算子间线程数,0表示顺序执行
+    ONNX_GRAPH_OPTIMIZATION = os.getenv('ONNX_GRAPH_OPTIMIZATION', 'all')  # 图优化级别(disable/basic/extended/all)
+    EMBEDDING_BATCHING = os.getenv('EMBEDDING_BATCHING', 'true').lower() == 'true'  # 查询向量化请求合并为微批推理
+    EMBEDDING_BATCH_MAX_SIZE = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '32'))  # 微批最大请求数
+    EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_MAX_WAIT_MS', '5'))  # 凑批最长等待时间(毫秒)
 
     # 默认使用CLIP模型
     DEFAULT_EMBEDDING_MODEL = EmbeddingType.CLIP
@@ -36,4 +120,11 @@ class Config:
             print(f"警告:不支持的模型类型 {model_type},使用默认模型 {cls.DEFAULT_EMBEDDING_MODEL.value}")
             return cls.DEFAULT_EMBEDDING_MODEL
 
+    @classmethod
+    def get_frame_embedding_model_type(cls) -> EmbeddingType:
+        """帧向量使用的模型:CLIP,配置为 clip_onnx 时使用其 ONNX 实现(向量一致,可写入同一集合)"""
+        if cls.get_embedding_model_type() == EmbeddingType.CLIP_ONNX:
+            return EmbeddingType.CLIP_ONNX
+        return EmbeddingType.CLIP
+
     # ... 其他配置 ...
@@ -1,9 +1,10 @@
-from pymilvus import MilvusClient
+from app.utils.milvus_connection import milvus_connections
 
 
 class MilvusClientWrapper:
     def __init__(self, uri, db_name):
-        self.client = MilvusClient(uri=uri, db_name=db_name)
+        # 与 DAO、MilvusOperator 共享同一连接
+        self.client = milvus_connections.get_client(uri, db_name)
 
     def create_schema(self, auto_id=False, enable_dynamic_fields=True, description=""):
         return self.client.create_schema(auto_id=auto_id, enable_dynamic_fields=enable_dynamic_fields,